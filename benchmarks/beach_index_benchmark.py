@@ -0,0 +1,62 @@
+"""Measures the cost of creating a `DistanceFromBeach`, from the JSON coordinates and from the
+compiled beach index, and checks the index is compiled again once the coordinates are edited.
+
+Run with `python benchmarks/beach_index_benchmark.py`.
+"""
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from src.distance_from_beach import (BEACH_COORDINATES_PATH, INDEX_LEAF_SIZE, DistanceFromBeach,
+                                     build_beach_index, get_distance_from_beach, to_unit_vectors)
+
+REPETITIONS = 100
+
+
+def create_from_json():
+    beach_coordinates = np.array(json.loads(BEACH_COORDINATES_PATH.read_text()))
+    return cKDTree(to_unit_vectors(beach_coordinates[:, 0], beach_coordinates[:, 1]),
+                   leafsize=INDEX_LEAF_SIZE)
+
+
+def create_from_index():
+    return DistanceFromBeach().index
+
+
+def check_rebuilds_stale_index():
+    beach_coordinates = json.loads(BEACH_COORDINATES_PATH.read_text())
+    with tempfile.TemporaryDirectory() as directory:
+        beach_coordinates_path = pathlib.Path(directory) / BEACH_COORDINATES_PATH.name
+        beach_index_path = pathlib.Path(directory) / 'beach_index.npy'
+        beach_coordinates_path.write_text(json.dumps(beach_coordinates))
+        DistanceFromBeach(beach_index_path, beach_coordinates_path)
+        beach_coordinates_path.write_text(json.dumps(beach_coordinates[:-1]))
+        # file times may be coarser than the time between the writes
+        index_mtime = beach_index_path.stat().st_mtime
+        os.utime(beach_coordinates_path, (index_mtime + 1, index_mtime + 1))
+        distance_calculator = DistanceFromBeach(beach_index_path, beach_coordinates_path)
+        assert len(distance_calculator.beach_coordinates) == len(beach_coordinates) - 1
+
+
+def main():
+    check_rebuilds_stale_index()
+    build_beach_index()
+    get_distance_from_beach()
+    timings = dict(json=create_from_json,
+                   index=create_from_index,
+                   index_without_tree=DistanceFromBeach,
+                   singleton=get_distance_from_beach)
+    for name, create in timings.items():
+        seconds = timeit.timeit(create, number=REPETITIONS) / REPETITIONS
+        print(f'{name:>18}: {seconds * 1000:.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
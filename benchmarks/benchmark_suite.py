@@ -0,0 +1,195 @@
+"""Benchmarks the crawler and the app's data path offline, and keeps the results of every commit
+so regressions show up between commits.
+
+The crawl runs against `FakeYad2`, a local stand-in for the feed API with configurable latency and
+error rate, and the city populations come from a synthetic spreadsheet. Everything is written to
+a temporary data directory. The results are saved to `benchmark_results/<commit>.json` and
+compared to the previously saved results.
+
+Run with `python benchmarks/benchmark_suite.py` (or with `--quick` for the smaller sizes only).
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+# set before the listings modules are imported, so they never touch the real data
+DATA_DIRECTORY = pathlib.Path(tempfile.mkdtemp(prefix='yad2_benchmark_'))
+os.environ['YAD2_DATA_DIRECTORY'] = str(DATA_DIRECTORY)
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.fake_yad2 import FakeYad2
+from benchmarks.synthetic_cbs import make_city_populations_excel
+from benchmarks.synthetic_listings import make_listings_df
+from src import get_all_listings_df
+from src.city_populations import refresh_city_populations
+from src.instrumentation import INSTRUMENTATION
+from src.listings_cube import ListingsCube
+from src.listings_query import ListingsQuery
+from src.listings_storage import compact_listings, get_listings_path, read_listings, write_listings
+from src.near_the_beach import NearTheBeachIndex
+from src.page_fetcher import PageFetcher
+
+RESULTS_DIRECTORY = pathlib.Path(__file__).resolve().parents[1] / 'benchmark_results'
+PAGES_PER_REGION = [2, 8, 32]
+AMOUNTS_OF_LISTINGS = [10000, 100000, 1000000]
+QUICK_PAGES_PER_REGION = [2, 8]
+QUICK_AMOUNTS_OF_LISTINGS = [10000, 100000]
+SELECTED_CITIES = ['Tel Aviv - Yafo', 'Haifa', 'Jerusalem', 'Netanya', 'Rishon LeZiyyon']
+
+
+def measure(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def benchmark_crawl(pages_per_region, args):
+    fake_yad2 = FakeYad2(pages_per_region=pages_per_region,
+                         latency_seconds=args.latency,
+                         error_rate=args.error_rate)
+    page_fetcher = PageFetcher(requests_per_second=args.requests_per_second,
+                               transport=fake_yad2.transport)
+    INSTRUMENTATION.reset()
+    _, seconds = measure(
+        lambda: asyncio.run(get_all_listings_df.save_preprocessed_listings(page_fetcher)))
+    report = INSTRUMENTATION.get_report().set_index('stage')
+    amount_of_listings = len(read_listings(get_listings_path('preprocessed_listings')))
+    parse_stages = report[report.index.str.endswith(' parse')]
+    _, get_initial_df_seconds = measure(get_all_listings_df.get_initial_df)
+    return dict(seconds=seconds,
+                requests=fake_yad2.requests,
+                requests_per_page=fake_yad2.requests / len(fake_yad2.pages_served),
+                server_errors=fake_yad2.errors,
+                pages_per_second=page_fetcher.pages_per_second,
+                listings_per_second=amount_of_listings / seconds,
+                parse_microseconds_per_item=parse_stages.total_seconds.sum() /
+                parse_stages['items'].sum() * 1e6,
+                get_initial_df_seconds=get_initial_df_seconds)
+
+
+def benchmark_get_initial_df(amount_of_listings):
+    write_listings(
+        make_listings_df(amount_of_listings).drop(columns=['english_city', 'city_population']),
+        get_listings_path('preprocessed_listings'))
+    _, seconds = measure(get_all_listings_df.get_initial_df)
+    return dict(seconds=seconds)
+
+
+def benchmark_app_data_path(amount_of_listings):
+    path = get_listings_path('all_listings')
+    write_listings(make_listings_df(amount_of_listings), path)
+    df, load_seconds = measure(lambda: compact_listings(read_listings(path)))
+    cube, cube_seconds = measure(lambda: ListingsCube.from_listings(df))
+    query, query_index_seconds = measure(lambda: ListingsQuery(df, cube))
+    selection, select_seconds = measure(lambda: query.select(SELECTED_CITIES, (1000000, 5000000)))
+    _, selected_cube = selection
+    _, rent_yield_seconds = measure(selected_cube.get_rent_yield_by_city)
+    near_the_beach_index, near_the_beach_index_seconds = measure(lambda: NearTheBeachIndex(df))
+    _, near_the_beach_query_seconds = measure(near_the_beach_index.query)
+    return dict(load_seconds=load_seconds,
+                cube_seconds=cube_seconds,
+                query_index_seconds=query_index_seconds,
+                select_seconds=select_seconds,
+                rent_yield_seconds=rent_yield_seconds,
+                near_the_beach_index_seconds=near_the_beach_index_seconds,
+                near_the_beach_query_seconds=near_the_beach_query_seconds)
+
+
+def get_commit():
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                            capture_output=True,
+                            text=True,
+                            check=True).stdout.strip()
+    is_dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                              capture_output=True,
+                              text=True,
+                              check=True).stdout.strip()
+    return f'{commit}-dirty' if is_dirty else commit
+
+
+def print_comparison(results, previous_results_path):
+    previous_results = json.loads(previous_results_path.read_text())
+    print(f'\ncompared to {previous_results["commit"]}:')
+    for benchmark, sizes in results['benchmarks'].items():
+        for size, metrics in sizes.items():
+            previous_sizes = previous_results['benchmarks'].get(benchmark, dict())
+            previous_metrics = previous_sizes.get(size, dict())
+            changes = [
+                f'{metric} {(value / previous_metrics[metric] - 1) * 100:+.0f}%'
+                for metric, value in metrics.items()
+                if previous_metrics.get(metric) and previous_metrics[metric] > 0
+            ]
+            if changes:
+                print(f'  {benchmark} {size}: {", ".join(changes)}')
+
+
+def run(args):
+    pages_per_region = QUICK_PAGES_PER_REGION if args.quick else PAGES_PER_REGION
+    amounts_of_listings = QUICK_AMOUNTS_OF_LISTINGS if args.quick else AMOUNTS_OF_LISTINGS
+    content = make_city_populations_excel()
+    refresh_city_populations(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=content)))
+    INSTRUMENTATION.enable()
+
+    benchmarks = dict(crawl=dict(), get_initial_df=dict(), app_data_path=dict())
+    for pages in pages_per_region:
+        benchmarks['crawl'][f'{pages} pages per region'] = benchmark_crawl(pages, args)
+    for amount_of_listings in amounts_of_listings:
+        benchmarks['get_initial_df'][f'{amount_of_listings} listings'] = benchmark_get_initial_df(
+            amount_of_listings)
+        benchmarks['app_data_path'][f'{amount_of_listings} listings'] = benchmark_app_data_path(
+            amount_of_listings)
+    for benchmark, sizes in benchmarks.items():
+        for size, metrics in sizes.items():
+            print(f'{benchmark} {size}: ' + ', '.join(f'{metric} {value:.4g}'
+                                                      for metric, value in metrics.items()))
+
+    results = dict(commit=get_commit(),
+                   date=datetime.datetime.now().isoformat(timespec='seconds'),
+                   parameters=vars(args),
+                   benchmarks=benchmarks)
+    RESULTS_DIRECTORY.mkdir(exist_ok=True)
+    previous_results_paths = sorted(RESULTS_DIRECTORY.glob('*.json'),
+                                    key=lambda path: path.stat().st_mtime)
+    results_path = RESULTS_DIRECTORY / f'{results["commit"]}.json'
+    previous_results_paths = [path for path in previous_results_paths if path != results_path]
+    if previous_results_paths:
+        print_comparison(results, previous_results_paths[-1])
+    results_path.write_text(json.dumps(results, indent=2))
+    print(f'\nsaved the results to {results_path}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quick', action='store_true', help='only run the smaller sizes')
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0.05,
+                        help='seconds every fake feed response takes')
+    parser.add_argument('--error-rate',
+                        type=float,
+                        default=0.01,
+                        help='the fraction of fake feed responses that fail')
+    parser.add_argument('--requests-per-second',
+                        type=float,
+                        default=100,
+                        help="the crawler's rate limit, higher than the polite default to measure "
+                        'the crawler itself')
+    try:
+        run(parser.parse_args())
+    finally:
+        shutil.rmtree(DATA_DIRECTORY, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
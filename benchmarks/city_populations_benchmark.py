@@ -0,0 +1,42 @@
+"""Times loading the city populations table: cold (download and parse the spreadsheet) and warm
+(read the cached table).
+
+The spreadsheet is a synthetic one served locally, so this runs offline.
+Run with `python benchmarks/city_populations_benchmark.py`.
+"""
+import pathlib
+import sys
+import time
+
+import httpx
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_cbs import make_city_populations_excel
+from src import city_populations
+
+SYNTHETIC_URL = 'https://cbs.example/localities.xlsx'
+REPETITIONS = 20
+
+
+def main():
+    content = make_city_populations_excel()
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=content))
+    cache_entry = city_populations._load_cache_index().get(SYNTHETIC_URL)
+    if cache_entry:
+        (city_populations.CACHE_DIRECTORY / cache_entry['file_name']).unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    city_populations.refresh_city_populations(SYNTHETIC_URL, transport)
+    city_populations.get_city_populations(SYNTHETIC_URL)
+    cold_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        city_populations.get_city_populations(SYNTHETIC_URL)
+    warm_seconds = (time.perf_counter() - start) / REPETITIONS
+    print(f'cold (download and parse): {cold_seconds * 1000:.1f}ms, '
+          f'warm (cached table): {warm_seconds * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
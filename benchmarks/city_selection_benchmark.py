@@ -0,0 +1,92 @@
+"""Compares the city selector callbacks on the `CitySelection` bitmasks to building and intersecting
+sets of names on every click, and checks both give the same selections and checkboxes for random
+clicks.
+
+Run with `python benchmarks/city_selection_benchmark.py`.
+"""
+import pathlib
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.cities import CITIES, LARGE_CITIES
+from src.city_selection import CitySelection
+
+AMOUNTS_OF_LISTINGS = [100000, 1000000]
+AMOUNT_OF_CLICKS = 1000
+
+
+def set_region_with_sets(selected_cities, region, is_selected, relevant_cities):
+    all_other_selected_cities = set(selected_cities) - CITIES[region]
+    if not is_selected:
+        return list(all_other_selected_cities)
+    return list(all_other_selected_cities | (CITIES[region] & relevant_cities))
+
+
+def get_regions_with_sets(selected_cities):
+    return {region: bool(set(selected_cities) & CITIES[region]) for region in CITIES}
+
+
+def make_clicks(relevant_cities, seed=0):
+    """Returns random clicks on the region checkboxes and the city multiselect."""
+    rng = np.random.default_rng(seed)
+    regions = list(CITIES)
+    cities = sorted(relevant_cities)
+    for _ in range(AMOUNT_OF_CLICKS):
+        if rng.random() < 0.5:
+            yield 'region', (regions[rng.integers(len(regions))], bool(rng.random() < 0.5))
+        else:
+            yield 'cities', list(rng.choice(cities, rng.integers(0, 30), replace=False))
+
+
+def click_with_sets(clicks, relevant_cities):
+    selected_cities = list(LARGE_CITIES & relevant_cities)
+    states = list()
+    for kind, click in clicks:
+        if kind == 'region':
+            selected_cities = set_region_with_sets(selected_cities, *click, relevant_cities)
+        else:
+            selected_cities = click
+        states.append((set(selected_cities), get_regions_with_sets(selected_cities)))
+    return states
+
+
+def click_with_masks(clicks, city_selection):
+    selected_cities = city_selection.get_cities(city_selection.get_mask(LARGE_CITIES))
+    states = list()
+    for kind, click in clicks:
+        if kind == 'region':
+            mask = city_selection.set_region(city_selection.get_mask(selected_cities), *click)
+            selected_cities = city_selection.get_cities(mask)
+        else:
+            selected_cities = click
+            mask = city_selection.get_mask(selected_cities)
+        states.append((set(selected_cities), city_selection.get_regions(mask)))
+    return states
+
+
+def main():
+    for amount_of_listings in AMOUNTS_OF_LISTINGS:
+        df = make_listings_df(amount_of_listings)
+        relevant_cities = set(df.english_city.unique())
+        city_selection = CitySelection.from_listings(df)
+        clicks = list(make_clicks(relevant_cities))
+        assert click_with_masks(clicks, city_selection) == click_with_sets(clicks, relevant_cities)
+
+        relevant_cities_seconds = min(
+            timeit.repeat(lambda: set(df.english_city.unique()), number=1, repeat=5))
+        sets_seconds = min(
+            timeit.repeat(lambda: click_with_sets(clicks, relevant_cities), number=1, repeat=5))
+        masks_seconds = min(
+            timeit.repeat(lambda: click_with_masks(clicks, city_selection), number=1, repeat=5))
+        print(f'{amount_of_listings:>7} listings: the relevant cities took '
+              f'{relevant_cities_seconds * 1000:.1f}ms every rerun, a click took '
+              f'{sets_seconds / AMOUNT_OF_CLICKS * 1e6:.1f}us with sets and '
+              f'{masks_seconds / AMOUNT_OF_CLICKS * 1e6:.1f}us with bitmasks')
+
+
+if __name__ == '__main__':
+    main()
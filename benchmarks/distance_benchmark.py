@@ -0,0 +1,113 @@
+"""Compares `DistanceFromBeach.calculate_many` to the previous per-row calculation.
+
+The previous calculation picked the beach point closest by latitude alone (a bisect over the
+latitudes), which is wrong by kilometers wherever the coastline isn't running north to south.
+`calculate_many` queries KD-trees: by default it is exact, which tests/test_distance_from_beach.py
+checks against a brute force search over all beach points, and faster than the per-row bisect from
+100000 points, which is asserted. Allowing a relative error (`max_relative_error`) is reported with
+its measured error.
+
+Run from the `src` directory, like the crawler: `python ../benchmarks/distance_benchmark.py`.
+"""
+import bisect
+import pathlib
+import sys
+import timeit
+from math import atan2, cos, radians, sin, sqrt
+
+import numpy as np
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from src.distance_from_beach import DistanceFromBeach, haversine_distances
+
+AMOUNTS_OF_POINTS = [10000, 100000, 300000, 1000000]
+MAX_RELATIVE_ERRORS = [0.0, 0.02, 0.05, 0.1]
+BRUTE_FORCE_SAMPLE_SIZE = 5000
+MIN_AMOUNT_OF_POINTS_FASTER_THAN_PER_ROW = 100000
+# listings are spread around the cities, so the points are sampled around some of them
+CITY_CENTERS = [(32.08, 34.78), (31.77, 35.21), (32.79, 34.99), (31.25, 34.79), (32.33, 34.86),
+                (31.80, 34.65), (31.97, 34.80), (32.09, 34.88), (31.90, 35.01), (32.61, 35.29),
+                (29.56, 34.95), (32.17, 34.84), (31.89, 34.81), (33.01, 35.10)]
+
+
+def find_closest_index(sorted_list, target):
+    insertion_point = bisect.bisect_left(sorted_list, target)
+    if insertion_point == 0:
+        return 0
+    if insertion_point == len(sorted_list):
+        return len(sorted_list) - 1
+    left_value = sorted_list[insertion_point - 1]
+    right_value = sorted_list[insertion_point]
+    return insertion_point - 1 if target - left_value < right_value - target else insertion_point
+
+
+def haversine_distance(point1, point2):
+    lat1, lon1, lat2, lon2 = map(radians, (point1[0], point1[1], point2[0], point2[1]))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
+    return int(6371.0 * 2 * atan2(sqrt(a), sqrt(1 - a)) * 1000)
+
+
+def calculate_per_row(beach_coordinates, beach_latitudes, latitudes, longitudes):
+    return np.array([
+        haversine_distance((latitude, longitude),
+                           beach_coordinates[find_closest_index(beach_latitudes, latitude)])
+        for latitude, longitude in zip(latitudes.tolist(), longitudes.tolist())
+    ])
+
+
+def calculate_brute_force(beach_coordinates, latitudes, longitudes):
+    return np.array([
+        haversine_distances(latitude, longitude, beach_coordinates[:, 0],
+                            beach_coordinates[:, 1]).min()
+        for latitude, longitude in zip(latitudes, longitudes)
+    ])
+
+
+def make_points(amount_of_points, seed=0):
+    rng = np.random.default_rng(seed)
+    city_centers = np.array(CITY_CENTERS)[rng.integers(0, len(CITY_CENTERS), amount_of_points)]
+    return (city_centers[:, 0] + rng.normal(0, 0.03, amount_of_points),
+            city_centers[:, 1] + rng.normal(0, 0.03, amount_of_points))
+
+
+def main():
+    distance_calculator = DistanceFromBeach()
+    beach_coordinates = distance_calculator.beach_coordinates.tolist()
+    beach_latitudes = [latitude for latitude, _ in beach_coordinates]
+
+    latitudes, longitudes = make_points(BRUTE_FORCE_SAMPLE_SIZE)
+    exact = calculate_brute_force(distance_calculator.beach_coordinates, latitudes, longitudes)
+    for max_relative_error in MAX_RELATIVE_ERRORS[1:]:
+        errors = distance_calculator.calculate_many(latitudes, longitudes,
+                                                    max_relative_error) - exact
+        print(
+            f'max relative error {max_relative_error}: p99 error {np.percentile(errors, 99):.0f}m, '
+            f'max error {errors.max()}m')
+    errors = calculate_per_row(beach_coordinates, beach_latitudes, latitudes, longitudes) - exact
+    print(f'per row (bisect on latitude): p99 error {np.percentile(errors, 99):.0f}m, '
+          f'max error {errors.max()}m')
+
+    for amount_of_points in AMOUNTS_OF_POINTS:
+        latitudes, longitudes = make_points(amount_of_points)
+        per_row_seconds = min(
+            timeit.repeat(lambda: calculate_per_row(beach_coordinates, beach_latitudes, latitudes,
+                                                    longitudes),
+                          number=1,
+                          repeat=3))
+        timings = [f'per row {per_row_seconds:.2f}s']
+        for max_relative_error in MAX_RELATIVE_ERRORS:
+            seconds = min(
+                timeit.repeat(lambda: distance_calculator.calculate_many(
+                    latitudes, longitudes, max_relative_error),
+                              number=1,
+                              repeat=3))
+            timings.append(f'{max_relative_error}: {seconds:.2f}s')
+            if not max_relative_error and amount_of_points >= MIN_AMOUNT_OF_POINTS_FASTER_THAN_PER_ROW:
+                assert seconds < per_row_seconds, (amount_of_points, seconds, per_row_seconds)
+        print(f'{amount_of_points:>7} points: {", ".join(timings)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import collections
+import datetime
+import random
+
+import httpx
+
+from benchmarks.synthetic_feed import make_feed_item
+
+
+class FakeYad2:
+    """A local stand-in for the Yad2 feed API, to be used as the transport of a `PageFetcher`.
+
+    Every feed and region has `pages_per_region` pages of synthetic feed items, newest first, and
+    a request without a page gets the first one, like the API. The newest item was added at
+    `newest_date_added` (now by default). Every page but the first starts with the last `overlap`
+    items of the page before it, like the feed shifting while it's crawled. Responses take
+    `latency_seconds`, and a fraction `error_rate` of them fail with a server error.
+    """
+
+    def __init__(self,
+                 pages_per_region=4,
+                 items_per_page=40,
+                 latency_seconds=0.0,
+                 error_rate=0.0,
+                 seed=0,
+                 newest_date_added=None,
+                 overlap=0):
+        self.pages_per_region = pages_per_region
+        self.items_per_page = items_per_page
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.seed = seed
+        self.overlap = overlap
+        self.newest_date_added = newest_date_added or datetime.datetime.now().replace(microsecond=0)
+        self._rng = random.Random(seed)
+        self._pages = dict()
+        self.requests = 0
+        self.errors = 0
+        # the successful responses by feed, region and page, where a page-less request is page 1
+        self.pages_served = collections.Counter()
+        self.transport = httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request):
+        self.requests += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            return httpx.Response(503)
+        for_sale = request.url.path.rstrip('/').endswith('forsale')
+        region_code = int(request.url.params['topArea'])
+        page = max(1, int(request.url.params.get('page', 1)))
+        self.pages_served[for_sale, region_code, page] += 1
+        return httpx.Response(
+            200,
+            json=dict(data=dict(pagination=dict(last_page=self.pages_per_region),
+                                feed=dict(
+                                    feed_items=self.get_feed_items(for_sale, region_code, page)))))
+
+    def get_feed_items(self, for_sale, region_code, page):
+        key = for_sale, region_code, page
+        if key not in self._pages:
+            self._pages[key] = self._make_feed_items(*key)
+        return self._pages[key]
+
+    def _make_feed_items(self, for_sale, region_code, page):
+        rng = random.Random(f'{self.seed} {for_sale} {region_code} {page}')
+        feed_items = list()
+        for i in range(self.items_per_page):
+            feed_item = make_feed_item(
+                rng, f'{"s" if for_sale else "r"}{region_code}p{page}i{i}x{self.seed}', for_sale)
+            # the feed is sorted by date, newest first, and only recent listings are kept
+            index_in_region = (page - 1) * self.items_per_page + i
+            feed_item['date_added'] = str(self.newest_date_added -
+                                          datetime.timedelta(minutes=10 * index_in_region))
+            feed_items.append(feed_item)
+        if page > 1 and self.overlap:
+            feed_items[:self.overlap] = self.get_feed_items(for_sale, region_code,
+                                                            page - 1)[-self.overlap:]
+        return feed_items
@@ -0,0 +1,92 @@
+"""Compares enriching the preprocessed listings in chunks, resolving their cities by the city
+dictionary, with 1 to N worker processes, to merging the whole frame with the city populations in a
+single pass, and checks they give the same listings.
+
+The listings are synthetic, in the cities of the synthetic spreadsheet plus a few unknown ones,
+with some listings repeated. Everything is written to a temporary data directory.
+Run with `python benchmarks/initial_df_benchmark.py`.
+"""
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import timeit
+
+import httpx
+import numpy as np
+import pandas as pd
+
+# set before the listings modules are imported, so they never touch the real data
+DATA_DIRECTORY = pathlib.Path(tempfile.mkdtemp(prefix='yad2_benchmark_'))
+os.environ['YAD2_DATA_DIRECTORY'] = str(DATA_DIRECTORY)
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_cbs import CITIES, make_city_populations_excel
+from benchmarks.synthetic_listings import make_listings_df
+from src.city_populations import TYPOS, get_city_populations, refresh_city_populations
+from src.get_all_listings_df import LISTINGS_MAX_AGE, get_initial_df
+from src.listings_storage import get_listings_path, read_listings, write_listings
+
+AMOUNTS_OF_LISTINGS = [100000, 1000000, 4000000]
+WORKERS = sorted({1, 2, 4, os.cpu_count()})
+CITY_NAMES = ([hebrew_city for hebrew_city, _, _ in CITIES] + ['עיר לא ידועה'] +
+              [f'יישוב {i}' for i in range(50)])
+
+
+def previous_get_initial_df():
+    df = read_listings(get_listings_path('preprocessed_listings'))
+    city_names_and_populations = get_city_populations()
+    # the cities spelled like in the spreadsheet are resolved too
+    df = df.assign(spelling_fixed_city=df.city.astype(object).replace(TYPOS))
+    df = df.merge(city_names_and_populations,
+                  left_on='spelling_fixed_city',
+                  right_on='hebrew_city',
+                  how='left')
+    df = df.drop(['hebrew_city', 'spelling_fixed_city'], axis=1)
+    df = df[df.date_listed > (pd.Timestamp.today() - LISTINGS_MAX_AGE).to_pydatetime()]
+    df = df[(df.area < df.area.mean() * 5) & (df.area > df.area.mean() / 10)]
+    df.city_population = df.city_population.astype(float).round().astype('Int32')
+    df.drop_duplicates(subset='link_token', keep='first', inplace=True)
+    return df.reset_index(drop=True)
+
+
+def write_preprocessed_listings(amount_of_listings):
+    rng = np.random.default_rng(1)
+    df = make_listings_df(amount_of_listings).drop(columns=['english_city', 'city_population'])
+    df['city'] = rng.choice(CITY_NAMES, amount_of_listings)
+    # some of them older than the listings kept, and some repeated
+    df['date_listed'] -= pd.to_timedelta(rng.integers(0, 2, amount_of_listings) * 10, unit='W')
+    # none of them close to the oldest date kept, which moves while the benchmark runs
+    oldest_date_listed = pd.Timestamp.today() - LISTINGS_MAX_AGE
+    df = df[(df.date_listed - oldest_date_listed).abs() > pd.Timedelta(1, unit='D')]
+    df = pd.concat([df, df.sample(frac=0.05, random_state=1)], ignore_index=True)
+    write_listings(df, get_listings_path('preprocessed_listings'))
+
+
+def main():
+    content = make_city_populations_excel()
+    refresh_city_populations(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=content)))
+    print(f'{os.cpu_count()} cores')
+    for amount_of_listings in AMOUNTS_OF_LISTINGS:
+        write_preprocessed_listings(amount_of_listings)
+        expected_df = previous_get_initial_df()
+        for workers in WORKERS:
+            pd.testing.assert_frame_equal(
+                get_initial_df(workers=workers).drop(columns='city_id'), expected_df)
+        previous_seconds = min(timeit.repeat(previous_get_initial_df, number=1, repeat=3))
+        seconds_by_workers = {
+            workers: min(timeit.repeat(lambda: get_initial_df(workers=workers), number=1, repeat=3))
+            for workers in WORKERS
+        }
+        print(f'{amount_of_listings:>7} listings: previous {previous_seconds:.2f}s, ' +
+              ', '.join(f'{workers} workers {seconds:.2f}s'
+                        for workers, seconds in seconds_by_workers.items()))
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(DATA_DIRECTORY, ignore_errors=True)
@@ -0,0 +1,96 @@
+"""Compares answering the Results tabs from the `ListingsCube` to computing them from the filtered
+listings, and checks both give the same results for random selections of the app's widgets.
+
+Run with `python benchmarks/listings_cube_benchmark.py`.
+"""
+import pathlib
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.analytics import get_rent_yield_by_city
+from src.listings_cube import ListingsCube
+
+AMOUNTS_OF_LISTINGS = [10000, 100000, 1000000]
+AMOUNT_OF_SELECTIONS = 20
+MILLION = 1000000
+
+
+def make_selections(df, seed=0):
+    """Returns random city selections and price ranges, like the app's widgets make them."""
+    rng = np.random.default_rng(seed)
+    english_cities = df.english_city.cat.categories
+    for _ in range(AMOUNT_OF_SELECTIONS):
+        selected_cities = list(rng.choice(english_cities, rng.integers(1, 40)))
+        low, high = sorted(rng.choice(np.arange(6, 201), 2, replace=False) / 10)
+        yield selected_cities, (low * MILLION, high * MILLION)
+
+
+def filter_listings(df, selected_cities, price_range):
+    df = df[(df.price > price_range[0]) & (df.price < price_range[1]) | ~df.for_sale]
+    return df[df.english_city.isin(selected_cities)]
+
+
+def get_results_from_listings(df):
+    for_sale_df = df[df.for_sale]
+    return dict(rent_yield=get_rent_yield_by_city(df),
+                amount_of_listings=for_sale_df.english_city.value_counts().loc[lambda x: x > 0],
+                price_per_sqm=(for_sale_df.price / for_sale_df.area).groupby(
+                    for_sale_df.english_city, observed=True).mean())
+
+
+def get_results_from_cube(cube):
+    return dict(rent_yield=cube.get_rent_yield_by_city(),
+                amount_of_listings=cube.get_amount_of_listings_by_city(),
+                price_per_sqm=cube.get_price_per_sqm_by_city())
+
+
+def select_from_listings(df, selections):
+    return [get_results_from_listings(filter_listings(df, *selection)) for selection in selections]
+
+
+def select_from_cube(cube, selections):
+    return [get_results_from_cube(cube.select(*selection)) for selection in selections]
+
+
+def by_city_name(series):
+    return series.set_axis(series.index.astype(str)).sort_index()
+
+
+def check_equivalence(df, cube):
+    for selected_cities, price_range in make_selections(df):
+        expected = get_results_from_listings(filter_listings(df, selected_cities, price_range))
+        actual = get_results_from_cube(cube.select(selected_cities, price_range))
+        for name in expected:
+            pd.testing.assert_series_equal(by_city_name(actual[name]),
+                                           by_city_name(expected[name]),
+                                           check_names=False,
+                                           check_dtype=False,
+                                           rtol=1e-12)
+
+
+def main():
+    for amount_of_listings in AMOUNTS_OF_LISTINGS:
+        df = make_listings_df(amount_of_listings)
+        start = timeit.default_timer()
+        cube = ListingsCube.from_listings(df)
+        build_seconds = timeit.default_timer() - start
+        check_equivalence(df, cube)
+        selections = list(make_selections(df, seed=1))
+        listings_seconds = min(
+            timeit.repeat(lambda: select_from_listings(df, selections), number=1,
+                          repeat=3)) / len(selections)
+        cube_seconds = min(
+            timeit.repeat(lambda: select_from_cube(cube, selections), number=1,
+                          repeat=3)) / len(selections)
+        print(f'{amount_of_listings:>7} listings, {len(cube.cells):>6} cells (built in '
+              f'{build_seconds:.2f}s): listings {listings_seconds * 1000:.1f}ms, '
+              f'cube {cube_seconds * 1000:.1f}ms per selection')
+
+
+if __name__ == '__main__':
+    main()
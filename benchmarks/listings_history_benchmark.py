@@ -0,0 +1,141 @@
+"""Compares ingesting a snapshot into the `ListingsHistory` to merging the whole snapshot with the
+whole history, checks both give the same history and changes, also across saved snapshots that
+delist and relist listings or are seen in the same second, and measures how the ingest time grows
+with the amount of new, changed and delisted listings.
+
+Run with `python benchmarks/listings_history_benchmark.py`.
+"""
+import datetime
+import pathlib
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.listings_history import (CHANGE_DTYPES, HISTORY_DTYPES, IDENTITY_COLUMNS, TRACKED_COLUMNS,
+                                  ListingsHistory)
+
+AMOUNTS_OF_LISTINGS = [100000, 1000000]
+CHANGED_FRACTIONS = [0.001, 0.01, 0.1]
+FIRST_SEEN_AT = datetime.datetime(2026, 1, 1)
+SEEN_AT = datetime.datetime(2026, 1, 2)
+RELISTED_AT = datetime.datetime(2026, 1, 3)
+
+
+def make_snapshot(df, changed_fraction, seed=1):
+    """Returns the next snapshot of `df`, with a fraction of its listings delisted, a fraction with
+    a new price and a fraction of new listings."""
+    rng = np.random.default_rng(seed)
+    amount_changed = int(len(df) * changed_fraction)
+    snapshot = df.drop(index=rng.choice(len(df), amount_changed, replace=False))
+    changed_rows = rng.choice(len(snapshot), amount_changed, replace=False)
+    price = snapshot.price.to_numpy(copy=True)
+    price[changed_rows] = price[changed_rows] * 0.95
+    return pd.concat([snapshot.assign(price=price),
+                      make_listings_df(amount_changed, seed=seed)],
+                     ignore_index=True)
+
+
+def merge_ingest(listings, df, seen_at, delisting_for_sale_values):
+    """The history and changes of ingesting `df` by merging the whole of it with the whole
+    history."""
+    merged = listings.merge(df[IDENTITY_COLUMNS + TRACKED_COLUMNS],
+                            on='link_token',
+                            how='outer',
+                            suffixes=('', '_new'),
+                            indicator=True)
+    is_known = merged._merge == 'both'
+    is_new = merged._merge == 'right_only'
+    changes = list()
+    for column in TRACKED_COLUMNS:
+        is_changed = is_known & (merged[column] != merged[f'{column}_new'])
+        changes.append(
+            pd.DataFrame(
+                dict(link_token=merged.link_token[is_changed],
+                     seen_at=pd.Timestamp(seen_at),
+                     column=column,
+                     previous_value=merged[column][is_changed],
+                     value=merged[f'{column}_new'][is_changed])))
+        merged[column] = merged[column].where(~(is_known | is_new), merged[f'{column}_new'])
+        if column == 'price':
+            merged['price_changes'] = merged.price_changes.fillna(0) + is_changed
+    for column in IDENTITY_COLUMNS[1:]:
+        merged[column] = merged[column].where(~is_new, merged[f'{column}_new'])
+    merged['first_seen'] = merged.first_seen.where(~is_new, pd.Timestamp(seen_at))
+    merged['first_price'] = merged.first_price.where(~is_new, merged.price)
+    merged['last_seen'] = merged.last_seen.where(~(is_known | is_new), pd.Timestamp(seen_at))
+    is_delisted = (merged._merge == 'left_only') & merged.delisted_at.isna() & merged.for_sale.isin(
+        list(delisting_for_sale_values))
+    delisted_at = merged.delisted_at.where(~(is_known | is_new), pd.NaT)
+    merged['delisted_at'] = delisted_at.where(~is_delisted, pd.Timestamp(seen_at))
+    history = merged[list(listings.columns)].astype(listings.dtypes.to_dict() | HISTORY_DTYPES)
+    return history, pd.concat(changes, ignore_index=True).astype(CHANGE_DTYPES)
+
+
+def by_link_token(df):
+    return df.sort_values(['link_token', *(['column'] if 'column' in df else [])],
+                          ignore_index=True)
+
+
+def check_history(history, expected_history, expected_changes):
+    listings = history.get_listings().drop(columns=['days_on_market', 'price_change'])
+    pd.testing.assert_frame_equal(by_link_token(listings),
+                                  by_link_token(expected_history),
+                                  check_categorical=False)
+    pd.testing.assert_frame_equal(by_link_token(history.get_changes()),
+                                  by_link_token(expected_changes))
+
+
+def check_saved_snapshots(df, first_listings, directory):
+    """Checks the history saved and loaded between snapshots that delist listings, relist them and
+    change them in the same second as the relisting."""
+    snapshots = [(make_snapshot(df, 0.01), SEEN_AT, (True, )), (df, RELISTED_AT, (True, False)),
+                 (make_snapshot(df, 0.01, seed=2), RELISTED_AT, ())]
+    ListingsHistory(first_listings.copy(), directory).save()
+    expected_history, all_expected_changes = first_listings, list()
+    for snapshot, seen_at, delisting_for_sale_values in snapshots:
+        ListingsHistory.load(directory).ingest(snapshot, seen_at, delisting_for_sale_values).save()
+        expected_history, expected_changes = merge_ingest(expected_history, snapshot, seen_at,
+                                                          delisting_for_sale_values)
+        all_expected_changes.append(expected_changes)
+    history = ListingsHistory.load(directory)
+    check_history(history, expected_history, pd.concat(all_expected_changes, ignore_index=True))
+    # only the listings still on the market are rewritten by every save
+    assert history.listings.delisted_at.isna().all()
+    assert len(history.listings) == expected_history.delisted_at.isna().sum()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = pathlib.Path(temporary_directory)
+        for amount_of_listings in AMOUNTS_OF_LISTINGS:
+            df = make_listings_df(amount_of_listings)
+            history = ListingsHistory(directory=directory).ingest(df, FIRST_SEEN_AT, (True, False))
+            first_listings = history.listings.copy()
+            with tempfile.TemporaryDirectory() as history_directory:
+                check_saved_snapshots(df, first_listings, pathlib.Path(history_directory))
+            for changed_fraction in CHANGED_FRACTIONS:
+                snapshot = make_snapshot(df, changed_fraction)
+                history = ListingsHistory(first_listings.copy(), directory)
+                history.ingest(snapshot, SEEN_AT, (True, ))
+                check_history(history, *merge_ingest(first_listings, snapshot, SEEN_AT, (True, )))
+                ingest_seconds = min(
+                    timeit.repeat(lambda: ListingsHistory(first_listings.copy(), directory).ingest(
+                        snapshot, SEEN_AT, (True, )),
+                                  number=1,
+                                  repeat=3))
+                merge_seconds = min(
+                    timeit.repeat(lambda: merge_ingest(first_listings, snapshot, SEEN_AT, (True, )),
+                                  number=1,
+                                  repeat=3))
+                print(f'{amount_of_listings:>7} listings, {changed_fraction:.1%} new, changed and '
+                      f'delisted: ingest {ingest_seconds * 1000:.0f}ms, '
+                      f'merge {merge_seconds * 1000:.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
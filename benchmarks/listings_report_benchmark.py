@@ -0,0 +1,93 @@
+"""Generates the `ListingsReport` of synthetic listings, checks it's within its time budget, and
+checks its metrics, describe tables and houses by the beach against computing them from the listings
+of the same selections, like the app did. Also checks only the reports of the latest listings and
+of the ones before them, which running apps may still serve, are kept.
+
+Run with `python benchmarks/listings_report_benchmark.py`.
+"""
+import pathlib
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.analytics import clean_unknown_cities, get_describe_table
+from src.cities import CITIES
+from src.listings_cube import ListingsCube
+from src.listings_report import (ALL_CITIES, DEFAULT_PRICE_RANGE,
+                                 SECONDS_PER_MILLION_LISTINGS_BUDGET, ListingsReport,
+                                 get_listings_report)
+from src.listings_storage import compact_listings, write_listings
+from src.near_the_beach import NearTheBeachIndex
+
+AMOUNTS_OF_LISTINGS = [100000, 1000000]
+AMOUNT_OF_SELECTIONS = 20
+
+
+def select(df, english_cities):
+    return df[df.english_city.isin(english_cities)
+              & ((df.price > DEFAULT_PRICE_RANGE[0]) & (df.price < DEFAULT_PRICE_RANGE[1])
+                 | ~df.for_sale)]
+
+
+def check_report(df, report):
+    known_city_df = clean_unknown_cities(df)
+    cube = ListingsCube.from_listings(known_city_df)
+    english_cities = sorted(known_city_df.english_city.unique())
+    rng = np.random.default_rng(0)
+    for _ in range(AMOUNT_OF_SELECTIONS):
+        selected_cities = list(rng.choice(english_cities, rng.integers(1, 40), replace=False))
+        cube_metrics = cube.select(selected_cities, DEFAULT_PRICE_RANGE).get_metrics()
+        pd.testing.assert_frame_equal(report.get_metrics('city', selected_cities),
+                                      cube_metrics,
+                                      check_like=True)
+
+    region = next(iter(CITIES))
+    scopes = [('all', ALL_CITIES, english_cities), ('region', region, CITIES[region]),
+              ('city', english_cities[0], english_cities[:1])]
+    for scope, name, scope_cities in scopes:
+        for for_sale in (True, False):
+            expected = get_describe_table(select(known_city_df, scope_cities), for_sale)
+            actual = report.get_describe_table(scope, name, for_sale)
+            # the dates are averaged in nanoseconds as floats
+            pd.testing.assert_frame_equal(actual.drop(columns='date_listed'),
+                                          expected.drop(columns='date_listed').astype(float))
+            assert (pd.to_datetime(actual.date_listed.iloc[1:-1]) -
+                    pd.to_datetime(expected.date_listed.iloc[1:-1])).abs().max() < pd.Timedelta(
+                        1, unit='s')
+    pd.testing.assert_frame_equal(report.near_the_beach, NearTheBeachIndex(df).query())
+
+
+def check_keeps_latest_reports():
+    with tempfile.TemporaryDirectory() as directory:
+        listings_path = pathlib.Path(directory) / 'all_listings.parquet'
+        reports_directory = pathlib.Path(directory) / 'listings_reports'
+        for version, amount_of_listings in enumerate((1000, 1001, 1002)):
+            write_listings(make_listings_df(amount_of_listings), listings_path)
+            report = get_listings_report(listings_path, reports_directory)
+            assert report.summary['amount_of_listings'] == amount_of_listings
+            assert len(list(reports_directory.iterdir())) == min(version + 1, 2)
+
+
+def main():
+    check_keeps_latest_reports()
+    for amount_of_listings in AMOUNTS_OF_LISTINGS:
+        df = compact_listings(make_listings_df(amount_of_listings))
+        with tempfile.TemporaryDirectory() as directory:
+            report_directory = pathlib.Path(directory) / 'report'
+            ListingsReport.from_listings(df).save(report_directory)
+            check_report(df, ListingsReport.load(report_directory))
+            report_bytes = sum(path.stat().st_size for path in report_directory.iterdir())
+        seconds = min(timeit.repeat(lambda: ListingsReport.from_listings(df), number=1, repeat=3))
+        budget = SECONDS_PER_MILLION_LISTINGS_BUDGET * max(amount_of_listings / 1000000, 0.2)
+        print(f'{amount_of_listings:>7} listings: the report took {seconds:.2f}s of its '
+              f'{budget:.1f}s budget, and {report_bytes / 2**10:.0f}KiB')
+        assert seconds < budget, 'the report took longer than its time budget'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Compares the memory footprint of the listings as the app used to load them (the CSV with
+default dtypes and full links) to the compact frame it loads now.
+
+Run with `python benchmarks/memory_benchmark.py`.
+"""
+import pathlib
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.listings_storage import (compact_listings, get_links, get_listings_path,
+                                  get_memory_footprint, read_listings, write_listings)
+
+AMOUNTS_OF_LISTINGS = [100000, 1000000]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        for amount_of_listings in AMOUNTS_OF_LISTINGS:
+            df = make_listings_df(amount_of_listings)
+            previous_csv_path = directory / 'previous_all_listings.csv'
+            previous_format_df = df.assign(coordinates=list(zip(df.latitude, df.longitude)),
+                                           link=get_links(df.link_token))
+            previous_format_df.drop(columns=['latitude', 'longitude', 'link_token']).to_csv(
+                previous_csv_path, index=False)
+            path = get_listings_path('all_listings', directory=directory)
+            write_listings(df, path)
+            previous_df = pd.read_csv(previous_csv_path, parse_dates=['date_listed'])
+            # pandas versions before 3 load strings as python objects
+            string_columns = previous_df.select_dtypes('string').columns
+            previous_object_df = previous_df.astype(dict.fromkeys(string_columns, object))
+            compact_df = compact_listings(read_listings(path))
+            print(f'{amount_of_listings} listings: '
+                  f'previous {get_memory_footprint(previous_df) / 2**20:.0f}MiB '
+                  f'({get_memory_footprint(previous_object_df) / 2**20:.0f}MiB with object '
+                  f'strings), compact {get_memory_footprint(compact_df) / 2**20:.0f}MiB')
+            print(compact_df.memory_usage(deep=True).div(2**20).round(1).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Compares querying the `NearTheBeachIndex` to the previous full scan of `houses_by_the_beach`.
+tests/test_near_the_beach.py checks both find the same houses for the `THRESHOLDS`, and that
+querying leaves the listings unmodified.
+
+Run with `python benchmarks/near_the_beach_benchmark.py`.
+"""
+import pathlib
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.listings_storage import compact_listings, get_links
+from src.near_the_beach import HOUSE_PROPERTY_TYPES, NearTheBeachIndex
+
+AMOUNTS_OF_LISTINGS = [10000, 100000, 1000000]
+THRESHOLDS = [
+    dict(),
+    dict(max_distance=2000, max_area=120, property_types=('דירה', 'דירת גן')),
+    dict(max_distance=75, max_age=pd.Timedelta(3, unit='D')),
+    dict(max_distance=400, max_age=None),
+]
+
+
+def scan(df,
+         max_distance=700,
+         max_area=240,
+         property_types=HOUSE_PROPERTY_TYPES,
+         max_age=pd.Timedelta(4, unit='W')):
+    distance_from_beach = ((df.distance_from_beach / 50).round() * 50).astype(int)
+    if max_age is not None:
+        is_recent = df.date_listed > (pd.Timestamp.today() - max_age).to_pydatetime()
+    else:
+        is_recent = True
+    df = df[df.property_type.isin(property_types)
+            & (distance_from_beach < max_distance)
+            & (df.area < max_area)
+            & is_recent]
+    df = df[['price', 'city', 'area']].assign(distance_from_beach=distance_from_beach[df.index],
+                                              link=get_links(df.link_token))
+    return df.reset_index(drop=True)
+
+
+def main():
+    for amount_of_listings in AMOUNTS_OF_LISTINGS:
+        df = compact_listings(make_listings_df(amount_of_listings))
+        start = timeit.default_timer()
+        index = NearTheBeachIndex(df)
+        build_seconds = timeit.default_timer() - start
+        scan_seconds = min(timeit.repeat(lambda: scan(df), number=1, repeat=5))
+        query_seconds = min(timeit.repeat(lambda: index.query(), number=1, repeat=5))
+        print(f'{amount_of_listings:>7} listings: scan {scan_seconds * 1000:.1f}ms, '
+              f'index {query_seconds * 1000:.1f}ms (built once in {build_seconds * 1000:.0f}ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Times every graph of `other_graphs` on synthetic listings of growing sizes, and checks the graphs
+that used to loop over the rows in Python draw the same bars as before. Also checks rendering the
+graphs of new listings keeps those of the previous ones, which running apps may still serve.
+
+Run with `python benchmarks/other_graphs_benchmark.py`.
+"""
+import calendar
+import pathlib
+import sys
+import tempfile
+import timeit
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src import other_graphs
+from src.listings_storage import compact_listings, write_listings
+from src.rendered_graphs import get_rendered_graphs
+
+AMOUNTS_OF_LISTINGS = [10000, 100000, 1000000]
+GRAPH_NAMES = [f'graph{i}' for i in range(1, 9)]
+
+
+def previous_graph4(df):
+    plot = pd.Series([calendar.day_name[date.weekday()] for date in df.date_listed]).value_counts(). \
+        sort_index(
+        key=lambda day_names: [other_graphs.WEEKDAYS.index(day_name) for day_name in day_names]).plot.bar(
+        figsize=(5, 3))
+    plot.set_ylabel('Amount of Listings')
+    plot.set_title('Day of the Week Listed')
+    return plot.get_figure()
+
+
+def previous_graph6(df):
+    plot = pd.Series([date_listed.time().hour + date_listed.time().minute / 60 for date_listed in
+                      df.date_listed]) \
+        .hist(bins=48, figsize=(8, 3), grid=False)
+    plot.get_yaxis().set_visible(False)
+    plot.get_xaxis().set_ticks([i for i in range(0, 24)])
+    plot.set_xlabel('Hour')
+    plot.set_title('Time of Day Listings Were Posted')
+    return plot.get_figure()
+
+
+def previous_graph8(df):
+    temp_df = df.copy()
+    temp_df.property_type = temp_df.property_type.apply(lambda x: x[::-1])
+    plot = temp_df.property_type.value_counts().sort_index().plot.bar(figsize=(5, 3))
+    plot.set_xlabel('Property Type')
+    plot.set_ylabel('Amount of Listings')
+    plot.set_title('Distribution of Property Types')
+    return plot.get_figure()
+
+
+PREVIOUS_GRAPHS = dict(graph4=previous_graph4, graph6=previous_graph6, graph8=previous_graph8)
+
+
+def get_bars(figure):
+    axes = figure.axes[-1]
+    bars = [(patch.get_x(), patch.get_height()) for patch in axes.patches]
+    return bars, [label.get_text() for label in axes.get_xticklabels()]
+
+
+def draw(graph, df):
+    plt.close('all')
+    return graph(df)
+
+
+def get_previous_df(df):
+    # the previous graphs drew the listings read from the CSV, whose strings weren't categorical
+    return df.astype({column: object for column in df.select_dtypes('category').columns})
+
+
+def check_equivalence(df):
+    previous_df = get_previous_df(df)
+    for name, previous_graph in PREVIOUS_GRAPHS.items():
+        graph = getattr(other_graphs, name)
+        assert get_bars(draw(graph, df)) == get_bars(draw(previous_graph, previous_df)), name
+
+
+def check_keeps_previous_version():
+    with tempfile.TemporaryDirectory() as directory:
+        listings_path = pathlib.Path(directory) / 'all_listings.parquet'
+        rendered_graphs_directories = list()
+        for amount_of_listings in (1000, 1001, 1002):
+            write_listings(make_listings_df(amount_of_listings), listings_path)
+            rendered_graphs_directories.append(
+                get_rendered_graphs(listings_path,
+                                    pathlib.Path(directory) / 'rendered_graphs'))
+        assert [
+            rendered_graphs_directory.exists()
+            for rendered_graphs_directory in rendered_graphs_directories
+        ] == [False, True, True]
+
+
+def main():
+    matplotlib.use('Agg')
+    check_keeps_previous_version()
+    for amount_of_listings in AMOUNTS_OF_LISTINGS:
+        df = compact_listings(make_listings_df(amount_of_listings))
+        check_equivalence(df)
+        timings = {
+            name:
+            min(timeit.repeat(lambda: draw(getattr(other_graphs, name), df), number=1, repeat=3))
+            for name in GRAPH_NAMES
+        }
+        previous_df = get_previous_df(df)
+        previous_timings = {
+            name: min(timeit.repeat(lambda: draw(previous_graph, previous_df), number=1, repeat=3))
+            for name, previous_graph in PREVIOUS_GRAPHS.items()
+        }
+        descriptions = list()
+        for name, seconds in timings.items():
+            description = f'{name} {seconds * 1000:.0f}ms'
+            if name in previous_timings:
+                description += f' (previously {previous_timings[name] * 1000:.0f}ms)'
+            descriptions.append(description)
+        print(f'{amount_of_listings:>7} listings: ' + ', '.join(descriptions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Compares the batch feed parser to the previous parser, which built a pydantic model per item.
+
+Run from the `src` directory, like the crawler: `python ../benchmarks/parse_benchmark.py`.
+"""
+import datetime
+import pathlib
+import sys
+import timeit
+import typing
+
+import pandas as pd
+import pydantic
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_feed import make_feed_items
+from src.distance_from_beach import DistanceFromBeach
+from src.parse_listings import parse_feed_items
+
+AMOUNTS_OF_ITEMS = [1000, 10000, 100000]
+# coordinates the previous parser dropped the items of
+INVALID_COORDINATES = [
+    dict(latitude=None, longitude=None),
+    dict(latitude=32.0),
+    dict(latitude='north', longitude=34.8),
+    dict(latitude=float('nan'), longitude=34.8),
+    dict(latitude=32.0, longitude=float('inf')),
+]
+
+
+class Listing(pydantic.BaseModel):
+    date_listed: datetime.datetime
+    city: str
+    neighborhood: typing.Optional[str]
+    street: typing.Optional[str]
+    coordinates: typing.Optional[typing.Tuple[float, float]]
+    floor: int
+    rooms: int
+    area: int
+    price: int
+    for_sale: bool
+    distance_from_beach: int
+    property_type: str
+    link: str
+
+
+def get_floor(raw_listing):
+    for attribute in raw_listing['row_4']:
+        if attribute['key'] == 'floor':
+            if attribute['value'] == 'קרקע':
+                return 0
+            return attribute['value']
+    raise ValueError('this listing doesn\'t have a floor number')
+
+
+def parse_per_model(raw_listings, for_sale, distance_calculator):
+    listings = list()
+    for raw_listing in raw_listings:
+        try:
+            coordinates = (raw_listing['coordinates']['latitude'],
+                           raw_listing['coordinates']['longitude'])\
+                if raw_listing['coordinates'] else None
+            listing = Listing(floor=get_floor(raw_listing),
+                              rooms=raw_listing['Rooms_text'],
+                              area=raw_listing['square_meters'],
+                              city=raw_listing['city'],
+                              street=raw_listing.get('street'),
+                              coordinates=coordinates,
+                              date_listed=datetime.datetime.fromisoformat(
+                                  raw_listing['date_added']),
+                              price=int(raw_listing['price'].split(' ')[0].replace(',', '')),
+                              neighborhood=raw_listing.get('neighborhood'),
+                              for_sale=for_sale,
+                              distance_from_beach=distance_calculator.calculate(coordinates)
+                              if coordinates else None,
+                              property_type=raw_listing['HomeTypeID_text'],
+                              link=f'https://www.yad2.co.il/item/{raw_listing["link_token"]}')
+            listings.append(listing)
+        except (KeyError, ValueError, pydantic.ValidationError):
+            pass
+    df = pd.DataFrame(listing.model_dump() for listing in listings)
+    latitude, longitude = zip(*df.pop('coordinates'))
+    df.insert(4, 'latitude', latitude)
+    df.insert(5, 'longitude', longitude)
+    df['link'] = df.link.str.removeprefix('https://www.yad2.co.il/item/')
+    df = df.rename(columns=dict(link='link_token'))
+    return df
+
+
+def add_invalid_coordinates(raw_listings):
+    """Returns the raw listings with copies of some of them with every kind of invalid
+    coordinates."""
+    return raw_listings + [
+        raw_listing | dict(coordinates=coordinates, link_token=f'{raw_listing["link_token"]}c{i}')
+        for i, coordinates in enumerate(INVALID_COORDINATES) for raw_listing in raw_listings[:10]
+    ]
+
+
+def main():
+    distance_calculator = DistanceFromBeach()
+    for amount_of_items in AMOUNTS_OF_ITEMS:
+        raw_listings = add_invalid_coordinates(make_feed_items(amount_of_items))
+        expected = parse_per_model(raw_listings, True, distance_calculator)
+        actual, rejected = parse_feed_items(raw_listings, True, distance_calculator)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+        per_model_seconds = min(
+            timeit.repeat(lambda: parse_per_model(raw_listings, True, distance_calculator),
+                          number=1,
+                          repeat=3))
+        batch_seconds = min(
+            timeit.repeat(lambda: parse_feed_items(raw_listings, True, distance_calculator),
+                          number=1,
+                          repeat=3))
+        print(f'{amount_of_items:>7} items: per model {per_model_seconds:.3f}s, '
+              f'batch {batch_seconds:.3f}s ({per_model_seconds / batch_seconds:.1f}x), '
+              f'rejected {dict(rejected)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compares describing the listings of every city, region and all of the cities by merging
+`QuantileSketches` to the exact groupby of `ListingsReport`, and the report with sketches to the
+exact one, printing the error of the rent yields of the area bins of the sketches.
+tests/test_quantile_sketches.py checks the sketches are within their error bound.
+
+Run with `python benchmarks/quantile_sketches_benchmark.py`.
+"""
+import pathlib
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.analytics import clean_unknown_cities
+from src.cities import REGION_BY_CITY
+from src.listings_report import ALL_CITIES, ListingsReport, _describe, _get_described_columns
+from src.listings_storage import compact_listings
+from src.quantile_sketches import QuantileSketches
+
+AMOUNTS_OF_LISTINGS = [100000, 1000000]
+
+
+def make_sketches(df, columns):
+    return QuantileSketches.from_listings(df.assign(name=df.english_city.astype(str)),
+                                          ['name', 'for_sale'], columns)
+
+
+def describe_with_sketches(df, columns):
+    sketches = make_sketches(df, columns)
+    all_cities = dict.fromkeys(df.english_city.astype(str).unique(), ALL_CITIES)
+    return [
+        scope_sketches.get_describe_tables()
+        for scope_sketches in (sketches, sketches.merge(REGION_BY_CITY), sketches.merge(all_cities))
+    ]
+
+
+def describe_exactly(df):
+    english_cities = df.english_city.astype(str)
+    return [
+        _describe(df, english_cities),
+        _describe(df, english_cities.map(REGION_BY_CITY)),
+        _describe(df, pd.Series(ALL_CITIES, index=df.index))
+    ]
+
+
+def main():
+    for amount_of_listings in AMOUNTS_OF_LISTINGS:
+        df = clean_unknown_cities(compact_listings(make_listings_df(amount_of_listings)))
+        columns = _get_described_columns(df)
+        exact_report = ListingsReport.from_listings(df)
+        sketches_report = ListingsReport.from_listings(df, use_sketches=True)
+        rent_yield_error = (sketches_report.metrics.rent_yield / exact_report.metrics.rent_yield -
+                            1).abs().max()
+
+        exact_seconds = min(timeit.repeat(lambda: describe_exactly(df), number=1, repeat=3))
+        sketches_seconds = min(
+            timeit.repeat(lambda: describe_with_sketches(df, columns), number=1, repeat=3))
+        exact_report_seconds = min(
+            timeit.repeat(lambda: ListingsReport.from_listings(df), number=1, repeat=3))
+        sketches_report_seconds = min(
+            timeit.repeat(lambda: ListingsReport.from_listings(df, use_sketches=True),
+                          number=1,
+                          repeat=3))
+        print(f'{amount_of_listings:>7} listings: describing every scope took '
+              f'{exact_seconds:.2f}s exactly and {sketches_seconds:.2f}s with sketches, the '
+              f'report {exact_report_seconds:.2f}s and {sketches_report_seconds:.2f}s, with rent '
+              f'yields within {rent_yield_error:.2%}')
+
+
+if __name__ == '__main__':
+    main()
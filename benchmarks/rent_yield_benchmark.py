@@ -0,0 +1,53 @@
+"""Compares `get_rent_yield_by_city` to the previous per-city loop of `graph8`, which
+tests/test_analytics.py checks returns the same yields.
+
+Run with `python benchmarks/rent_yield_benchmark.py`.
+"""
+import pathlib
+import sys
+import timeit
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.analytics import MAX_AMOUNT_OF_BINS, MIN_IN_EACH_BIN, get_rent_yield_by_city
+
+AMOUNTS_OF_LISTINGS = [10000, 100000, 1000000]
+# `None` spreads the listings over all of the cities of `CITIES`
+AMOUNTS_OF_CITIES = [50, None]
+
+
+def get_rent_yield_by_city_per_city(df):
+    dfs = list()
+    for city in df.english_city.unique():
+        x = df[df.english_city == city]
+        number_of_bins = min(MAX_AMOUNT_OF_BINS, int(x.shape[0] / MIN_IN_EACH_BIN))
+        dfs.append(x.assign(area_bin=pd.qcut(x.area, number_of_bins, duplicates='drop')))
+
+    y = pd.concat(dfs).groupby(['english_city', 'area_bin', 'for_sale'], observed=True) \
+        .agg({'price': ['mean', 'count']}).unstack().dropna().reset_index()
+    return y.groupby('english_city', observed=True).apply(
+        lambda z: np.average(z['price']['mean'][False] * 12 / z['price']['mean'][True],
+                             weights=z['price']['count'][False] + z['price']['count'][True]))
+
+
+def main():
+    # the previous loop drops columns of an unsorted multi-index, which pandas warns about
+    warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+    for amount_of_cities in AMOUNTS_OF_CITIES:
+        for amount_of_listings in AMOUNTS_OF_LISTINGS:
+            df = make_listings_df(amount_of_listings, amount_of_cities=amount_of_cities)
+            per_city_seconds = min(
+                timeit.repeat(lambda: get_rent_yield_by_city_per_city(df), number=1, repeat=3))
+            vectorized_seconds = min(
+                timeit.repeat(lambda: get_rent_yield_by_city(df), number=1, repeat=3))
+            print(f'{df.english_city.nunique():>5} cities, {amount_of_listings:>7} listings: '
+                  f'per city {per_city_seconds:.3f}s, vectorized {vectorized_seconds:.3f}s '
+                  f'({per_city_seconds / vectorized_seconds:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compares loading the listings from the previous CSV file to the columnar storage formats, and
+checks the listings are found in whichever format the crawler last wrote them in.
+
+Run with `python benchmarks/storage_benchmark.py`.
+"""
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic_listings import make_listings_df
+from src.listings_storage import (STORAGE_FORMATS, find_listings_path, get_listings_path,
+                                  read_listings, write_listings)
+
+AMOUNTS_OF_LISTINGS = [100000, 1000000]
+
+
+def write_previous_csv(df, path):
+    df = df.assign(coordinates=list(zip(df.latitude, df.longitude)))
+    df.drop(columns=['latitude', 'longitude']).to_csv(path, index=False)
+
+
+def read_previous_csv(path):
+    return pd.read_csv(path, parse_dates=['date_listed'])
+
+
+def measure(read, path):
+    start = time.perf_counter()
+    df = read(path)
+    seconds = time.perf_counter() - start
+    return (f'load {seconds:.2f}s, memory {df.memory_usage(deep=True).sum() / 2**20:.0f}MiB, '
+            f'file {path.stat().st_size / 2**20:.0f}MiB')
+
+
+def check_find_listings_path(df):
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        paths = {
+            storage_format: get_listings_path('all_listings', storage_format, directory)
+            for storage_format in STORAGE_FORMATS
+        }
+        assert find_listings_path('all_listings', directory) == paths['parquet']
+        # written oldest first, a second apart since file times may be coarse. The CSV is read
+        # last, since the crawler may export it next to the format it wrote.
+        expected_formats = [('csv', 'csv'), ('feather', 'feather'), ('parquet', 'parquet'),
+                            ('csv', 'parquet')]
+        for written_at, (storage_format, expected_format) in enumerate(expected_formats):
+            write_listings(df, paths[storage_format])
+            os.utime(paths[storage_format], (written_at, written_at))
+            assert find_listings_path('all_listings', directory) == paths[expected_format]
+
+
+def main():
+    check_find_listings_path(make_listings_df(100))
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        for amount_of_listings in AMOUNTS_OF_LISTINGS:
+            df = make_listings_df(amount_of_listings)
+            previous_csv_path = directory / 'previous_all_listings.csv'
+            write_previous_csv(df, previous_csv_path)
+            print(f'{amount_of_listings} listings')
+            print(f'  previous csv: {measure(read_previous_csv, previous_csv_path)}')
+            for storage_format in STORAGE_FORMATS:
+                path = get_listings_path('all_listings', storage_format, directory)
+                write_listings(df, path)
+                print(f'  {storage_format}: {measure(read_listings, path)}')
+
+
+if __name__ == '__main__':
+    main()
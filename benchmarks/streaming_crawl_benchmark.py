@@ -0,0 +1,199 @@
+"""Checks that a crawl interrupted midway and resumed from its checkpoint writes the same listings
+and seen listings as an uninterrupted crawl, also with slow pages and fewer pages in flight than
+regions, as does a crawl with fewer pages in flight than regions, and that an incremental crawl drops the listings of previous crawls once they're too old,
+and measures the memory the crawl holds for growing amounts of pages.
+
+Run with `python benchmarks/streaming_crawl_benchmark.py`.
+"""
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+import httpx
+import pandas as pd
+
+# set before the listings modules are imported, so they never touch the real data
+DATA_DIRECTORY = pathlib.Path(tempfile.mkdtemp(prefix='yad2_benchmark_'))
+os.environ['YAD2_DATA_DIRECTORY'] = str(DATA_DIRECTORY)
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.fake_yad2 import FakeYad2
+from benchmarks.synthetic_cbs import make_city_populations_excel
+from src import get_all_listings_df
+from src.city_populations import refresh_city_populations
+from src.crawl_checkpoint import CHECKPOINT_LOG_NAME, CRAWL_DIRECTORY
+from src.listings_storage import get_listings_path, read_listings
+from src.page_fetcher import PageFetcher
+from src.seen_listings import SEEN_LISTINGS_PATH
+
+PAGES_PER_REGION = [8, 32, 128]
+INTERRUPTED_AFTER_REQUESTS = [5, 60, 150]
+# few enough pages in flight that chunks are parsed while the first pages of regions are fetched
+FEW_IN_FLIGHT_PAGES = 3
+# the same for all of the crawls compared
+NEWEST_DATE_ADDED = datetime.datetime.now().replace(microsecond=0)
+
+
+class Interrupted(BaseException):
+    """Raised by the fake feed like a KeyboardInterrupt, so it isn't retried."""
+
+
+class InterruptedFakeYad2(FakeYad2):
+
+    def __init__(self, interrupted_after_requests, **kwargs):
+        super().__init__(**kwargs)
+        self.interrupted_after_requests = interrupted_after_requests
+
+    async def handle(self, request: httpx.Request):
+        if self.requests == self.interrupted_after_requests:
+            raise Interrupted()
+        return await super().handle(request)
+
+
+class MemoryTrackingFakeYad2(FakeYad2):
+    """Samples the memory traced while the crawl is fetching pages."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.max_traced_memory = 0
+
+    async def handle(self, request: httpx.Request):
+        self.max_traced_memory = max(self.max_traced_memory, tracemalloc.get_traced_memory()[0])
+        return await super().handle(request)
+
+
+def crawl(fake_yad2, incremental=False):
+    asyncio.run(
+        get_all_listings_df.save_preprocessed_listings(PageFetcher(requests_per_second=10000,
+                                                                   transport=fake_yad2.transport),
+                                                       incremental=incremental))
+    return read_listings(get_listings_path('preprocessed_listings')), SEEN_LISTINGS_PATH.read_text()
+
+
+@contextlib.contextmanager
+def limit_in_flight_pages(max_in_flight_pages):
+    previous_max_in_flight_pages = get_all_listings_df.MAX_IN_FLIGHT_PAGES
+    get_all_listings_df.MAX_IN_FLIGHT_PAGES = max_in_flight_pages
+    try:
+        yield
+    finally:
+        get_all_listings_df.MAX_IN_FLIGHT_PAGES = previous_max_in_flight_pages
+
+
+def check_resume(latency_seconds=0.0):
+    fake_yad2 = FakeYad2(pages_per_region=20, newest_date_added=NEWEST_DATE_ADDED, overlap=5)
+    SEEN_LISTINGS_PATH.unlink(missing_ok=True)
+    expected_df, expected_seen_listings = crawl(fake_yad2)
+    assert set(fake_yad2.pages_served.values()) == {1}, 'a page was requested more than once'
+    assert not expected_df.link_token.duplicated().any()
+    for interrupted_after_requests in INTERRUPTED_AFTER_REQUESTS:
+        SEEN_LISTINGS_PATH.unlink()
+        try:
+            crawl(
+                InterruptedFakeYad2(interrupted_after_requests,
+                                    pages_per_region=20,
+                                    newest_date_added=NEWEST_DATE_ADDED,
+                                    overlap=5,
+                                    latency_seconds=latency_seconds))
+            raise AssertionError('the crawl was not interrupted')
+        except Interrupted:
+            pass
+        records = [
+            json.loads(line)
+            for line in (CRAWL_DIRECTORY / CHECKPOINT_LOG_NAME).read_text().splitlines()[1:]
+        ]
+        assert all(record['last_page'] is not None
+                   for record in records), 'a chunk was recorded without the pages of its region'
+        resumed_fake_yad2 = FakeYad2(pages_per_region=20,
+                                     newest_date_added=NEWEST_DATE_ADDED,
+                                     overlap=5,
+                                     latency_seconds=latency_seconds)
+        df, seen_listings = crawl(resumed_fake_yad2)
+        pd.testing.assert_frame_equal(df, expected_df)
+        assert seen_listings == expected_seen_listings
+        print(f'interrupted after {interrupted_after_requests} requests ({len(records)} chunks, '
+              f'{latency_seconds * 1000:.0f}ms per page, at most '
+              f'{get_all_listings_df.MAX_IN_FLIGHT_PAGES} pages in flight): resumed with '
+              f'{resumed_fake_yad2.requests} more requests instead of {fake_yad2.requests}')
+
+
+def check_few_in_flight_pages():
+    # every region holds the pages of its chunk until it's parsed, so with fewer pages in flight
+    # than regions the chunks are parsed before they're full
+    SEEN_LISTINGS_PATH.unlink()
+    expected_df, expected_seen_listings = crawl(
+        FakeYad2(pages_per_region=20, newest_date_added=NEWEST_DATE_ADDED, overlap=5))
+    with limit_in_flight_pages(FEW_IN_FLIGHT_PAGES):
+        SEEN_LISTINGS_PATH.unlink()
+        df, seen_listings = crawl(
+            FakeYad2(pages_per_region=20, newest_date_added=NEWEST_DATE_ADDED, overlap=5))
+    pd.testing.assert_frame_equal(df, expected_df)
+    assert seen_listings == expected_seen_listings
+
+
+def check_incremental():
+    # the older listings of the first crawl are too old by the time of the incremental one, and
+    # those a day newer are still recent however long the crawls take
+    oldest_date_added = NEWEST_DATE_ADDED - get_all_listings_df.LISTINGS_MAX_AGE
+    SEEN_LISTINGS_PATH.unlink()
+    previous_df, _ = crawl(
+        FakeYad2(pages_per_region=20,
+                 newest_date_added=oldest_date_added + datetime.timedelta(days=2)))
+    df, seen_listings = crawl(FakeYad2(pages_per_region=2,
+                                       newest_date_added=NEWEST_DATE_ADDED,
+                                       seed=1),
+                              incremental=True)
+    is_stale = previous_df.date_listed < oldest_date_added
+    is_recent = previous_df.date_listed >= oldest_date_added + datetime.timedelta(days=1)
+    assert is_stale.any() and is_recent.any()
+    kept_stale_link_tokens = set(previous_df.link_token[is_stale]) & set(df.link_token)
+    assert not kept_stale_link_tokens, 'a stale listing was kept'
+    assert set(previous_df.link_token[is_recent]) <= set(df.link_token)
+    seen_link_tokens = {
+        link_token
+        for feed in json.loads(seen_listings).values()
+        for link_token in feed['link_tokens']
+    }
+    assert not set(previous_df.link_token[is_stale]) & seen_link_tokens
+    print(f'incremental crawl: dropped the {is_stale.sum()} stale listings of the previous crawl')
+
+
+def main():
+    content = make_city_populations_excel()
+    refresh_city_populations(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=content)))
+    check_resume()
+    # chunks are parsed early while the first pages of other regions are still being fetched
+    with limit_in_flight_pages(FEW_IN_FLIGHT_PAGES):
+        check_resume(latency_seconds=0.01)
+    check_few_in_flight_pages()
+    check_incremental()
+    tracemalloc.start()
+    for pages_per_region in PAGES_PER_REGION:
+        fake_yad2 = MemoryTrackingFakeYad2(pages_per_region=pages_per_region)
+        # the pages are made ahead of time, so only the memory of the crawl itself is traced
+        for for_sale in (True, False):
+            for region_code in get_all_listings_df.RegionCodes:
+                for page in range(1, pages_per_region + 1):
+                    fake_yad2.get_feed_items(for_sale, int(region_code), page)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        df, _ = crawl(fake_yad2)
+        print(
+            f'{pages_per_region:>3} pages per region ({len(df)} listings): the crawl held at most '
+            f'{(fake_yad2.max_traced_memory - baseline) / 2**20:.1f}MiB while fetching, '
+            f'{(tracemalloc.get_traced_memory()[1] - baseline) / 2**20:.1f}MiB at its peak')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(DATA_DIRECTORY, ignore_errors=True)
@@ -0,0 +1,26 @@
+import io
+
+import pandas as pd
+
+# the names are spelled like in the Central Bureau of Statistics spreadsheet
+CITIES = [('תל אביב -יפו', 'Tel Aviv - Yafo', 467875), ('חיפה', 'Haifa', 285316),
+          ('ירושלים', 'Jerusalem', 951100), ('באר שבע', 'Be\'er Sheva', 209687),
+          ('נתניה', 'Netanya', 221353), ('אשדוד', 'Ashdod', 225939),
+          ('הרצלייה', 'Herzliyya', 97470), ('רחובות', 'Rehovot', 143904)]
+AMOUNT_OF_SMALL_LOCALITIES = 1200
+HEADER_ROW = 7
+AMOUNT_OF_FOOTER_ROWS = 7
+
+
+def make_city_populations_excel():
+    """Returns a spreadsheet laid out like the Central Bureau of Statistics localities table."""
+    cities = CITIES + [(f'יישוב {i}', f'Locality {i}', 500 + i * 37)
+                       for i in range(AMOUNT_OF_SMALL_LOCALITIES)]
+    rows = [[f'title {i}'] + [None] * 9 for i in range(HEADER_ROW)]
+    rows.append(['code', 'district', 'name', 'd', 'e', 'f', 'g', 'population', 'i', 'english'])
+    for i, (hebrew_city, english_city, city_population) in enumerate(cities):
+        rows.append([i, 'district', hebrew_city, 0, 0, 0, 0, city_population, 0, english_city])
+    rows += [[f'footnote {i}'] + [None] * 9 for i in range(AMOUNT_OF_FOOTER_ROWS)]
+    content = io.BytesIO()
+    pd.DataFrame(rows).to_excel(content, header=False, index=False)
+    return content.getvalue()
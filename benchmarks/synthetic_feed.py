@@ -0,0 +1,36 @@
+import random
+
+CITIES = ['תל אביב יפו', 'חיפה', 'ירושלים', 'באר שבע', 'נתניה', 'אשדוד', 'הרצליה', 'רחובות']
+PROPERTY_TYPES = ['דירה', 'דירת גן', 'פנטהאוז', 'בית פרטי/קוטג\'', 'דופלקס', 'דו משפחתי']
+
+
+def make_feed_item(rng: random.Random, link_token, for_sale=True):
+    floor = rng.choice(['קרקע', *range(1, 20)])
+    price = rng.randrange(600000, 8000000, 1000) if for_sale else rng.randrange(1500, 20000, 100)
+    item = dict(
+        row_4=[
+            dict(key='rooms', value=rng.randint(1, 7)),
+            dict(key='floor', value=floor),
+            dict(key='SquareMeter', value=rng.randint(30, 300))
+        ],
+        Rooms_text=str(rng.choice([1, 2, 3, 3.5, 4, 5, 6])),
+        square_meters=rng.randint(30, 300),
+        city=rng.choice(CITIES),
+        street=rng.choice([None, 'הרצל', 'ויצמן', 'בן גוריון']),
+        neighborhood=rng.choice([None, 'מרכז העיר', 'הדר', 'רמות']),
+        coordinates=dict(latitude=rng.uniform(29.5, 33.2), longitude=rng.uniform(34.3, 35.6))
+        if rng.random() > 0.1 else {},
+        date_added=f'2026-{rng.randint(7, 10):02}-{rng.randint(1, 28):02} '
+        f'{rng.randint(0, 23):02}:{rng.randint(0, 59):02}:00',
+        price=rng.choice([f'{price:,} ₪'] * 19 + ['לא צוין מחיר']),
+        HomeTypeID_text=rng.choice(PROPERTY_TYPES),
+        link_token=link_token,
+    )
+    if rng.random() < 0.01:
+        del item['city']
+    return item
+
+
+def make_feed_items(amount, seed=0, for_sale=True):
+    rng = random.Random(seed)
+    return [make_feed_item(rng, f'{seed}x{i}', for_sale) for i in range(amount)]
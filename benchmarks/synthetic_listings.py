@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from src.cities import CITIES
+from src.listings_storage import with_listing_dtypes
+
+PROPERTY_TYPES = ['דירה', 'דירת גן', 'פנטהאוז', 'בית פרטי/קוטג\'', 'דופלקס', 'דו משפחתי']
+
+
+def make_listings_df(amount_of_listings, seed=0, amount_of_cities=None) -> pd.DataFrame:
+    """Returns listings shaped like `all_listings`, spread over the cities of `CITIES`."""
+    rng = np.random.default_rng(seed)
+    english_cities = sorted(set().union(*CITIES.values()))
+    if amount_of_cities is not None:
+        english_cities = [
+            f'{english_cities[i % len(english_cities)]} {i}' for i in range(amount_of_cities)
+        ]
+    city_populations = rng.integers(2000, 1000000, len(english_cities))
+    # a few big cities hold most of the listings, like in the real data
+    city_weights = rng.pareto(1.2, len(english_cities)) + 0.05
+    city_indices = rng.choice(len(english_cities),
+                              amount_of_listings,
+                              p=city_weights / city_weights.sum())
+    for_sale = rng.random(amount_of_listings) < 0.6
+    area = rng.integers(30, 250, amount_of_listings)
+    price_per_sqm = rng.lognormal(10, 0.3, len(english_cities))[city_indices]
+    price = np.where(for_sale, np.clip(area * price_per_sqm, 600000, 19900000),
+                     np.clip(area * price_per_sqm * 0.003, 1500, 29000)).astype(int)
+    english_city = np.array(english_cities)[city_indices]
+    return with_listing_dtypes(
+        pd.DataFrame(
+            dict(date_listed=pd.Timestamp.today().normalize() -
+                 pd.to_timedelta(rng.integers(0, 16 * 7 * 24 * 60, amount_of_listings), unit='min'),
+                 city=np.char.add('עיר ', english_city),
+                 neighborhood=rng.choice(['מרכז', 'צפון', 'דרום', None], amount_of_listings),
+                 street=rng.choice(['הרצל', 'ויצמן', 'בן גוריון', None], amount_of_listings),
+                 latitude=rng.uniform(29.5, 33.2, amount_of_listings),
+                 longitude=rng.uniform(34.3, 35.6, amount_of_listings),
+                 floor=rng.integers(0, 20, amount_of_listings),
+                 rooms=rng.integers(1, 7, amount_of_listings),
+                 area=area,
+                 price=price,
+                 for_sale=for_sale,
+                 distance_from_beach=rng.integers(0, 60000, amount_of_listings),
+                 property_type=rng.choice(PROPERTY_TYPES, amount_of_listings),
+                 link_token=[f'{seed}x{i}' for i in range(amount_of_listings)],
+                 city_population=city_populations[city_indices],
+                 english_city=english_city)))
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+MIN_IN_EACH_BIN = 3
+MAX_AMOUNT_OF_BINS = 10
+MIN_AMOUNT_OF_LISTINGS_IN_CITY = 9
+# the columns of the listings that aren't described
+UNDESCRIBED_COLUMNS = ['latitude', 'longitude', 'city_id']
+
+
+def clean_unknown_cities(df):
+    # About 1% of listings are in cities with a population of less than 2000,
+    # for simplicity we'll ignore them
+    df = df[~df.english_city.isna()]
+    # counted by the resolved city, which several spellings may share
+    listing_count_by_city = df.english_city.value_counts()
+    cities_to_ignore = set(
+        listing_count_by_city.
+        loc[lambda listing_count: listing_count < MIN_AMOUNT_OF_LISTINGS_IN_CITY].index)
+    df = df[~df.english_city.isin(cities_to_ignore)]
+    df = df.reset_index(drop=True)
+    return df
+
+
+def get_describe_table(df, for_sale) -> pd.DataFrame:
+    """Returns the statistics of every column of the listings for sale, or for rent."""
+    return df[df.for_sale == for_sale].drop(columns=UNDESCRIBED_COLUMNS, errors='ignore').describe()
+
+
+def get_rent_yield_by_city(df) -> pd.Series:
+    """Returns the annual rent yield of every city: the yearly rent compared to the sale price of
+    listings of a similar area, averaged over the area bins and weighted by their listings.
+
+    The listings of every city are split into up to `MAX_AMOUNT_OF_BINS` area quantiles like
+    `pd.qcut(..., duplicates='drop')` does, for all of the cities at once.
+    """
+    return get_weighted_rent_yield_by_city(df.english_city, df.area, df.for_sale,
+                                           np.ones(len(df), dtype=int), df.price)
+
+
+def get_weighted_rent_yield_by_city(english_city,
+                                    area,
+                                    for_sale,
+                                    amounts_of_listings,
+                                    price_sums,
+                                    area_sketches=None) -> pd.Series:
+    """Like `get_rent_yield_by_city`, for groups of listings of the same city, area and type,
+    given their amount and the sum of their prices.
+
+    With `area_sketches`, the `QuantileSketches` of the areas of every city by its name, the bin
+    edges are their quantiles instead of the exact ones, so the listings aren't sorted, see
+    `get_area_bin_edges`.
+    """
+    is_known_city = english_city.notna().to_numpy()
+    city_codes, cities = pd.factorize(english_city[is_known_city], sort=True)
+    amount_of_cities = len(cities)
+    area = np.asarray(area, dtype=float)[is_known_city]
+    amounts_of_listings = np.asarray(amounts_of_listings)[is_known_city]
+
+    edges = get_area_bin_edges(city_codes, cities, area, amounts_of_listings, area_sketches)
+    amounts_of_edges = (~np.isnan(edges)).sum(axis=1)
+
+    # a listing is in the bin of the edge it's above, and the lowest area is in the first bin
+    area_bins = np.maximum(1, (edges[city_codes] < area[:, None]).sum(axis=1))
+    binned = amounts_of_edges[city_codes] >= 2
+
+    for_sale = np.asarray(for_sale, dtype=bool)[is_known_city][binned]
+    keys = (city_codes[binned] * (MAX_AMOUNT_OF_BINS + 1) + area_bins[binned]) * 2 + for_sale
+    amount_of_keys = amount_of_cities * (MAX_AMOUNT_OF_BINS + 1) * 2
+    shape = (amount_of_cities, MAX_AMOUNT_OF_BINS + 1, 2)
+    price_sums = np.bincount(keys,
+                             weights=np.asarray(price_sums, dtype=float)[is_known_city][binned],
+                             minlength=amount_of_keys).reshape(shape)
+    price_counts = np.bincount(keys, weights=amounts_of_listings[binned],
+                               minlength=amount_of_keys).reshape(shape)
+
+    # only bins with listings both for rent and for sale are compared
+    with np.errstate(invalid='ignore', divide='ignore'):
+        price_means = price_sums / price_counts
+        yields = price_means[..., 0] * 12 / price_means[..., 1]
+    weights = np.where((price_counts > 0).all(axis=2), price_counts.sum(axis=2), 0)
+    has_yield = weights.sum(axis=1) > 0
+    weighted_yields = np.where(weights > 0, yields, 0) * weights
+    rent_yields = weighted_yields[has_yield].sum(axis=1) / weights[has_yield].sum(axis=1)
+    return pd.Series(rent_yields, index=pd.Index(cities[has_yield], name='english_city'))
+
+
+def get_area_bin_edges(city_codes, cities, area, amounts_of_listings, area_sketches=None):
+    """Returns the edges of the area bins of every city in a row like `pd.qcut` finds them, padded
+    with NaN, given the code of the city of every group of listings of the same area and their
+    amount.
+
+    With `area_sketches`, the edges are the quantiles of the sketches of the areas of `cities`
+    instead, so every edge is within the error bound of `QuantileSketches`: within
+    `RELATIVE_ACCURACY` of the larger of the two areas around the exact edge. Only the listings
+    that close to an edge may be in the bin next to their exact one.
+    """
+    amounts_in_city = np.bincount(city_codes, weights=amounts_of_listings,
+                                  minlength=len(cities)).astype(int)
+    numbers_of_bins = np.minimum(MAX_AMOUNT_OF_BINS, amounts_in_city // MIN_IN_EACH_BIN)
+    quantiles = _get_qcut_quantiles()[numbers_of_bins]
+    if area_sketches is None:
+        order = np.lexsort((area, city_codes))
+        city_starts = np.cumsum(amounts_in_city) - amounts_in_city
+        edges = get_sorted_quantiles(area[order], np.cumsum(amounts_of_listings[order]),
+                                     city_starts, amounts_in_city, quantiles)
+    else:
+        positions = area_sketches.find('area', cities)
+        edges = area_sketches.get_quantiles(quantiles, np.maximum(positions, 0))
+        # the cities without any area aren't binned
+        edges[positions < 0] = np.nan
+    # duplicate edges are dropped, unless they're the only two edges
+    duplicated = np.zeros_like(edges, dtype=bool)
+    duplicated[:, 1:] = edges[:, 1:] == edges[:, :-1]
+    edges[duplicated & (numbers_of_bins != 1)[:, None]] = np.nan
+    return edges
+
+
+def _get_qcut_quantiles():
+    """Returns the quantiles `pd.qcut` uses for every amount of bins up to `MAX_AMOUNT_OF_BINS`,
+    padded with NaN."""
+    all_quantiles = np.full((MAX_AMOUNT_OF_BINS + 1, MAX_AMOUNT_OF_BINS + 1), np.nan)
+    for number_of_bins in range(MAX_AMOUNT_OF_BINS + 1):
+        quantiles = np.linspace(0, 1, number_of_bins + 1)
+        # pandas rounds up the quantiles that aren't representable in base 2
+        np.putmask(quantiles, number_of_bins * quantiles != np.arange(number_of_bins + 1),
+                   np.nextafter(quantiles, 1))
+        all_quantiles[number_of_bins, :number_of_bins + 1] = quantiles
+    return all_quantiles
+
+
+def get_sorted_quantiles(sorted_values, cumulative_amounts, starts, amounts, quantiles):
+    """Returns the linearly interpolated quantiles of every run of `sorted_values`, with the same
+    arithmetic as `np.quantile`.
+
+    Every value stands for as many listings as its amount, so `cumulative_amounts` is the running
+    total of the amounts of the sorted values.
+    """
+    last_indices = np.maximum(amounts - 1, 0)[:, None]
+    virtual_indices = last_indices * quantiles
+    is_valid = ~np.isnan(virtual_indices)
+    previous_indices = np.floor(np.where(is_valid, virtual_indices, 0)).astype(int)
+    next_indices = np.minimum(previous_indices + 1, last_indices)
+    previous_indices = np.minimum(previous_indices, last_indices)
+    gamma = np.where(is_valid, virtual_indices, 0) - previous_indices
+    previous_values = _get_value_at(sorted_values, cumulative_amounts,
+                                    starts[:, None] + previous_indices)
+    next_values = _get_value_at(sorted_values, cumulative_amounts, starts[:, None] + next_indices)
+    difference = next_values - previous_values
+    values = np.where(gamma >= 0.5, next_values - difference * (1 - gamma),
+                      previous_values + difference * gamma)
+    return np.where(is_valid, values, np.nan)
+
+
+def _get_value_at(sorted_values, cumulative_amounts, listing_indices):
+    value_indices = np.searchsorted(cumulative_amounts, listing_indices, side='right')
+    return sorted_values[np.minimum(value_indices, len(sorted_values) - 1)]
@@ -49,3 +49,6 @@ LARGE_CITIES = {
     'Rishon LeZiyyon', 'Netanya', 'Ashdod', 'Be\'er Sheva', 'Holon', 'Ramat Gan', 'Rehovot',
     'Bat Yam'
 }
+
+# the region of every city of `CITIES`
+REGION_BY_CITY = {city: region for region, cities in CITIES.items() for city in cities}
@@ -0,0 +1,115 @@
+import pathlib
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from src.cities import CITIES, REGION_BY_CITY
+from src.city_populations import TYPOS, get_city_populations
+from src.listings_storage import DATA_DIRECTORY
+
+UNRESOLVED_CITIES_PATH = DATA_DIRECTORY / 'unresolved_cities.csv'
+# the region of a city that isn't in any of the regions of the app
+NO_REGION = ''
+
+
+class CityDictionary:
+    """The cities of the city populations table by an integer id, with their populations, their
+    regions in the app and every spelling of their names.
+
+    A city is spelled by its Hebrew name like on Yad2, its name in the spreadsheet before the
+    `TYPOS` were fixed, or its English name. The names are resolved by looking up only the distinct
+    names in a hash index, so resolving a categorical column costs a lookup per category and an
+    array take per listing. The ids are the rows of the table, so they're only comparable between
+    listings enriched with the same table.
+    """
+
+    def __init__(self, cities: pd.DataFrame, city_ids: pd.Series):
+        self.cities = cities
+        self.city_ids = city_ids
+        self._names = pd.Index(city_ids.index)
+        self._ids = city_ids.to_numpy()
+
+    @classmethod
+    def from_city_populations(cls, city_names_and_populations):
+        # the listings of a name used by several rows were enriched by the first one
+        cities = city_names_and_populations.drop_duplicates(subset='hebrew_city', ignore_index=True)
+        cities = cities.assign(
+            city_population=cities.city_population.astype(float).round().astype('Int32'),
+            region=pd.Categorical(cities.english_city.map(REGION_BY_CITY).fillna(NO_REGION),
+                                  categories=[NO_REGION, *CITIES]))
+        cities.index.name = 'city_id'
+        city_ids = pd.Series(cities.index, index=cities.hebrew_city)
+        english_city_ids = pd.Series(cities.index, index=cities.english_city)
+        misspelled_city_ids = pd.Series(city_ids.reindex(list(TYPOS.values())).to_numpy(),
+                                        index=list(TYPOS)).dropna().astype(city_ids.dtype)
+        city_ids = pd.concat([city_ids, english_city_ids, misspelled_city_ids])
+        # the Hebrew names come first, so they win over the same spelling of another city
+        city_ids = city_ids[(city_ids.index != '') & ~city_ids.index.duplicated()]
+        return cls(cities, city_ids.astype('int16').rename('city_id'))
+
+    def resolve(self, names) -> np.ndarray:
+        """Returns the ids of the cities spelled `names`, or -1 where a name isn't a known
+        spelling."""
+        names = pd.Series(names)
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            codes, categories = names.cat.codes.to_numpy(), names.cat.categories
+        else:
+            codes, categories = pd.factorize(names)
+        positions = self._names.get_indexer(categories)
+        # a missing name has the code -1, which takes the -1 appended last
+        category_ids = np.append(np.where(positions >= 0, self._ids[positions], -1), -1)
+        return category_ids[codes].astype('int16')
+
+    def enrich(self, df) -> pd.DataFrame:
+        """Returns the listings with the population and English name of their city, and its id,
+        all missing for the listings of unresolved cities."""
+        city_ids = self.resolve(df.city)
+        is_unresolved = city_ids < 0
+        city_populations = self.cities.city_population.array.take(city_ids, allow_fill=True)
+        english_cities = self.cities.english_city.array.take(city_ids, allow_fill=True)
+        city_ids = pd.arrays.IntegerArray(np.where(is_unresolved, 0, city_ids), is_unresolved)
+        return df.assign(city_population=city_populations,
+                         english_city=english_cities,
+                         city_id=city_ids)
+
+    def get_unresolved(self, names) -> pd.Series:
+        """Returns the amount of times every name that isn't a known spelling appears in
+        `names`."""
+        names = pd.Series(names)
+        unresolved = names[self.resolve(names) < 0].value_counts()
+        return unresolved[unresolved > 0].rename_axis('city').rename('amount_of_listings')
+
+    def get_unknown_region_cities(self) -> set:
+        """Returns the cities of the regions in the app that aren't in the table, by their English
+        names, which most likely means they're spelled differently."""
+        return set(REGION_BY_CITY) - set(self.city_ids.index)
+
+
+def get_city_dictionary() -> CityDictionary:
+    return CityDictionary.from_city_populations(get_city_populations())
+
+
+def write_unresolved_cities_report(unresolved_cities, path=UNRESOLVED_CITIES_PATH):
+    unresolved_cities.to_csv(path)
+
+
+def read_unresolved_cities_report(path=UNRESOLVED_CITIES_PATH) -> pd.Series:
+    if not path.exists():
+        return pd.Series(name='amount_of_listings', dtype=int).rename_axis('city')
+    return pd.read_csv(path, index_col='city').amount_of_listings
+
+
+if __name__ == '__main__':
+    city_dictionary = get_city_dictionary()
+    print(f'{len(city_dictionary.cities)} cities spelled {len(city_dictionary.city_ids)} ways')
+    print(city_dictionary.cities.region.value_counts().rename(index={
+        NO_REGION: 'no region'
+    }).to_string())
+    unknown_region_cities = city_dictionary.get_unknown_region_cities()
+    if unknown_region_cities:
+        print(f'cities of the regions that aren\'t in the table: {sorted(unknown_region_cities)}')
+    unresolved_cities = read_unresolved_cities_report()
+    print(f'{unresolved_cities.sum()} listings in {len(unresolved_cities)} unresolved cities')
+    print(unresolved_cities.to_string())
@@ -0,0 +1,109 @@
+import argparse
+import hashlib
+import io
+import json
+import pathlib
+import sys
+
+import httpx
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from src.listings_storage import DATA_DIRECTORY
+
+CENTRAL_BUREAU_OF_STATISTICS_EXCEL_URL = 'https://www.cbs.gov.il/he/publications/LochutTlushim/2020/%D7%90%D7%95%D7%9B%D7%9C%D7%95%D7%A1%D7%99%D7%99%D7%942020.xlsx'
+TYPOS = {
+    'תל אביב -יפו': 'תל אביב יפו',
+    'הרצלייה': 'הרצליה',
+    'קדימה-צורן': 'קדימה צורן',
+    'מודיעין-מכבים-רעות*': 'מודיעין מכבים רעות',
+    'קריית אונו': 'קרית אונו',
+    'יהוד-מונוסון': 'יהוד מונוסון',
+    'קריית גת': 'קרית גת',
+    'קריית מלאכי': 'קרית מלאכי',
+    'קריית עקרון': 'קרית עקרון',
+    'גבע בנימין': 'אדם - גבע בנימין',
+    'בית אריה-עופרים': 'בית אריה / עופרים',
+    'נהרייה': 'נהריה',
+    'קריית מוצקין': 'קרית מוצקין',
+    'קריית אתא': 'קרית אתא',
+    'קריית ביאליק': 'קרית ביאליק',
+    'קריית ים': 'קרית ים',
+    'פרדס חנה-כרכור': 'פרדס חנה כרכור',
+    'נוף הגליל': 'נצרת עילית / נוף הגליל',
+    'קריית שמונה': 'קרית שמונה',
+    'מעלות-תרשיחא': 'מעלות תרשיחא',
+    'קריית טבעון': 'קרית טבעון',
+    'בנימינה-גבעת עדה*': 'בנימינה גבעת עדה',
+    'מיתר': 'מיתר / כרמית',
+    'כוכב יאיר': 'כוכב יאיר / צור יגאל',
+    'סביון*': 'סביון',
+    'פרדסייה': 'פרדסיה',
+    'שער שומרון': 'שערי תקווה',
+    'קריית ארבע': 'קרית ארבע',
+    'בית יצחק-שער חפר': 'בית יצחק שער חפר',
+}
+CACHE_DIRECTORY = DATA_DIRECTORY / 'cache'
+CACHE_INDEX_PATH = CACHE_DIRECTORY / 'city_populations.json'
+
+
+def get_city_populations(url=CENTRAL_BUREAU_OF_STATISTICS_EXCEL_URL) -> pd.DataFrame:
+    """Returns the normalised city names and populations table, downloading it only if it isn't
+    cached yet."""
+    cache_entry = _load_cache_index().get(url)
+    if cache_entry is None or not (CACHE_DIRECTORY / cache_entry['file_name']).exists():
+        cache_entry = refresh_city_populations(url)
+    return pd.read_parquet(CACHE_DIRECTORY / cache_entry['file_name'])
+
+
+def refresh_city_populations(url=CENTRAL_BUREAU_OF_STATISTICS_EXCEL_URL, transport=None):
+    """Downloads the spreadsheet, and parses it unless a spreadsheet with the same content was
+    already cached for this url."""
+    with httpx.Client(transport=transport, follow_redirects=True, timeout=60) as client:
+        raw_response = client.get(url)
+        raw_response.raise_for_status()
+    url_hash = hashlib.sha256(url.encode()).hexdigest()[:16]
+    content_hash = hashlib.sha256(raw_response.content).hexdigest()[:16]
+    cache_entry = dict(file_name=f'city_populations_{url_hash}_{content_hash}.parquet',
+                       content_hash=content_hash)
+    CACHE_DIRECTORY.mkdir(exist_ok=True)
+    cache_path = CACHE_DIRECTORY / cache_entry['file_name']
+    if not cache_path.exists():
+        parse_city_populations(raw_response.content).to_parquet(cache_path, index=False)
+    cache_index = _load_cache_index()
+    cache_index[url] = cache_entry
+    CACHE_INDEX_PATH.write_text(json.dumps(cache_index, indent=2))
+    return cache_entry
+
+
+def parse_city_populations(content) -> pd.DataFrame:
+    city_names_and_populations = pd.read_excel(io.BytesIO(content),
+                                               usecols='C,H,J',
+                                               keep_default_na=False,
+                                               skipfooter=7,
+                                               header=7)
+    city_names_and_populations = city_names_and_populations.set_axis(
+        ['hebrew_city', 'city_population', 'english_city'], axis=1)
+
+    # fix specific cities to match
+    city_names_and_populations = city_names_and_populations.replace(TYPOS)
+    # the population column mixes numbers with empty strings, which parquet can't store
+    city_names_and_populations.city_population = pd.to_numeric(
+        city_names_and_populations.city_population, errors='coerce')
+    return city_names_and_populations
+
+
+def _load_cache_index():
+    if not CACHE_INDEX_PATH.exists():
+        return dict()
+    return json.loads(CACHE_INDEX_PATH.read_text())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--refresh',
+                        action='store_true',
+                        help='download the spreadsheet again and update the cached table')
+    if parser.parse_args().refresh:
+        refresh_city_populations()
+    print(get_city_populations())
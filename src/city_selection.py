@@ -0,0 +1,61 @@
+from src.cities import CITIES, LARGE_CITIES
+
+
+class CitySelection:
+    """The cities of the listings that can be selected, in alphabetical order, and the cities of
+    every region, as bitmasks over them.
+
+    A selection is a bitmask too, so checking a region, unchecking it or finding the regions of the
+    selected cities is an integer operation instead of building and intersecting sets of names on
+    every click. It only depends on the listings, so it's built once for them and shared by all of
+    the sessions.
+    """
+
+    def __init__(self, relevant_cities):
+        self.cities = sorted(relevant_cities)
+        self._bits = {city: 1 << position for position, city in enumerate(self.cities)}
+        self.all_mask = (1 << len(self.cities)) - 1
+        self.region_masks = {region: self.get_mask(cities) for region, cities in CITIES.items()}
+        # checked by default if they have a large city, even if it has no listings
+        self.default_regions = {
+            region: bool(LARGE_CITIES & cities)
+            for region, cities in CITIES.items()
+        }
+
+    @classmethod
+    def from_listings(cls, df):
+        return cls(df.english_city.dropna().unique())
+
+    def get_mask(self, cities) -> int:
+        """Returns the bitmask of `cities`, without those that have no listings."""
+        mask = 0
+        for city in cities:
+            mask |= self._bits.get(city, 0)
+        return mask
+
+    def get_cities(self, mask) -> list:
+        """Returns the cities of `mask`, in alphabetical order."""
+        cities = list()
+        while mask:
+            lowest_bit = mask & -mask
+            cities.append(self.cities[lowest_bit.bit_length() - 1])
+            mask ^= lowest_bit
+        return cities
+
+    def set_region(self, mask, region, is_selected) -> int:
+        """Returns the selection `mask` with all of the cities of `region` added or removed."""
+        if is_selected:
+            return mask | self.region_masks[region]
+        return mask & ~self.region_masks[region]
+
+    def get_region(self, mask):
+        """Returns the region whose cities are exactly the selection `mask`, if there's one."""
+        return next((region for region, region_mask in self.region_masks.items()
+                     if region_mask and region_mask == mask), None)
+
+    def get_regions(self, mask) -> dict:
+        """Returns whether any city of every region is in the selection `mask`."""
+        return {
+            region: bool(mask & region_mask)
+            for region, region_mask in self.region_masks.items()
+        }
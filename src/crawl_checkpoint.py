@@ -0,0 +1,134 @@
+import collections
+import json
+import shutil
+
+import pandas as pd
+
+from src.listings_storage import DATA_DIRECTORY, get_listings_path, read_listings, write_listings
+from src.parse_listings import LISTING_COLUMNS
+
+CRAWL_DIRECTORY = DATA_DIRECTORY / 'crawl'
+CHECKPOINT_LOG_NAME = 'checkpoint.jsonl'
+
+
+class CrawlCheckpoint:
+    """The chunks of listings written by a crawl so far, so an interrupted crawl resumes where it
+    stopped instead of starting over.
+
+    Every chunk holds the parsed listings of consecutive pages of a feed's region. A chunk is
+    written to its own file first, and only then recorded in an append-only log, along with the
+    link tokens and dates of the items of its pages (for the seen listings) and the amount of
+    rejected items. A crawl with other options than the checkpoint's starts over.
+    """
+
+    def __init__(self, options, directory=CRAWL_DIRECTORY):
+        self.options = options
+        self.directory = directory
+        self.records = list()
+        self._log = None
+
+    @classmethod
+    def open(cls, options, directory=CRAWL_DIRECTORY, restart=False):
+        checkpoint = cls(options, directory)
+        log_path = directory / CHECKPOINT_LOG_NAME
+        records = _read_log(log_path) if log_path.exists() else list()
+        if restart or not records or records[0] != dict(options=options):
+            shutil.rmtree(directory, ignore_errors=True)
+            directory.mkdir(parents=True)
+            log_path.write_text(json.dumps(dict(options=options)) + '\n')
+        else:
+            checkpoint.records = records[1:]
+            if checkpoint.records:
+                print(f'resuming the crawl from {len(checkpoint.records)} written chunks')
+        checkpoint._log = log_path.open('a')
+        return checkpoint
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def remove(self):
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get_written_pages(self, feed_name, region_code) -> dict:
+        """Returns the items of the pages of the region that were already written, by page."""
+        return {
+            int(page): [_to_raw_listing(item) for item in items]
+            for record in self.records
+            if record['feed'] == feed_name and record['region'] == region_code
+            for page, items in record['pages'].items()
+        }
+
+    def get_last_page(self, feed_name, region_code):
+        """Returns the amount of pages of the region, if a chunk of it was already written with
+        it."""
+        return next((record['last_page'] for record in self.records if record['feed'] == feed_name
+                     and record['region'] == region_code and record['last_page'] is not None), None)
+
+    def write_chunk(self, name, feed_name, region_code, last_page, df, rejected, pages):
+        path = get_listings_path(name, 'parquet', self.directory)
+        # renamed once complete, so a crawl killed while writing leaves no partial chunk behind
+        temporary_path = path.with_name(f'{name}.tmp.parquet')
+        write_listings(df, temporary_path)
+        temporary_path.replace(path)
+        record = dict(chunk=name,
+                      feed=feed_name,
+                      region=int(region_code),
+                      last_page=last_page,
+                      rejected=dict(rejected),
+                      pages={
+                          page: [_to_page_item(item) for item in items]
+                          for page, items in pages.items()
+                      })
+        self._log.write(json.dumps(record) + '\n')
+        self._log.flush()
+        self.records.append(record)
+
+    def get_rejected(self, feed_name) -> collections.Counter:
+        return sum((collections.Counter(record['rejected'])
+                    for record in self.records if record['feed'] == feed_name),
+                   collections.Counter())
+
+    def add_to_seen_listings(self, seen_listings):
+        # in the order of the chunks' names, like the listings, since the order they were written
+        # in depends on when their pages were fetched
+        for record in sorted(self.records, key=lambda record: record['chunk']):
+            for items in record['pages'].values():
+                seen_listings.add(record['feed'], record['region'],
+                                  [_to_raw_listing(item) for item in items])
+
+    def read_listings(self) -> pd.DataFrame:
+        """Returns the listings of all of the chunks, in the order of their names."""
+        paths = sorted(
+            get_listings_path(record['chunk'], 'parquet', self.directory)
+            for record in self.records)
+        if not paths:
+            return pd.DataFrame(columns=LISTING_COLUMNS)
+        return pd.concat([read_listings(path) for path in paths], ignore_index=True)
+
+
+def _read_log(path):
+    records = list()
+    for line in path.read_text().splitlines():
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            # the last line of a crawl killed while writing it
+            break
+    return records
+
+
+def _to_raw_listing(item):
+    link_token, date_added = item
+    raw_listing = dict()
+    if link_token is not None:
+        raw_listing['link_token'] = link_token
+    if date_added is not None:
+        raw_listing['date_added'] = date_added
+    return raw_listing
+
+
+def _to_page_item(raw_listing):
+    return [raw_listing.get('link_token'), raw_listing.get('date_added')]
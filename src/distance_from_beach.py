@@ -1,54 +1,151 @@
-import bisect
+import argparse
+import functools
 import json
 import pathlib
-from math import atan2, cos, radians, sin, sqrt
+
+import numpy as np
+from scipy.spatial import SphericalVoronoi, cKDTree
+
+# Radius of the Earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+# the beach points are about 40 meters apart along the coast, so larger leaves are cheaper to
+# search than deeper trees
+INDEX_LEAF_SIZE = 64
+# points farther than this from the beach can only be closest to the few beach points whose Voronoi
+# cells reach that far, so they are searched for among those
+FAR_FROM_BEACH_KM = 5
+FAR_INDEX_LEAF_SIZE = 16
+# latitude, longitude, the point as a unit vector and the farthest its Voronoi cell reaches
+BEACH_INDEX_COLUMNS = 6
+BEACH_COORDINATES_PATH = pathlib.Path(__file__).resolve().parents[1] / 'beach_coordinates.json'
+BEACH_INDEX_PATH = pathlib.Path(__file__).resolve().parents[1] / 'beach_index.npy'
 
 
 class DistanceFromBeach:
 
-    def __init__(self):
-        self.beach_coordinates = json.loads(pathlib.Path('../beach_coordinates.json').read_text())
-        self.latitude = [coordinates[0] for coordinates in self.beach_coordinates]
+    def __init__(self,
+                 beach_index_path=BEACH_INDEX_PATH,
+                 beach_coordinates_path=BEACH_COORDINATES_PATH):
+        if is_beach_index_stale(beach_index_path, beach_coordinates_path):
+            build_beach_index(beach_index_path, beach_coordinates_path)
+        beach_index = np.load(beach_index_path, mmap_mode='r')
+        if beach_index.shape[1] != BEACH_INDEX_COLUMNS:
+            build_beach_index(beach_index_path, beach_coordinates_path)
+            beach_index = np.load(beach_index_path, mmap_mode='r')
+        self.beach_coordinates = beach_index[:, :2]
+        self._unit_vectors = beach_index[:, 2:5]
+        self._reaches = beach_index[:, 5]
+
+    @functools.cached_property
+    def _principal_axes(self):
+        # the coast runs diagonally to the axes, which the KD-trees split along, so the points are
+        # rotated to split along and across the coast instead. A rotation keeps the distances.
+        return np.linalg.svd(self._unit_vectors - self._unit_vectors.mean(axis=0),
+                             full_matrices=False)[2]
+
+    @functools.cached_property
+    def index(self):
+        # the closest point by straight line on the unit sphere is also the closest point along
+        # the sphere, so a KD-tree over these finds the true nearest beach point
+        return cKDTree(self._unit_vectors @ self._principal_axes.T, leafsize=INDEX_LEAF_SIZE)
+
+    @functools.cached_property
+    def _far_beach_indices(self):
+        return np.flatnonzero(self._reaches >= FAR_FROM_BEACH_KM / EARTH_RADIUS_KM)
+
+    @functools.cached_property
+    def far_index(self):
+        return cKDTree(self._unit_vectors[self._far_beach_indices] @ self._principal_axes.T,
+                       leafsize=FAR_INDEX_LEAF_SIZE)
 
     def calculate(self, coordinates):
-        closest_index = find_closest_index(self.latitude, coordinates[0])
-        return haversine_distance(coordinates, self.beach_coordinates[closest_index])
+        return int(self.calculate_many(np.array([coordinates[0]]), np.array([coordinates[1]]))[0])
 
+    def calculate_many(self, latitudes, longitudes, max_relative_error=0.0):
+        """Returns the distance in meters from every point to the closest point of the beach.
 
-def find_closest_index(sorted_list, target):
-    # Find the insertion point of the target number in the sorted list
-    insertion_point = bisect.bisect_left(sorted_list, target)
+        The distances are exact by default. With `max_relative_error`, the returned beach point
+        may be a farther one, but never more than that fraction farther than the closest one, which
+        makes the search cheaper for points far from the coast.
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        if not latitudes.size:
+            return np.empty(0, dtype=int)
+        unit_vectors = to_unit_vectors(latitudes, longitudes) @ self._principal_axes.T
+        # points without a beach point closer than FAR_FROM_BEACH_KM get the index's size as the
+        # closest index. With the relative error, one closer than the bound might not be found.
+        far_from_beach = FAR_FROM_BEACH_KM / EARTH_RADIUS_KM * (1 + max_relative_error)
+        _, closest_indices = self.index.query(unit_vectors,
+                                              eps=max_relative_error,
+                                              distance_upper_bound=far_from_beach)
+        is_far = closest_indices == self.index.n
+        _, far_indices = self.far_index.query(unit_vectors[is_far], eps=max_relative_error)
+        closest_indices[is_far] = self._far_beach_indices[far_indices]
+        closest_latitudes, closest_longitudes = self.beach_coordinates[closest_indices].T
+        return haversine_distances(latitudes, longitudes, closest_latitudes, closest_longitudes)
 
-    # Determine the index of the closest number in the list
-    if insertion_point == 0:
-        closest_index = 0
-    elif insertion_point == len(sorted_list):
-        closest_index = len(sorted_list) - 1
-    else:
-        left_value = sorted_list[insertion_point - 1]
-        right_value = sorted_list[insertion_point]
-        closest_index = insertion_point - 1 if target - left_value < right_value - target\
-            else insertion_point
 
-    return closest_index
+@functools.cache
+def get_distance_from_beach():
+    return DistanceFromBeach()
 
 
-def haversine_distance(point1, point2):
-    # Convert latitude and longitude from degrees to radians
-    lat1, lon1, lat2, lon2 = map(radians, (point1[0], point1[1], point2[0], point2[1]))
+def is_beach_index_stale(beach_index_path=BEACH_INDEX_PATH,
+                         beach_coordinates_path=BEACH_COORDINATES_PATH):
+    # the index is compiled again when the beach coordinates were edited after it
+    return (not beach_index_path.exists()
+            or beach_index_path.stat().st_mtime < beach_coordinates_path.stat().st_mtime)
+
 
-    # Radius of the Earth in kilometers
-    earth_radius_km = 6371.0
+def build_beach_index(beach_index_path=BEACH_INDEX_PATH,
+                      beach_coordinates_path=BEACH_COORDINATES_PATH):
+    beach_coordinates = np.unique(np.array(json.loads(beach_coordinates_path.read_text())), axis=0)
+    unit_vectors = to_unit_vectors(beach_coordinates[:, 0], beach_coordinates[:, 1])
+    np.save(beach_index_path,
+            np.column_stack((beach_coordinates, unit_vectors, get_reaches(unit_vectors))))
+
+
+def get_reaches(unit_vectors):
+    """Returns the farthest distance on the unit sphere at which every point can be the closest one.
+
+    That is the farthest corner of the point's Voronoi cell: a point farther from all of the
+    points than some distance is closest to one of the points whose cell reaches that far.
+    """
+    # the beach points are a few meters apart, closer than the default threshold for duplicates
+    voronoi = SphericalVoronoi(unit_vectors, threshold=1e-10)
+    return np.array([
+        np.linalg.norm(voronoi.vertices[region] - unit_vector, axis=1).max()
+        for unit_vector, region in zip(unit_vectors, voronoi.regions)
+    ])
+
+
+def to_unit_vectors(latitudes, longitudes):
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    cos_latitudes = np.cos(latitudes)
+    return np.column_stack(
+        (cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes), np.sin(latitudes)))
+
+
+def haversine_distances(latitudes1, longitudes1, latitudes2, longitudes2):
+    # Convert latitude and longitude from degrees to radians
+    lat1, lon1, lat2, lon2 = map(np.radians, (latitudes1, longitudes1, latitudes2, longitudes2))
 
     # Haversine formula
     dlat = lat2 - lat1
     dlon = lon2 - lon1
-    a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    distance_meters = int(earth_radius_km * c * 1000)
+    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    distances_meters = (EARTH_RADIUS_KM * c * 1000).astype(int)
 
-    return distance_meters
+    return distances_meters
 
 
-# if __name__ == '__main__':
-#     print(DistanceFromBeach().calculate((33.204364, 35.571)))
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--build',
+                        action='store_true',
+                        help=f'compile {BEACH_COORDINATES_PATH.name} into {BEACH_INDEX_PATH.name}')
+    if parser.parse_args().build:
+        build_beach_index()
+    # print(DistanceFromBeach().calculate((33.204364, 35.571)))
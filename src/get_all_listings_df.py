@@ -1,54 +1,45 @@
+import argparse
 import asyncio
+import concurrent.futures
+import contextlib
 import datetime
 import enum
 import itertools
+import pathlib
 import typing
 
-import httpx
 import pandas as pd
-import pydantic
-import tenacity
 from tqdm import tqdm
 
-from src.distance_from_beach import DistanceFromBeach
+from src.city_dictionary import (get_city_dictionary, read_unresolved_cities_report,
+                                 write_unresolved_cities_report)
+from src.crawl_checkpoint import CrawlCheckpoint
+from src.distance_from_beach import get_distance_from_beach
+from src.instrumentation import INSTRUMENTATION, profile
+from src.listings_history import ListingsHistory
+from src.listings_storage import (DEFAULT_STORAGE_FORMAT, STORAGE_FORMATS, get_listings_path,
+                                  read_listings, write_listings)
+from src.page_fetcher import (DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                              DEFAULT_REQUESTS_PER_SECOND, PageFetcher)
+from src.parse_listings import parse_feed_items
+from src.seen_listings import SeenListings
 
 YAD2_FOR_SALE_API_URL = 'https://gw.yad2.co.il/feed-search-legacy/realestate/forsale'
 YAD2_RENT_API_URL = 'https://gw.yad2.co.il/feed-search-legacy/realestate/rent'
 DEFAULT_PARAMS = dict(propertyGroup='apartments,houses',
                       property='1,25,3,39,4,5,51,6,7',
                       forceLdLoad='true')
-CENTRAL_BUREAU_OF_STATISTICS_EXCEL_URL = 'https://www.cbs.gov.il/he/publications/LochutTlushim/2020/%D7%90%D7%95%D7%9B%D7%9C%D7%95%D7%A1%D7%99%D7%99%D7%942020.xlsx'
-TYPOS = {
-    'תל אביב -יפו': 'תל אביב יפו',
-    'הרצלייה': 'הרצליה',
-    'קדימה-צורן': 'קדימה צורן',
-    'מודיעין-מכבים-רעות*': 'מודיעין מכבים רעות',
-    'קריית אונו': 'קרית אונו',
-    'יהוד-מונוסון': 'יהוד מונוסון',
-    'קריית גת': 'קרית גת',
-    'קריית מלאכי': 'קרית מלאכי',
-    'קריית עקרון': 'קרית עקרון',
-    'גבע בנימין': 'אדם - גבע בנימין',
-    'בית אריה-עופרים': 'בית אריה / עופרים',
-    'נהרייה': 'נהריה',
-    'קריית מוצקין': 'קרית מוצקין',
-    'קריית אתא': 'קרית אתא',
-    'קריית ביאליק': 'קרית ביאליק',
-    'קריית ים': 'קרית ים',
-    'פרדס חנה-כרכור': 'פרדס חנה כרכור',
-    'נוף הגליל': 'נצרת עילית / נוף הגליל',
-    'קריית שמונה': 'קרית שמונה',
-    'מעלות-תרשיחא': 'מעלות תרשיחא',
-    'קריית טבעון': 'קרית טבעון',
-    'בנימינה-גבעת עדה*': 'בנימינה גבעת עדה',
-    'מיתר': 'מיתר / כרמית',
-    'כוכב יאיר': 'כוכב יאיר / צור יגאל',
-    'סביון*': 'סביון',
-    'פרדסייה': 'פרדסיה',
-    'שער שומרון': 'שערי תקווה',
-    'קריית ארבע': 'קרית ארבע',
-    'בית יצחק-שער חפר': 'בית יצחק שער חפר',
-}
+# older listings are dropped from the dataset
+LISTINGS_MAX_AGE = pd.Timedelta(16, unit='W')
+# the crawl parses and writes the pages of a region in chunks of this many pages
+PAGES_PER_CHUNK = 25
+# the most pages being fetched, or fetched and not parsed yet, at once
+MAX_IN_FLIGHT_PAGES = 64
+# the listings are enriched in chunks of this many rows, in parallel if there are several
+ENRICHMENT_CHUNK_SIZE = 250000
+# the chunks are copied to and from the worker processes, which only pays off with many rows on
+# several cores, so it's opt in
+DEFAULT_ENRICHMENT_WORKERS = 1
 
 
 class RegionCodes(enum.IntEnum):
@@ -62,138 +53,365 @@ class RegionCodes(enum.IntEnum):
     NORTH = 25
 
 
-class Listing(pydantic.BaseModel):
-    date_listed: datetime.datetime
-    city: str
-    neighborhood: typing.Optional[str]
-    street: typing.Optional[str]
-    coordinates: typing.Optional[typing.Tuple[float, float]]
-    floor: int
-    rooms: int
-    area: int
-    price: int
+class Feed(typing.NamedTuple):
+    api_url: str
+    params: dict
     for_sale: bool
-    distance_from_beach: int
-    property_type: str
-    link: str
-
-
-async def get_all_listings_df():
-    await save_preprocessed_listings()
-    get_initial_df().to_csv('../all_listings.csv', index=False)
-
-
-async def save_preprocessed_listings():
-    for_sale_params = DEFAULT_PARAMS | dict(price='600000-20000000')
-    rent_params = DEFAULT_PARAMS | dict(price='1500-30000')
-    rent_listings = await _get_all_listings(YAD2_RENT_API_URL, rent_params, False)
-    for_sale_listings = await _get_all_listings(YAD2_FOR_SALE_API_URL, for_sale_params, True)
-    all_listings = (listing.model_dump()
-                    for listing in itertools.chain(for_sale_listings, rent_listings))
-    pd.DataFrame(all_listings).to_csv('../preprocessed_listings.csv', index=False)
-
-
-def get_floor(raw_listing):
-    for attribute in raw_listing['row_4']:
-        if attribute['key'] == 'floor':
-            if attribute['value'] == 'קרקע':
-                return 0
-            return attribute['value']
-    raise ValueError('this listing doesn\'t have a floor number')
-
-
-async def _get_total_amount_of_pages(yad2_client: httpx.AsyncClient) -> int:
-    total_amount_of_pages = 0
-    for region_code in RegionCodes:
-        raw_response = await yad2_client.get('/', params=dict(topArea=region_code))
-        raw_response.raise_for_status()
-        response = raw_response.json()
-        total_amount_of_pages += response['data']['pagination']['last_page']
-    return total_amount_of_pages
-
-
-async def _get_all_listings(api_url, params, for_sale) -> typing.List[Listing]:
-    listings = list()
-    distance_calculator = DistanceFromBeach()
-    async with httpx.AsyncClient(base_url=api_url, params=params) as yad2_client:
-        total_amount_of_pages = await _get_total_amount_of_pages(yad2_client)
-        with tqdm(total=total_amount_of_pages) as progress_bar:
-            for region_code in RegionCodes:
-                for attempt in tenacity.Retrying(stop=tenacity.stop_after_attempt(3),
-                                                 wait=tenacity.wait_fixed(1)):
-                    with attempt:
-                        raw_response = await yad2_client.get('/', params=dict(topArea=region_code))
-                        raw_response.raise_for_status()
-                response = raw_response.json()
-                amount_pages = response['data']['pagination']['last_page']
-                for page in range(amount_pages + 1):
-                    for attempt in tenacity.Retrying(stop=tenacity.stop_after_attempt(3),
-                                                     wait=tenacity.wait_fixed(1)):
-                        with attempt:
-                            raw_response = await yad2_client.get('/',
-                                                                 params=dict(topArea=region_code,
-                                                                             page=page))
-                            raw_response.raise_for_status()
-                    response = raw_response.json()
-                    for raw_listing in response['data']['feed']['feed_items']:
-                        try:
-                            coordinates = (raw_listing['coordinates']['latitude'],
-                                           raw_listing['coordinates']['longitude'])\
-                                if raw_listing['coordinates'] else None
-                            listing = Listing(
-                                floor=get_floor(raw_listing),
-                                rooms=raw_listing['Rooms_text'],
-                                area=raw_listing['square_meters'],
-                                city=raw_listing['city'],
-                                street=raw_listing.get('street'),
-                                coordinates=coordinates,
-                                date_listed=datetime.datetime.fromisoformat(
-                                    raw_listing['date_added']),
-                                price=int(raw_listing['price'].split(' ')[0].replace(',', '')),
-                                neighborhood=raw_listing.get('neighborhood'),
-                                for_sale=for_sale,
-                                distance_from_beach=distance_calculator.calculate(coordinates)
-                                if coordinates else None,
-                                property_type=raw_listing['HomeTypeID_text'],
-                                link=f'https://www.yad2.co.il/item/{raw_listing["link_token"]}')
-                            listings.append(listing)
-                        except (KeyError, pydantic.ValidationError) as _:
-                            pass
-                    await asyncio.sleep(0.1)
-                    progress_bar.update()
-    return listings
-
-
-def get_initial_df():
-    df = pd.read_csv('../preprocessed_listings.csv')
-    df.date_listed = pd.to_datetime(df['date_listed'])
-
-    city_names_and_populations = pd.read_excel(CENTRAL_BUREAU_OF_STATISTICS_EXCEL_URL,
-                                               usecols='C,H,J',
-                                               keep_default_na=False,
-                                               skipfooter=7,
-                                               header=7)
-    city_names_and_populations = city_names_and_populations.set_axis(
-        ['hebrew_city', 'city_population', 'english_city'], axis=1)
-
-    # fix specific cities to match
-    city_names_and_populations = city_names_and_populations.replace(TYPOS)
-
-    df = df.merge(city_names_and_populations, left_on='city', right_on='hebrew_city', how='left')
-    df = df.drop('hebrew_city', axis=1)
-    # drop erroneous extreme rows to clean data set
-    df = df[df.date_listed > (pd.Timestamp.today() - pd.Timedelta(16, unit='W')).to_pydatetime()]
-    df = df[(df.area < df.area.mean() * 5) & (df.area > df.area.mean() / 10)]
-    df.city_population = df.city_population.astype(float).round().astype('Int64')
-    df.drop_duplicates(subset='link', keep='first', inplace=True)
-    df = df.reset_index(drop=True)
+
+
+# ordered as the rows are written to the preprocessed listings file
+FEEDS = {
+    'for_sale': Feed(YAD2_FOR_SALE_API_URL, DEFAULT_PARAMS | dict(price='600000-20000000'), True),
+    'rent': Feed(YAD2_RENT_API_URL, DEFAULT_PARAMS | dict(price='1500-30000'), False),
+}
+
+
+class CrawlProgress:
+    """A single progress bar for several concurrent feed crawls, with a page counter per feed."""
+
+    def __init__(self, feed_names):
+        self.pages_per_feed = dict.fromkeys(feed_names, 0)
+        self.progress_bar = tqdm(total=0)
+
+    def add_pages(self, amount_of_pages):
+        self.progress_bar.total += amount_of_pages
+        self.progress_bar.refresh()
+
+    def update(self, feed_name, page_fetcher):
+        self.pages_per_feed[feed_name] += 1
+        pages_per_second = f'{page_fetcher.pages_per_second:.1f}'
+        self.progress_bar.set_postfix(self.pages_per_feed | dict(pages_per_second=pages_per_second),
+                                      refresh=False)
+        self.progress_bar.update()
+
+    def close(self):
+        self.progress_bar.close()
+
+
+async def get_all_listings_df(page_fetcher=None,
+                              feed_names=tuple(FEEDS),
+                              incremental=False,
+                              storage_format=DEFAULT_STORAGE_FORMAT,
+                              export_csv=False,
+                              restart=False,
+                              workers=DEFAULT_ENRICHMENT_WORKERS):
+    await save_preprocessed_listings(page_fetcher, feed_names, incremental, storage_format, restart)
+    df = get_initial_df(storage_format, workers)
+    unresolved_cities = read_unresolved_cities_report()
+    if len(unresolved_cities):
+        print(f'{unresolved_cities.sum()} listings in {len(unresolved_cities)} cities that aren\'t '
+              'in the city populations table, see unresolved_cities.csv')
+    with INSTRUMENTATION.stage('write listings', items=len(df)):
+        write_listings(df, get_listings_path('all_listings', storage_format))
+    if export_csv and storage_format != 'csv':
+        write_listings(df, get_listings_path('all_listings', 'csv'))
+
+
+async def save_preprocessed_listings(page_fetcher=None,
+                                     feed_names=tuple(FEEDS),
+                                     incremental=False,
+                                     storage_format=DEFAULT_STORAGE_FORMAT,
+                                     restart=False):
+    """Crawls the feeds into chunks on disk, checkpointing as it goes, and combines the chunks
+    into the preprocessed listings once the crawl is complete.
+
+    An interrupted crawl resumes from its checkpoint when run again with the same feeds and mode,
+    unless `restart` is set.
+    """
+    # one fetcher for all feeds, so they share the concurrency and rate limit budget
+    page_fetcher = page_fetcher or PageFetcher()
+    crawled_at = datetime.datetime.now()
+    feed_names = [feed_name for feed_name in FEEDS if feed_name in feed_names]
+    seen_listings = SeenListings.load()
+    checkpoint = CrawlCheckpoint.open(dict(feed_names=feed_names, incremental=incremental),
+                                      restart=restart)
+    # shared by all feeds and regions, so the raw pages held in memory are bounded
+    in_flight_pages = asyncio.Semaphore(MAX_IN_FLIGHT_PAGES)
+    progress = CrawlProgress(feed_names)
+    try:
+        await asyncio.gather(
+            *(_get_all_listings(*FEEDS[feed_name], page_fetcher, progress, feed_name, seen_listings,
+                                checkpoint, in_flight_pages, incremental)
+              for feed_name in feed_names))
+    finally:
+        progress.close()
+        checkpoint.close()
+    print(f'fetched {page_fetcher.pages_fetched} pages in {page_fetcher.requests} requests '
+          f'({page_fetcher.pages_per_second:.1f} pages per second)')
+    for feed_name in feed_names:
+        rejected = checkpoint.get_rejected(feed_name)
+        if rejected:
+            print(f'rejected {feed_name} listings: {dict(rejected.most_common())}')
+    with INSTRUMENTATION.stage('combine chunks'):
+        df = checkpoint.read_listings()
+    with INSTRUMENTATION.stage('ingest listings history', items=len(df)):
+        # an incremental crawl only sees the new listings, so it can't tell which were delisted
+        crawled_for_sale = () if incremental else {FEEDS[name].for_sale for name in feed_names}
+        ListingsHistory.load().ingest(df, crawled_at, crawled_for_sale).save()
+    oldest_date_added = datetime.datetime.now() - LISTINGS_MAX_AGE
+    preprocessed_listings_path = get_listings_path('preprocessed_listings', storage_format)
+    if (incremental or set(feed_names) != set(FEEDS)) and preprocessed_listings_path.exists():
+        previous_df = read_listings(preprocessed_listings_path)
+        # the previous listings are dropped once they're too old, like their seen link tokens
+        previous_df = previous_df[previous_df.date_listed >= oldest_date_added]
+        if not incremental:
+            # keep only the rows of the feeds that weren't refreshed
+            refreshed_for_sale_values = {FEEDS[feed_name].for_sale for feed_name in feed_names}
+            previous_df = previous_df[~previous_df.for_sale.isin(refreshed_for_sale_values)]
+        df = pd.concat([df, previous_df], ignore_index=True)
+        df = df.drop_duplicates(subset='link_token', keep='first')
+        df = df.sort_values('for_sale', ascending=False, kind='stable')
+    with INSTRUMENTATION.stage('write preprocessed listings', items=len(df)):
+        write_listings(df, preprocessed_listings_path)
+    checkpoint.add_to_seen_listings(seen_listings)
+    seen_listings.prune(oldest_date_added)
+    seen_listings.save()
+    checkpoint.remove()
+
+
+async def _get_all_listings(api_url,
+                            params,
+                            for_sale,
+                            page_fetcher: PageFetcher,
+                            progress: CrawlProgress,
+                            feed_name,
+                            seen_listings: SeenListings,
+                            checkpoint: CrawlCheckpoint,
+                            in_flight_pages: asyncio.Semaphore,
+                            incremental=False):
+    """Crawls the regions of a feed, writing their listings to the checkpoint in chunks of
+    consecutive pages.
+
+    Every page is requested once: the first page of a region also tells how many pages it has. A
+    page is held in memory from when it's fetched until it's parsed with its chunk, and pages
+    fetched out of order wait for the pages before them, so the chunks keep the order of a
+    sequential crawl. Every page takes one of the `in_flight_pages` from when it's requested until
+    it's parsed, and a chunk is parsed before it's full once none are left, so the pages before the
+    ones waiting can still be fetched. Listings already on an earlier page of the region (the feed
+    shifts as listings are added during the crawl) are dropped before parsing.
+    """
+    feed_index = list(FEEDS).index(feed_name)
+    distance_calculator = get_distance_from_beach()
+    async with page_fetcher.client(api_url, params) as yad2_client:
+
+        async def get_page(region_code, page):
+            # includes the time waiting for the concurrency and rate limits
+            with INSTRUMENTATION.stage(f'{feed_name} page of region {region_code.name}'):
+                response = await page_fetcher.get_json(yad2_client,
+                                                       dict(topArea=region_code, page=page))
+            progress.update(feed_name, page_fetcher)
+            return response['data']
+
+        async def get_region_listings(region_index, region_code):
+            written_pages = checkpoint.get_written_pages(feed_name, region_code)
+            last_page = checkpoint.get_last_page(feed_name, region_code)
+            # the chunks are written in order, so the written pages are all before the others
+            link_tokens = {
+                raw_listing['link_token']
+                for raw_listings in written_pages.values()
+                for raw_listing in raw_listings if 'link_token' in raw_listing
+            }
+            # pages fetched out of order, by page, and then the consecutive pages of the next chunk
+            fetched_pages = dict()
+            chunk_pages = dict()
+            next_page = 1
+
+            def write_chunk():
+                if not chunk_pages:
+                    return
+                raw_listings = list()
+                duplicates = 0
+                for raw_listing in itertools.chain.from_iterable(chunk_pages.values()):
+                    link_token = raw_listing.get('link_token')
+                    if link_token is not None and link_token in link_tokens:
+                        duplicates += 1
+                        continue
+                    raw_listings.append(raw_listing)
+                    if link_token is not None:
+                        link_tokens.add(link_token)
+                with INSTRUMENTATION.stage(f'{feed_name} parse', items=len(raw_listings)):
+                    df, rejected = parse_feed_items(raw_listings, for_sale, distance_calculator)
+                if duplicates:
+                    rejected['duplicate'] += duplicates
+                # named so sorting the chunks by name keeps the order of the feeds, regions and pages
+                checkpoint.write_chunk(f'{feed_index}_{region_index:02}_{min(chunk_pages):05}',
+                                       feed_name, region_code, last_page, df, rejected, chunk_pages)
+                for _ in chunk_pages:
+                    in_flight_pages.release()
+                chunk_pages.clear()
+
+            def add_page(page, data):
+                nonlocal next_page, last_page
+                if page == 1:
+                    # before any chunk is written, as the chunks record the pages of the region
+                    last_page = data['pagination']['last_page']
+                if page in written_pages:
+                    # the first page again, of a checkpoint that didn't record the pages
+                    in_flight_pages.release()
+                    return
+                fetched_pages[page] = data['feed']['feed_items']
+                while next_page in fetched_pages or next_page in written_pages:
+                    if next_page in written_pages:
+                        # a chunk only holds consecutive pages
+                        write_chunk()
+                    else:
+                        chunk_pages[next_page] = fetched_pages.pop(next_page)
+                        if len(chunk_pages) == PAGES_PER_CHUNK:
+                            write_chunk()
+                    next_page += 1
+                if in_flight_pages.locked():
+                    write_chunk()
+
+            async def fetch_page(page):
+                await in_flight_pages.acquire()
+                data = await get_page(region_code, page)
+                add_page(page, data)
+                return data
+
+            async def fetch_and_drop_page(page):
+                # so gather doesn't keep the pages after they're written
+                await fetch_page(page)
+
+            if 1 in written_pages and last_page is not None:
+                raw_listings = written_pages[1]
+            else:
+                progress.add_pages(1)
+                raw_listings = (await fetch_page(1))['feed']['feed_items']
+            if not incremental:
+                pages = [page for page in range(2, last_page + 1) if page not in written_pages]
+                progress.add_pages(len(pages))
+                # the pages are fetched in order, so the first page not in a chunk yet is always
+                # being fetched and the pages waiting for it don't hold up the others for long
+                await asyncio.gather(*(fetch_and_drop_page(page) for page in pages))
+            else:
+                # the feed is sorted by date, so stop at the first page with nothing new in it
+                page = 1
+                while (page < last_page
+                       and not seen_listings.is_page_known(feed_name, region_code, raw_listings)):
+                    page += 1
+                    if page in written_pages:
+                        raw_listings = written_pages[page]
+                    else:
+                        progress.add_pages(1)
+                        raw_listings = (await fetch_page(page))['feed']['feed_items']
+            write_chunk()
+
+        await asyncio.gather(*(get_region_listings(region_index, region_code)
+                               for region_index, region_code in enumerate(RegionCodes)))
+
+
+def get_initial_df(storage_format=DEFAULT_STORAGE_FORMAT, workers=DEFAULT_ENRICHMENT_WORKERS):
+    """Enriches and cleans the preprocessed listings.
+
+    The cities of the listings are resolved by the city dictionary, and the names it doesn't know
+    are written to the unresolved cities report. The listings are enriched in chunks, in a pool of
+    `workers` processes if there's more than one chunk. A chunk gets the ids and populations of its
+    cities and its old listings are dropped. The area outlier bounds need the mean of all of the
+    chunks, so they're applied once the sums of the chunks are reduced, and the listings are
+    deduplicated across the chunks, in their order.
+    """
+    with INSTRUMENTATION.stage('read preprocessed listings'):
+        df = read_listings(get_listings_path('preprocessed_listings', storage_format))
+
+    with INSTRUMENTATION.stage('resolve cities', items=len(df)):
+        city_dictionary = get_city_dictionary()
+        write_unresolved_cities_report(city_dictionary.get_unresolved(df.city))
+    with INSTRUMENTATION.stage('enrich listings', items=len(df)):
+        oldest_date_listed = (pd.Timestamp.today() - LISTINGS_MAX_AGE).to_pydatetime()
+        chunks = [
+            df.iloc[start:start + ENRICHMENT_CHUNK_SIZE]
+            for start in range(0, max(len(df), 1), ENRICHMENT_CHUNK_SIZE)
+        ]
+        arguments = chunks, itertools.repeat(city_dictionary), itertools.repeat(oldest_date_listed)
+        if workers > 1 and len(chunks) > 1:
+            with concurrent.futures.ProcessPoolExecutor(min(workers, len(chunks))) as executor:
+                # map keeps the order of the chunks
+                enriched_chunks = list(executor.map(_enrich_chunk, *arguments))
+        else:
+            enriched_chunks = list(map(_enrich_chunk, *arguments))
+    with INSTRUMENTATION.stage('filter listings', items=len(df)):
+        # drop erroneous extreme rows to clean data set
+        amount_of_listings = sum(amount for _, _, amount in enriched_chunks)
+        total_area = sum(area_sum for _, area_sum, _ in enriched_chunks)
+        area_mean = total_area / amount_of_listings if amount_of_listings else float('nan')
+        df = pd.concat([chunk for chunk, _, _ in enriched_chunks], ignore_index=True)
+        df = df[(df.area < area_mean * 5) & (df.area > area_mean / 10)]
+    with INSTRUMENTATION.stage('deduplicate listings', items=len(df)):
+        df = df.drop_duplicates(subset='link_token', keep='first')
+        df = df.reset_index(drop=True)
     # TODO: instead of ignoring them here, ignore them only in the graphs that assume this.
     # TODO: add information about title 2 : property type - cottage, apartment, etc...
     return df
 
 
+def _enrich_chunk(df, city_dictionary, oldest_date_listed):
+    """Returns the chunk with the ids and populations of its cities without its old listings, along
+    with the sum of its areas and its amount of listings."""
+    df = df[df.date_listed > oldest_date_listed]
+    df = city_dictionary.enrich(df)
+    return df, int(df.area.sum()), len(df)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument('--requests-per-second', type=float, default=DEFAULT_REQUESTS_PER_SECOND)
+    parser.add_argument('--max-connections-per-host',
+                        type=int,
+                        default=DEFAULT_MAX_CONNECTIONS_PER_HOST)
+    parser.add_argument('--feeds',
+                        nargs='+',
+                        choices=list(FEEDS),
+                        default=list(FEEDS),
+                        help='refresh only these feeds, keeping the stored listings of the others')
+    parser.add_argument('--incremental',
+                        action='store_true',
+                        help='only fetch listings that are newer than the ones already stored')
+    parser.add_argument('--storage-format', choices=STORAGE_FORMATS, default=DEFAULT_STORAGE_FORMAT)
+    parser.add_argument('--restart',
+                        action='store_true',
+                        help='start over instead of resuming an interrupted crawl')
+    parser.add_argument('--export-csv',
+                        action='store_true',
+                        help='also write the listings to all_listings.csv')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=DEFAULT_ENRICHMENT_WORKERS,
+                        help='the amount of processes enriching the listings, up to one per '
+                        f'{ENRICHMENT_CHUNK_SIZE} listings')
+    parser.add_argument('--instrumentation-report',
+                        type=pathlib.Path,
+                        help='time the stages of the crawl and write them to this .json or .csv '
+                        'file')
+    parser.add_argument('--track-memory',
+                        action='store_true',
+                        help='also report the memory allocated by every stage, which is slower')
+    parser.add_argument('--profile',
+                        type=pathlib.Path,
+                        help='profile the crawl with cProfile and write the stats to this file')
+    parser.add_argument('--pyinstrument',
+                        action='store_true',
+                        help='profile with pyinstrument instead, writing an HTML report to the '
+                        '--profile file')
+    args = parser.parse_args()
+    if args.pyinstrument and not args.profile:
+        parser.error('--pyinstrument needs --profile, the file to write its report to')
+    return args
+
+
+async def main(args):
+    if args.instrumentation_report:
+        INSTRUMENTATION.enable(track_memory=args.track_memory)
+    with profile(args.profile, args.pyinstrument) if args.profile else contextlib.nullcontext():
+        await get_all_listings_df(
+            PageFetcher(max_concurrency=args.max_concurrency,
+                        requests_per_second=args.requests_per_second,
+                        max_connections_per_host=args.max_connections_per_host), args.feeds,
+            args.incremental, args.storage_format, args.export_csv, args.restart, args.workers)
+    if args.instrumentation_report:
+        INSTRUMENTATION.write_report(args.instrumentation_report)
+
+
 if __name__ == '__main__':
-    asyncio.run(get_all_listings_df())
-    # get_initial_df(pd.read_csv('../preprocessed_listings.csv',
-    #                            parse_dates=['date_listed'])).to_csv('../all_listings.csv',
-    #                                                                 index=False)
+    asyncio.run(main(parse_args()))
+    # write_listings(get_initial_df(), get_listings_path('all_listings'))
@@ -0,0 +1,167 @@
+import contextlib
+import cProfile
+import functools
+import inspect
+import json
+import os
+import pathlib
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+# set to 1 to enable the instrumentation of the app, or to `memory` to also track the memory
+ENVIRONMENT_VARIABLE = 'YAD2_INSTRUMENTATION'
+REPORT_COLUMNS = [
+    'stage', 'calls', 'items', 'total_seconds', 'max_seconds', 'seconds_per_item',
+    'memory_delta_bytes', 'peak_memory_bytes'
+]
+_DISABLED_STAGE = contextlib.nullcontext()
+
+
+class Instrumentation:
+    """Records the wall time, the amount of calls and items, and optionally the memory allocated by
+    named stages of the crawler and the app.
+
+    It's off by default, and while it's off a stage costs a single attribute check. The memory is
+    traced with `tracemalloc`, which slows everything down, so it's only tracked when asked for.
+    Stages that run concurrently are timed separately, but their memory deltas include each
+    other's allocations.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.track_memory = False
+        self.stages = dict()
+        self._lock = threading.Lock()
+
+    def enable(self, track_memory=False):
+        self.enabled = True
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def enable_from_environment(self):
+        if os.environ.get(ENVIRONMENT_VARIABLE) in ('1', 'memory'):
+            self.enable(track_memory=os.environ[ENVIRONMENT_VARIABLE] == 'memory')
+
+    def disable(self):
+        self.enabled = False
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.track_memory = False
+
+    def reset(self):
+        with self._lock:
+            self.stages = dict()
+
+    def stage(self, name, items=0):
+        """Returns a context manager that records the time spent in it under `name`."""
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return self._record(name, items)
+
+    @contextlib.contextmanager
+    def _record(self, name, items):
+        memory_before = tracemalloc.get_traced_memory()[0] if self.track_memory else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            memory_delta, peak_memory = 0, 0
+            if self.track_memory:
+                memory_after, peak_memory = tracemalloc.get_traced_memory()
+                memory_delta = memory_after - memory_before
+            with self._lock:
+                stage = self.stages.setdefault(
+                    name,
+                    dict(calls=0,
+                         items=0,
+                         total_seconds=0.0,
+                         max_seconds=0.0,
+                         memory_delta_bytes=0,
+                         peak_memory_bytes=0))
+                stage['calls'] += 1
+                stage['items'] += items
+                stage['total_seconds'] += seconds
+                stage['max_seconds'] = max(stage['max_seconds'], seconds)
+                stage['memory_delta_bytes'] += memory_delta
+                stage['peak_memory_bytes'] = max(stage['peak_memory_bytes'], peak_memory)
+
+    def timed(self, name=None):
+        """Decorates a function or coroutine function, recording every call of it as a stage."""
+
+        def decorator(function):
+            stage_name = name or function.__qualname__
+            if inspect.iscoroutinefunction(function):
+
+                @functools.wraps(function)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await function(*args, **kwargs)
+                    with self._record(stage_name, 0):
+                        return await function(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self._record(stage_name, 0):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def get_report(self) -> pd.DataFrame:
+        with self._lock:
+            report = pd.DataFrame(
+                [dict(stage=name) | stage for name, stage in self.stages.items()],
+                columns=[column for column in REPORT_COLUMNS if column != 'seconds_per_item'])
+        report.insert(REPORT_COLUMNS.index('seconds_per_item'), 'seconds_per_item',
+                      report.total_seconds / report['items'].where(report['items'] > 0))
+        return report.sort_values('total_seconds', ascending=False, ignore_index=True)
+
+    def write_report(self, path: pathlib.Path):
+        report = self.get_report()
+        if path.suffix == '.json':
+            path.write_text(json.dumps(report.to_dict(orient='records'), indent=2))
+        elif path.suffix == '.csv':
+            report.to_csv(path, index=False)
+        else:
+            raise ValueError(f'unknown instrumentation report format: {path.suffix}')
+
+
+# shared by all of the modules, so a single report covers a whole run
+INSTRUMENTATION = Instrumentation()
+
+
+@contextlib.contextmanager
+def profile(path: pathlib.Path, use_pyinstrument=False):
+    """Profiles the code run in it, writing a cProfile stats file or a pyinstrument HTML report
+    to `path`."""
+    if use_pyinstrument:
+        try:
+            import pyinstrument
+        except ImportError as e:
+            raise ImportError(
+                'profiling with pyinstrument requires `pip install pyinstrument`') from e
+        profiler = pyinstrument.Profiler(async_mode='enabled')
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path.write_text(profiler.output_html())
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from src.analytics import get_weighted_rent_yield_by_city
+
+# the step of the price slider of the app
+PRICE_BUCKET_SIZE = 100000
+CELL_COLUMNS = ['english_city', 'for_sale', 'price_code', 'area']
+
+
+class ListingsCube:
+    """The listings aggregated by city, type, price bucket and area.
+
+    The results of any selection of cities and range of sale prices are combined from its cells,
+    so they cost the same however many listings there are. Prices that are a multiple of
+    `PRICE_BUCKET_SIZE` get cells of their own, so a price range in steps of the bucket size is
+    never inside a cell and the cells give the same results as filtering the listings. The area
+    isn't bucketed, so the area quantiles of a city are exact too.
+    """
+
+    def __init__(self, cells, cities):
+        # the amount of listings, the sum of their prices and of their prices per m², by cell
+        self.cells = cells
+        # the Hebrew name and population of every city
+        self.cities = cities
+
+    @classmethod
+    def from_listings(cls, df):
+        # rents are never filtered by price, so they all get the same price code
+        price_codes = np.where(
+            df.for_sale, df.price // PRICE_BUCKET_SIZE * 2 + (df.price % PRICE_BUCKET_SIZE > 0), -1)
+        grouped = df.assign(price_code=price_codes,
+                            price_per_sqm=df.price / df.area).groupby(CELL_COLUMNS, observed=True)
+        cells = grouped.agg(amount_of_listings=('price', 'size'),
+                            price_sum=('price', 'sum'),
+                            min_price=('price', 'min'),
+                            max_price=('price', 'max'),
+                            price_per_sqm_sum=('price_per_sqm', 'sum')).reset_index()
+        cities = df.drop_duplicates(subset='english_city').set_index('english_city')[[
+            'city', 'city_population'
+        ]]
+        return cls(cells, cities)
+
+    def select(self, english_cities, price_range):
+        """Returns the cube of the listings in `english_cities`, and only the listings for sale
+        whose price is strictly within `price_range`."""
+        cells = self.cells
+        return ListingsCube(
+            cells[cells.english_city.isin(english_cities)
+                  & ((cells.min_price > price_range[0]) & (cells.max_price < price_range[1])
+                     | ~cells.for_sale)], self.cities)
+
+    def get_rent_yield_by_city(self, groups=None, area_sketches=None) -> pd.Series:
+        return get_weighted_rent_yield_by_city(self._get_groups(self.cells,
+                                                                groups), self.cells.area,
+                                               self.cells.for_sale, self.cells.amount_of_listings,
+                                               self.cells.price_sum, area_sketches)
+
+    def get_amount_of_listings_by_city(self, for_sale=True, groups=None) -> pd.Series:
+        cells = self.cells[self.cells.for_sale == for_sale]
+        return cells.groupby(self._get_groups(cells, groups),
+                             observed=True).amount_of_listings.sum()
+
+    def get_price_per_sqm_by_city(self, for_sale=True, groups=None) -> pd.Series:
+        """Returns the mean price per m² of the listings of every city."""
+        cells = self.cells[self.cells.for_sale == for_sale]
+        sums = cells.groupby(self._get_groups(cells, groups),
+                             observed=True)[['price_per_sqm_sum', 'amount_of_listings']].sum()
+        return sums.price_per_sqm_sum / sums.amount_of_listings
+
+    def get_metrics(self, groups=None, area_sketches=None) -> pd.DataFrame:
+        """Returns the metrics of the Results tabs of every city, sorted by its English name.
+
+        With `groups`, a mapping of the English names of the cities to groups of them like
+        `REGION_BY_CITY`, they're of every group instead, as if its cities were a single city. With
+        `area_sketches` of every city or group, the rent yields are binned by their quantiles, see
+        `get_weighted_rent_yield_by_city`.
+        """
+        populations = self.cities.city_population.astype(float)
+        if groups is not None:
+            populations = populations.groupby(self.cities.index.map(groups).astype(object)).sum()
+        metrics = pd.DataFrame(
+            dict(amount_of_listings=_by_name(self.get_amount_of_listings_by_city(True, groups)),
+                 amount_of_rentals=_by_name(self.get_amount_of_listings_by_city(False, groups)),
+                 price_per_sqm=_by_name(self.get_price_per_sqm_by_city(True, groups)),
+                 rent_per_sqm=_by_name(self.get_price_per_sqm_by_city(False, groups)),
+                 rent_yield=_by_name(self.get_rent_yield_by_city(groups,
+                                                                 area_sketches)))).sort_index()
+        counts = ['amount_of_listings', 'amount_of_rentals']
+        metrics[counts] = metrics[counts].fillna(0).astype(int)
+        metrics['city_population'] = _by_name(populations).reindex(metrics.index)
+        metrics['amount_of_listings_per_100k_residents'] = (metrics.amount_of_listings /
+                                                            metrics.city_population) * 100000
+        return metrics.rename_axis('english_city' if groups is None else 'group')
+
+    @staticmethod
+    def _get_groups(cells, groups):
+        if groups is None:
+            return cells.english_city
+        return cells.english_city.map(groups).astype(object).rename('group')
+
+
+def _by_name(series):
+    return series.set_axis(series.index.astype(str))
@@ -0,0 +1,246 @@
+import argparse
+import datetime
+import pathlib
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from src.listings_storage import (DATA_DIRECTORY, get_listings_path, read_listings,
+                                  with_listing_dtypes, write_listings)
+
+LISTINGS_HISTORY_DIRECTORY = DATA_DIRECTORY / 'listings_history'
+# the attributes whose changes are recorded
+TRACKED_COLUMNS = ['price', 'area', 'rooms', 'floor']
+IDENTITY_COLUMNS = ['link_token', 'for_sale', 'city', 'property_type', 'date_listed']
+HISTORY_DTYPES = {
+    'first_seen': 'datetime64[ns]',
+    'last_seen': 'datetime64[ns]',
+    'delisted_at': 'datetime64[ns]',
+    'first_price': 'int32',
+    'price_changes': 'int16',
+}
+CHANGE_DTYPES = {
+    'link_token': pd.StringDtype('pyarrow'),
+    'seen_at': 'datetime64[ns]',
+    'column': pd.CategoricalDtype(TRACKED_COLUMNS),
+    'previous_value': 'int32',
+    'value': 'int32',
+}
+
+
+class ListingsHistory:
+    """Every listing ever crawled, by its link token, with when it was first and last seen, when it
+    was delisted, and the changes of its price and other attributes.
+
+    A snapshot is ingested by looking its link tokens up in a hash index of the known tokens, rather
+    than merging it with the history. The known listings are then compared with vectorized
+    lookups. Only the changed values are taken out as deltas, and only the new listings are
+    appended. The deltas are stored compactly, one file per snapshot, so the history of a listing
+    is its first values and its deltas.
+
+    Only the listings still on the market are kept in `listings`, and rewritten by every save. The
+    delisted ones are moved out to a file of their own per snapshot, which is only read again for
+    the link tokens in it, to find the listings that are relisted, so an ingest doesn't grow with
+    all of the listings ever delisted.
+    """
+
+    def __init__(self, listings=None, directory=LISTINGS_HISTORY_DIRECTORY):
+        if listings is None:
+            columns = IDENTITY_COLUMNS + TRACKED_COLUMNS + list(HISTORY_DTYPES)
+            listings = with_listing_dtypes(pd.DataFrame(columns=columns)).astype(HISTORY_DTYPES)
+        is_delisted = listings.delisted_at.notna().to_numpy()
+        self.listings = listings[~is_delisted].reset_index(drop=True)
+        self.directory = directory
+        self._index = pd.Index(self.listings.link_token)
+        self._new_changes = list()
+        # the delisted listings not saved yet, like those of a history stored with all of them
+        self._new_delisted = list()
+        if is_delisted.any():
+            self._new_delisted.append(listings[is_delisted].reset_index(drop=True))
+        # the delisted listings files whose listings were relisted, removed once saved
+        self._relisted_paths = set()
+
+    @classmethod
+    def load(cls, directory=LISTINGS_HISTORY_DIRECTORY):
+        path = get_listings_path('listings', 'parquet', directory)
+        if not path.exists():
+            return cls(directory=directory)
+        return cls(read_listings(path).astype(HISTORY_DTYPES), directory)
+
+    def save(self):
+        for changes in self._new_changes:
+            path = _get_new_path(self.directory / 'changes', changes.seen_at.max())
+            changes.to_parquet(path, index=False)
+        self._new_changes = list()
+        for delisted in self._new_delisted:
+            path = _get_new_path(self.directory / 'delisted', delisted.delisted_at.max())
+            write_listings(delisted, path)
+        self._new_delisted = list()
+        # only once the listings left in them are written again
+        for path in self._relisted_paths:
+            path.unlink()
+        self._relisted_paths = set()
+        write_listings(self.listings, get_listings_path('listings', 'parquet', self.directory))
+
+    def ingest(self, df, seen_at: datetime.datetime, delisting_for_sale_values=()):
+        """Records the listings of a crawl made at `seen_at`.
+
+        Known listings that aren't in `df` are marked delisted, but only if their `for_sale` is
+        one of `delisting_for_sale_values`: the feeds crawled completely, rather than
+        incrementally or not at all.
+        """
+        seen_at = pd.Timestamp(seen_at)
+        positions = self._index.get_indexer(df.link_token)
+        relisted = self._take_delisted(df.link_token.iloc[np.flatnonzero(positions < 0)])
+        if len(relisted):
+            # known again, so they're compared and marked listed like the others
+            self.listings = with_listing_dtypes(
+                pd.concat([self.listings, relisted], ignore_index=True))
+            self._index = pd.Index(self.listings.link_token)
+            positions = self._index.get_indexer(df.link_token)
+        # a listing on several pages of the crawl is known by its first row
+        known_rows = np.flatnonzero(positions >= 0)
+        _, first_rows = np.unique(positions[known_rows], return_index=True)
+        known_rows = known_rows[np.sort(first_rows)]
+        known_positions = positions[known_rows]
+
+        listings = self.listings
+        changes = list()
+        for column in TRACKED_COLUMNS:
+            previous_values = listings[column].to_numpy()[known_positions]
+            new_values = df[column].to_numpy()[known_rows]
+            changed = np.flatnonzero(previous_values != new_values)
+            if len(changed):
+                changes.append(
+                    pd.DataFrame(
+                        dict(link_token=df.link_token.iloc[known_rows[changed]].to_numpy(),
+                             seen_at=seen_at,
+                             column=column,
+                             previous_value=previous_values[changed],
+                             value=new_values[changed])).astype(CHANGE_DTYPES))
+                values = listings[column].to_numpy(copy=True)
+                values[known_positions[changed]] = new_values[changed]
+                listings[column] = values
+                if column == 'price':
+                    price_changes = listings.price_changes.to_numpy(copy=True)
+                    price_changes[known_positions[changed]] += 1
+                    listings['price_changes'] = price_changes
+        if changes:
+            self._new_changes.append(pd.concat(changes, ignore_index=True))
+
+        last_seen = listings.last_seen.to_numpy(copy=True)
+        last_seen[known_positions] = seen_at.to_datetime64()
+        listings['last_seen'] = last_seen
+        delisted_at = listings.delisted_at.to_numpy(copy=True)
+        # relisted
+        delisted_at[known_positions] = np.datetime64('NaT')
+        is_missing = np.ones(len(listings), dtype=bool)
+        is_missing[known_positions] = False
+        is_missing &= (np.isnat(delisted_at)
+                       & listings.for_sale.isin(list(delisting_for_sale_values)).to_numpy())
+        delisted_at[is_missing] = seen_at.to_datetime64()
+        listings['delisted_at'] = delisted_at
+        if is_missing.any():
+            self._new_delisted.append(listings[is_missing].reset_index(drop=True))
+            listings = listings[~is_missing].reset_index(drop=True)
+
+        new_df = df.iloc[np.flatnonzero(positions < 0)].drop_duplicates(subset='link_token')
+        new_listings = new_df[IDENTITY_COLUMNS + TRACKED_COLUMNS].assign(
+            first_seen=seen_at,
+            last_seen=seen_at,
+            delisted_at=pd.NaT,
+            first_price=new_df.price,
+            price_changes=0).astype(HISTORY_DTYPES)
+        if len(new_listings):
+            listings = with_listing_dtypes(pd.concat([listings, new_listings], ignore_index=True))
+        if is_missing.any() or len(new_listings):
+            self.listings = listings
+            self._index = pd.Index(listings.link_token)
+        return self
+
+    def _get_delisted_paths(self):
+        paths = sorted((self.directory / 'delisted').glob('*.parquet'))
+        return [path for path in paths if path not in self._relisted_paths]
+
+    def _take_delisted(self, link_tokens) -> pd.DataFrame:
+        """Returns the delisted listings of `link_tokens`, and takes them out of the delisted
+        listings. Only the link tokens of the stored ones are read, and then only the files with
+        relisted listings in them."""
+        relisted = list()
+        new_delisted = list()
+        for delisted in self._new_delisted:
+            is_relisted = delisted.link_token.isin(link_tokens).to_numpy()
+            relisted.append(delisted[is_relisted])
+            new_delisted.append(delisted[~is_relisted])
+        for path in self._get_delisted_paths():
+            if pd.read_parquet(path, columns=['link_token']).link_token.isin(link_tokens).any():
+                delisted = read_listings(path).astype(HISTORY_DTYPES)
+                is_relisted = delisted.link_token.isin(link_tokens).to_numpy()
+                relisted.append(delisted[is_relisted])
+                new_delisted.append(delisted[~is_relisted])
+                self._relisted_paths.add(path)
+        self._new_delisted = [
+            delisted.reset_index(drop=True) for delisted in new_delisted if len(delisted)
+        ]
+        relisted = [listings for listings in relisted if len(listings)]
+        if not relisted:
+            return self.listings.iloc[:0]
+        return pd.concat(relisted, ignore_index=True)
+
+    def get_listings(self) -> pd.DataFrame:
+        """Returns the listings with how many days they were on the market, from when they were
+        listed until they were delisted or last seen."""
+        delisted = self._new_delisted + [
+            read_listings(path).astype(HISTORY_DTYPES) for path in self._get_delisted_paths()
+        ]
+        listings = with_listing_dtypes(pd.concat([self.listings, *delisted], ignore_index=True))
+        end = listings.delisted_at.fillna(listings.last_seen)
+        return listings.assign(
+            days_on_market=(end - listings.date_listed.fillna(listings.first_seen)).dt.days,
+            price_change=listings.price - listings.first_price)
+
+    def get_changes(self, link_tokens=None) -> pd.DataFrame:
+        """Returns the recorded changes, of only the listings of `link_tokens` if given, oldest
+        first."""
+        paths = sorted((self.directory / 'changes').glob('*.parquet'))
+        empty_changes = pd.DataFrame(columns=list(CHANGE_DTYPES)).astype(CHANGE_DTYPES)
+        stored_changes = [pd.read_parquet(path) for path in paths]
+        all_changes = [empty_changes, *stored_changes, *self._new_changes]
+        changes = pd.concat(all_changes, ignore_index=True).astype(CHANGE_DTYPES)
+        if link_tokens is not None:
+            changes = changes[changes.link_token.isin(link_tokens)]
+        return changes.sort_values('seen_at', kind='stable', ignore_index=True)
+
+
+def _get_new_path(directory, seen_at) -> pathlib.Path:
+    """Returns a new path in `directory`, numbered so the files sort in the order they're saved in,
+    even those of snapshots seen in the same second, and named by when its snapshot was seen."""
+    directory.mkdir(parents=True, exist_ok=True)
+    sequence = len(list(directory.glob('*.parquet')))
+    while True:
+        path = directory / f'{sequence:06}_{pd.Timestamp(seen_at):%Y-%m-%dT%H-%M-%S}.parquet'
+        # the delisted files of relisted listings are removed, so their numbers may be taken
+        if not any(directory.glob(f'{sequence:06}_*.parquet')):
+            return path
+        sequence += 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--link-token', help='print the history of this listing')
+    args = parser.parse_args()
+    history = ListingsHistory.load()
+    listings = history.get_listings()
+    if args.link_token:
+        print(listings[listings.link_token == args.link_token].T.to_string())
+        print(history.get_changes([args.link_token]).to_string())
+    else:
+        print(f'{len(listings)} listings, {listings.delisted_at.notna().sum()} of them delisted')
+        is_delisted = listings.delisted_at.notna().rename('delisted')
+        print(listings.groupby(['for_sale', is_delisted]).days_on_market.describe().to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import collections
+import threading
+
+import numpy as np
+
+from src.instrumentation import INSTRUMENTATION
+from src.listings_storage import get_memory_footprint
+
+# the selections are kept until together they take more memory than this
+MAX_CACHED_BYTES = 256 * 2**20
+
+
+class ListingsQuery:
+    """Selects the listings and the cube cells of some cities and range of sale prices.
+
+    The rows of every city are indexed up front, so a selection only takes the rows of its
+    cities. The latest selections are cached by their normalized filter and shared by all of the
+    sessions, so they must not be modified in place.
+    """
+
+    def __init__(self, df, cube, max_cached_bytes=MAX_CACHED_BYTES):
+        self.df = df
+        self.cube = cube
+        self.max_cached_bytes = max_cached_bytes
+        self._city_indices = df.groupby('english_city', observed=True).indices
+        self._cache = collections.OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(selected_cities, price_range):
+        # the slider's prices are floats like 700000.0000000001, and the prices are whole
+        return tuple(sorted(set(selected_cities))), (round(price_range[0]), round(price_range[1]))
+
+    @INSTRUMENTATION.timed()
+    def select(self, selected_cities, price_range):
+        """Returns the listings in `selected_cities` that are either for rent or for sale with a
+        price strictly within `price_range`, and the cube of the same listings."""
+        key = self.normalize(selected_cities, price_range)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key][0]
+            self.misses += 1
+
+        selection = self._select(*key)
+        size = int(get_memory_footprint(selection[0]) + get_memory_footprint(selection[1].cells))
+        with self._lock:
+            if key not in self._cache and size <= self.max_cached_bytes:
+                self._cache[key] = selection, size
+                self._cached_bytes += size
+                while self._cached_bytes > self.max_cached_bytes:
+                    _, (_, evicted_size) = self._cache.popitem(last=False)
+                    self._cached_bytes -= evicted_size
+                    self.evictions += 1
+        return selection
+
+    def _select(self, selected_cities, price_range):
+        city_indices = [
+            self._city_indices[city] for city in selected_cities if city in self._city_indices
+        ]
+        # sorted, so the listings keep their order
+        indices = np.sort(np.concatenate(city_indices)) if city_indices else np.empty(0, dtype=int)
+        df = self.df.take(indices)
+        df = df[(df.price > price_range[0]) & (df.price < price_range[1]) | ~df.for_sale]
+        return df, self.cube.select(selected_cities, price_range)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(hits=self.hits,
+                        misses=self.misses,
+                        evictions=self.evictions,
+                        cached_selections=len(self._cache),
+                        cached_bytes=self._cached_bytes)
@@ -0,0 +1,273 @@
+import argparse
+import datetime
+import json
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from src.analytics import UNDESCRIBED_COLUMNS, clean_unknown_cities
+from src.cities import REGION_BY_CITY
+from src.instrumentation import INSTRUMENTATION
+from src.listings_cube import ListingsCube
+from src.listings_storage import DATA_DIRECTORY, compact_listings, find_listings_path, read_listings
+from src.near_the_beach import NearTheBeachIndex
+from src.quantile_sketches import QuantileSketches
+from src.rendered_graphs import get_dataset_hash, remove_previous_versions
+
+LISTINGS_REPORTS_DIRECTORY = DATA_DIRECTORY / 'listings_reports'
+# the range of sale prices of the app's slider before it's moved
+DEFAULT_PRICE_RANGE = (600000, 20000000)
+# the report of a million listings is generated within this many seconds, see
+# benchmarks/listings_report_benchmark.py
+SECONDS_PER_MILLION_LISTINGS_BUDGET = 10
+# the name of the only group of the scope of all of the known cities
+ALL_CITIES = 'all'
+SCOPES = ('city', 'region', 'all')
+# the statistics of a describe table, in the order `DataFrame.describe` gives them with dates
+DESCRIBE_STATISTICS = ['count', 'mean', 'min', '25%', '50%', '75%', 'max', 'std']
+SUMMARY_NAME = 'summary.json'
+TABLE_NAMES = ('metrics', 'describe_tables', 'near_the_beach')
+SKETCH_TABLE_NAMES = ('summaries', 'buckets')
+# set to 1 for the app to read a report of quantile sketches, see `ListingsReport`
+SKETCHES_ENVIRONMENT_VARIABLE = 'YAD2_QUANTILE_SKETCHES'
+# the name of the group of the selected cities, when merging their sketches
+SELECTION = 'selection'
+
+
+class ListingsReport:
+    """The metrics and describe tables of the Results tabs for every city, every region and all of
+    the known cities, and the recent houses by the beach, computed without a Streamlit session.
+
+    The metrics of all of the scopes are combined from a single `ListingsCube` of the listings in
+    the app's default range of prices, and the describe tables of a scope are a single groupby, so
+    the whole report is a batch over the listings. It's a few small Parquet tables and a JSON
+    summary, written once per version of the listings and day, which the app only has to read.
+
+    With quantile sketches, the describe tables are merged from the `QuantileSketches` of the
+    cities instead, and the rent yields are binned by their quantiles, so the listings are never
+    sorted, within the error bound of the sketches. The sketches of the cities are kept too, so the
+    describe tables of any selection of cities are merged from them.
+    """
+
+    def __init__(self, summary, metrics, describe_tables, near_the_beach, sketches=None):
+        self.summary = summary
+        # by scope and name, see `ListingsCube.get_metrics`
+        self.metrics = metrics
+        # by scope, name, for sale and statistic, with the dates in nanoseconds since the epoch
+        self.describe_tables = describe_tables
+        self.near_the_beach = near_the_beach
+        # of every city and type by its name, if the report was generated with sketches
+        self.sketches = sketches
+
+    @property
+    def price_range(self):
+        return tuple(self.summary['price_range'])
+
+    @classmethod
+    @INSTRUMENTATION.timed()
+    def from_listings(cls,
+                      df,
+                      price_range=DEFAULT_PRICE_RANGE,
+                      dataset_hash=None,
+                      use_sketches=False):
+        start = time.perf_counter()
+        known_city_df = clean_unknown_cities(df)
+        cube = ListingsCube.from_listings(known_city_df)
+        cube = cube.select(cube.cities.index, price_range)
+        all_cities = dict.fromkeys(cube.cities.index.astype(str), ALL_CITIES)
+        # like the listings of a selection of the app
+        selected_df = known_city_df[(known_city_df.price > price_range[0])
+                                    & (known_city_df.price < price_range[1])
+                                    | ~known_city_df.for_sale]
+        english_cities = selected_df.english_city.astype(str)
+
+        sketches = None
+        scope_sketches = dict.fromkeys(SCOPES)
+        if use_sketches:
+            sketches = QuantileSketches.from_listings(selected_df.assign(name=english_cities),
+                                                      ['name', 'for_sale'],
+                                                      _get_described_columns(selected_df))
+            scope_sketches = dict(city=sketches,
+                                  region=sketches.merge(REGION_BY_CITY),
+                                  all=sketches.merge(all_cities))
+        metrics = pd.concat([
+            cube.get_metrics(groups, _get_area_sketches(
+                scope_sketches[scope])).rename_axis('name').reset_index().assign(scope=scope)
+            for scope, groups in zip(SCOPES, (None, REGION_BY_CITY, all_cities))
+        ],
+                            ignore_index=True)
+
+        if use_sketches:
+            describe_tables = pd.concat([
+                scope_sketches[scope].get_describe_tables().assign(scope=scope) for scope in SCOPES
+            ],
+                                        ignore_index=True)
+        else:
+            describe_tables = pd.concat([
+                _describe(selected_df, english_cities).assign(scope='city'),
+                _describe(selected_df, english_cities.map(REGION_BY_CITY)).assign(scope='region'),
+                _describe(selected_df, pd.Series(ALL_CITIES,
+                                                 index=selected_df.index)).assign(scope='all')
+            ],
+                                        ignore_index=True)
+
+        near_the_beach = NearTheBeachIndex(df).query()
+        summary = dict(dataset_hash=dataset_hash,
+                       generated_at=datetime.datetime.now().isoformat(timespec='seconds'),
+                       price_range=list(price_range),
+                       amount_of_listings=len(df),
+                       amount_of_known_city_listings=len(known_city_df),
+                       use_sketches=use_sketches,
+                       seconds=time.perf_counter() - start)
+        return cls(summary, metrics, describe_tables, near_the_beach, sketches)
+
+    @classmethod
+    def load(cls, directory: pathlib.Path):
+        summary = json.loads((directory / SUMMARY_NAME).read_text())
+        sketches = None
+        if summary.get('use_sketches'):
+            sketches = QuantileSketches(*(pd.read_parquet(directory / f'sketch_{name}.parquet')
+                                          for name in SKETCH_TABLE_NAMES))
+        tables = (pd.read_parquet(directory / f'{name}.parquet') for name in TABLE_NAMES)
+        return cls(summary, *tables, sketches)
+
+    def save(self, directory: pathlib.Path):
+        """Writes the report to a temporary directory that is then renamed, so a reader never
+        reads a partly written report."""
+        directory.parent.mkdir(parents=True, exist_ok=True)
+        temporary_directory = pathlib.Path(tempfile.mkdtemp(dir=directory.parent))
+        try:
+            (temporary_directory / SUMMARY_NAME).write_text(json.dumps(self.summary, indent=2))
+            for name in TABLE_NAMES:
+                getattr(self, name).to_parquet(temporary_directory / f'{name}.parquet', index=False)
+            if self.sketches is not None:
+                for name in SKETCH_TABLE_NAMES:
+                    sketch_path = temporary_directory / f'sketch_{name}.parquet'
+                    getattr(self.sketches, name).to_parquet(sketch_path, index=False)
+            temporary_directory.rename(directory)
+        except OSError:
+            # another process wrote the same report first
+            if not directory.exists():
+                raise
+        finally:
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    def get_metrics(self, scope='city', names=None) -> pd.DataFrame:
+        """Returns the metrics of the cities, regions or all of the cities, of only `names` if
+        given, like `ListingsCube.get_metrics` of their listings in the report's price range."""
+        metrics = self.metrics[self.metrics.scope == scope]
+        if names is not None:
+            metrics = metrics[metrics.name.isin(names)]
+        return metrics.drop(columns='scope').set_index('name').rename_axis(
+            'english_city' if scope == 'city' else 'group')
+
+    def get_describe_table(self, scope, name, for_sale) -> pd.DataFrame:
+        """Returns the describe table of the listings for sale or for rent of a city, a region or
+        all of the cities, like `get_describe_table` of their listings in the report's price
+        range."""
+        tables = self.describe_tables
+        return _to_describe_table(tables[(tables.scope == scope) & (tables.name == name)
+                                         & (tables.for_sale == for_sale)].drop(columns='scope'))
+
+    def describe_selection(self, names, for_sale) -> pd.DataFrame:
+        """Returns the describe table of the listings for sale or for rent of the cities `names`,
+        merged from their sketches, so the report must have them."""
+        tables = self.sketches.merge(dict.fromkeys(names, SELECTION)).get_describe_tables()
+        return _to_describe_table(tables[tables.for_sale == for_sale])
+
+
+def _to_describe_table(rows):
+    """Returns a describe table like `DataFrame.describe` from the rows of a single group of a long
+    table of describe tables."""
+    table = rows.set_index('statistic').drop(columns=['name', 'for_sale'])
+    table = table.reindex(DESCRIBE_STATISTICS)
+    table.index.name = None
+    # a scope without listings is described by a count of 0, like an empty frame
+    table.loc['count'] = table.loc['count'].fillna(0)
+    dates = table.date_listed
+    date_statistics = [int(dates['count']), *pd.to_datetime(dates.iloc[1:-1]), float('nan')]
+    table['date_listed'] = pd.Series(date_statistics, index=table.index, dtype=object)
+    return table
+
+
+def _describe(df, groups):
+    """Returns the describe tables of the listings for sale and for rent of every group in a long
+    table, with the dates in nanoseconds since the epoch."""
+    columns = _get_described_columns(df)
+    df = df[columns].assign(date_listed=df.date_listed.astype('int64'), for_sale=df.for_sale)
+    # the aggregations of groupby are vectorized, unlike its describe, which describes every group
+    grouped = df.groupby([groups.rename('name'), 'for_sale'], observed=True)[columns]
+    # the quantiles together, so every group is sorted once
+    quantiles = grouped.quantile([0.25, 0.5, 0.75])
+    quartiles = {
+        f'{quantile:.0%}': quantiles.xs(quantile, level=-1)
+        for quantile in (0.25, 0.5, 0.75)
+    }
+    statistics = dict(count=grouped.count(),
+                      mean=grouped.mean(),
+                      std=grouped.std(),
+                      min=grouped.min(),
+                      **quartiles,
+                      max=grouped.max())
+    statistics = pd.concat(statistics, names=['statistic'])
+    return statistics.reorder_levels(['name', 'for_sale', 'statistic']).sort_index(
+        level=['name', 'for_sale'], sort_remaining=False).astype(float).reset_index()
+
+
+def _get_described_columns(df) -> list:
+    """Returns the columns of the listings in their describe tables, in order."""
+    return [
+        column for column in df.drop(columns=UNDESCRIBED_COLUMNS, errors='ignore').select_dtypes(
+            include=['number', 'datetime']).columns if column != 'for_sale'
+    ]
+
+
+def _get_area_sketches(sketches):
+    """Returns the sketches of every group by its name alone, for binning the rent yields."""
+    if sketches is None:
+        return None
+    return sketches.merge(keys=['name'])
+
+
+def get_listings_report(listings_path: pathlib.Path,
+                        directory=LISTINGS_REPORTS_DIRECTORY,
+                        use_sketches=False):
+    """Returns the report of the listings at `listings_path`, generating it first if the listings
+    changed since it was last generated, or if it was generated on another day, as the houses by
+    the beach are only the recent ones."""
+    dataset_hash = get_dataset_hash(listings_path)
+    report_name = f'{dataset_hash}_{datetime.date.today().isoformat()}'
+    report_directory = directory / (f'{report_name}_sketches' if use_sketches else report_name)
+    if not report_directory.exists():
+        ListingsReport.from_listings(compact_listings(read_listings(listings_path)),
+                                     dataset_hash=dataset_hash,
+                                     use_sketches=use_sketches).save(report_directory)
+        remove_previous_versions(report_directory)
+    return ListingsReport.load(report_directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='compute every metric of the app for every city and region, so the app only '
+        'has to read them')
+    parser.add_argument('--listings-path',
+                        type=pathlib.Path,
+                        default=find_listings_path('all_listings'),
+                        help='the listings written by get_all_listings_df.py')
+    parser.add_argument('--scope',
+                        choices=SCOPES,
+                        default='region',
+                        help='print the metrics of the cities, the regions or all of the cities')
+    parser.add_argument('--sketches',
+                        action='store_true',
+                        help='describe the listings and bin their areas by quantile sketches '
+                        'instead of sorting them, which is faster from about a million listings')
+    args = parser.parse_args()
+    report = get_listings_report(args.listings_path, use_sketches=args.sketches)
+    print(json.dumps(report.summary, indent=2))
+    print(report.get_metrics(args.scope).to_string())
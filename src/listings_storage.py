@@ -0,0 +1,103 @@
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+# the listings are kept next to the code, unless the environment points somewhere else, like the
+# benchmarks do so they never touch the real data
+REPOSITORY_DIRECTORY = pathlib.Path(__file__).resolve().parents[1]
+DATA_DIRECTORY = pathlib.Path(os.environ.get('YAD2_DATA_DIRECTORY', REPOSITORY_DIRECTORY))
+STORAGE_FORMATS = ('parquet', 'feather', 'csv')
+DEFAULT_STORAGE_FORMAT = 'parquet'
+LINK_PREFIX = 'https://www.yad2.co.il/item/'
+LISTING_DTYPES = {
+    'date_listed': 'datetime64[ns]',
+    'city': 'category',
+    'neighborhood': 'category',
+    'street': 'category',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'floor': 'int8',
+    'rooms': 'int8',
+    'area': 'int32',
+    'price': 'int32',
+    'for_sale': 'bool',
+    'distance_from_beach': 'int32',
+    'property_type': 'category',
+    'link_token': pd.StringDtype('pyarrow'),
+    'city_population': 'Int32',
+    'english_city': 'category',
+    'city_id': 'Int16',
+}
+
+
+def get_listings_path(name, storage_format=DEFAULT_STORAGE_FORMAT, directory=DATA_DIRECTORY):
+    return directory / f'{name}.{storage_format}'
+
+
+def find_listings_path(name, directory=DATA_DIRECTORY):
+    """Returns the path of the listings in the format they were last written in, which the crawler
+    takes as an option, or in the default format if they weren't written yet."""
+    paths = [
+        path for path in (get_listings_path(name, storage_format, directory)
+                          for storage_format in STORAGE_FORMATS) if path.exists()
+    ]
+    if not paths:
+        return get_listings_path(name, directory=directory)
+    # the crawler may export the listings as CSV as well, which is the slowest to read
+    return min(paths, key=lambda path: (path.suffix == '.csv', -path.stat().st_mtime))
+
+
+def with_listing_dtypes(df) -> pd.DataFrame:
+    if 'link' in df.columns:
+        # listings stored before only the link token was kept
+        df = df.assign(link=df.link.str.removeprefix(LINK_PREFIX))
+        df = df.rename(columns=dict(link='link_token'))
+    return df.astype({
+        column: dtype
+        for column, dtype in LISTING_DTYPES.items() if column in df.columns
+    })
+
+
+def write_listings(df, path: pathlib.Path):
+    df = with_listing_dtypes(df).reset_index(drop=True)
+    if path.suffix == '.parquet':
+        df.to_parquet(path, index=False)
+    elif path.suffix == '.feather':
+        df.to_feather(path)
+    elif path.suffix == '.csv':
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f'unknown listings storage format: {path.suffix}')
+
+
+def read_listings(path: pathlib.Path) -> pd.DataFrame:
+    if path.suffix == '.parquet':
+        df = pd.read_parquet(path)
+    elif path.suffix == '.feather':
+        df = pd.read_feather(path)
+    elif path.suffix == '.csv':
+        df = pd.read_csv(path, parse_dates=['date_listed'])
+    else:
+        raise ValueError(f'unknown listings storage format: {path.suffix}')
+    return with_listing_dtypes(df)
+
+
+def compact_listings(df) -> pd.DataFrame:
+    """Downcasts the numeric columns to the narrowest dtypes that hold their values."""
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_integer_dtype(df[column]) and not df[column].hasnans:
+            df[column] = pd.to_numeric(df[column].to_numpy(), downcast='integer')
+        elif pd.api.types.is_float_dtype(df[column]):
+            df[column] = df[column].astype(np.float32)
+    return df
+
+
+def get_memory_footprint(df):
+    return df.memory_usage(deep=True).sum()
+
+
+def get_links(link_tokens: pd.Series) -> pd.Series:
+    return LINK_PREFIX + link_tokens.astype(str)
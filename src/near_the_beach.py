@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from src.instrumentation import INSTRUMENTATION
+from src.listings_storage import get_links
+
+HOUSE_PROPERTY_TYPES = ('בית פרטי/קוטג\'', 'דופלקס', 'דו משפחתי')
+MAX_HOUSE_DISTANCE_FROM_BEACH = 700
+MAX_HOUSE_AREA = 240
+RECENT_HOUSES_AGE = pd.Timedelta(4, unit='W')
+# the distances are shown rounded to this many meters, and compared rounded
+DISTANCE_ROUNDING = 50
+
+
+class NearTheBeachIndex:
+    """The listings sorted by their distance from the beach, so the listings close to it are found
+    without going over all of the listings.
+
+    The listings are only read, never modified or copied: a query only takes the rows it returns.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        rounded_distances = _round_distances(df.distance_from_beach.to_numpy())
+        self._order = np.argsort(rounded_distances, kind='stable')
+        self._sorted_distances = rounded_distances[self._order]
+
+    @INSTRUMENTATION.timed()
+    def query(self,
+              max_distance=MAX_HOUSE_DISTANCE_FROM_BEACH,
+              max_area=MAX_HOUSE_AREA,
+              property_types=HOUSE_PROPERTY_TYPES,
+              max_age=RECENT_HOUSES_AGE) -> pd.DataFrame:
+        """Returns the listings of `property_types` listed within `max_age`, whose rounded distance
+        from the beach and area are under `max_distance` and `max_area`."""
+        positions = self._order[:np.searchsorted(self._sorted_distances, max_distance, side='left')]
+        is_match = (self.df.property_type.iloc[positions].isin(property_types).to_numpy()
+                    & (self.df.area.to_numpy()[positions] < max_area))
+        if max_age is not None:
+            is_match &= (self.df.date_listed.iloc[positions]
+                         > (pd.Timestamp.today() - max_age).to_pydatetime()).to_numpy()
+        # in the order of the listings
+        df = self.df.iloc[np.sort(positions[is_match])]
+        return df[['price', 'city', 'area']].assign(
+            distance_from_beach=_round_distances(df.distance_from_beach.to_numpy()),
+            link=get_links(df.link_token)).reset_index(drop=True)
+
+
+def _round_distances(distances):
+    return (np.round(distances / DISTANCE_ROUNDING) * DISTANCE_ROUNDING).astype(int)
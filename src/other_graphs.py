@@ -1,4 +1,3 @@
-import calendar
 import pathlib
 import sys
 
@@ -8,34 +7,37 @@ import pandas as pd
 import streamlit as st
 
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+from src.instrumentation import INSTRUMENTATION
 
 WEEKDAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
 
 
-def other_graphs(df):
+@INSTRUMENTATION.timed()
+def other_graphs(rendered_graphs_directory):
+    # the graphs are rendered once per version of the listings, see rendered_graphs.py
     tabs = st.tabs(
         ['Area', 'Price', 'Date', 'Day of Week', 'Rooms', 'Time of Day', 'Floor', 'Property Types'])
-    graphs = [graph1, graph2, graph3, graph4, graph5, graph6, graph7, graph8]
-    for i, tab in enumerate(tabs):
+    for tab, graph in zip(tabs, GRAPHS):
         with tab:
-            st.pyplot(graphs[i](df), True)
+            st.image(str(get_graph_path(rendered_graphs_directory, graph)), width='stretch')
+
+
+def get_graph_path(rendered_graphs_directory, graph):
+    return rendered_graphs_directory / f'{graph.__name__}.png'
 
 
-@st.cache_data
 def graph1(df):
     plt.clf()
-    plot = df[df.area < 200].area.hist(bins=30, figsize=(5, 3), grid=False)
+    plot = df.area[df.area < 200].hist(bins=30, figsize=(5, 3), grid=False)
     plot.get_yaxis().set_visible(False)
     plot.set_xlabel('Area $m^2$')
     plot.set_title('Distribution of the Area of Listings')
     return plot.get_figure()
 
 
-@st.cache_data
 def graph2(df):
-    plot = df[(300000 < df.price) & (df.price < 10000000)].price.hist(bins=30,
-                                                                      figsize=(8, 5),
-                                                                      grid=False)
+    prices = df.price[(300000 < df.price) & (df.price < 10000000)]
+    plot = prices.hist(bins=30, figsize=(8, 5), grid=False)
     plot.get_yaxis().set_visible(False)
     plot.get_xaxis().set_ticks([i for i in range(0, 10000000, 1000000)])
     plot.set_xlabel('Price')
@@ -43,7 +45,6 @@ def graph2(df):
     return plot.get_figure()
 
 
-@st.cache_data
 def graph3(df):
     plot = df.date_listed.hist(bins=16, figsize=(8, 5), grid=False)
     plot.get_yaxis().set_visible(False)
@@ -53,18 +54,17 @@ def graph3(df):
     return plot.get_figure()
 
 
-@st.cache_data
 def graph4(df):
-    plot = pd.Series([calendar.day_name[date.weekday()] for date in df.date_listed]).value_counts(). \
-        sort_index(
-        key=lambda day_names: [WEEKDAYS.index(day_name) for day_name in day_names]).plot.bar(
-        figsize=(5, 3))
+    # the week starts on Sunday, and pandas counts the days from Monday
+    day_names = pd.Series(
+        pd.Categorical.from_codes((df.date_listed.dt.dayofweek.to_numpy() + 1) % 7, WEEKDAYS))
+    amount_of_listings = day_names.value_counts(sort=False)
+    plot = amount_of_listings[amount_of_listings > 0].plot.bar(figsize=(5, 3))
     plot.set_ylabel('Amount of Listings')
     plot.set_title('Day of the Week Listed')
     return plot.get_figure()
 
 
-@st.cache_data
 def graph5(df):
     plot = df.rooms.value_counts().sort_index().plot.bar(figsize=(5, 3))
     plot.set_xlabel('Number of Rooms')
@@ -73,11 +73,9 @@ def graph5(df):
     return plot.get_figure()
 
 
-@st.cache_data
 def graph6(df):
-    plot = pd.Series([date_listed.time().hour + date_listed.time().minute / 60 for date_listed in
-                      df.date_listed]) \
-        .hist(bins=48, figsize=(8, 3), grid=False)
+    hours = df.date_listed.dt.hour + df.date_listed.dt.minute / 60
+    plot = hours.hist(bins=48, figsize=(8, 3), grid=False)
     plot.get_yaxis().set_visible(False)
     plot.get_xaxis().set_ticks([i for i in range(0, 24)])
     plot.set_xlabel('Hour')
@@ -85,7 +83,6 @@ def graph6(df):
     return plot.get_figure()
 
 
-@st.cache_data
 def graph7(df):
     plot = df.floor.value_counts().sort_index().plot.bar()
     plot.set_xlabel('Floor number')
@@ -94,12 +91,16 @@ def graph7(df):
     return plot.get_figure()
 
 
-@st.cache_data
 def graph8(df):
-    temp_df = df.copy()
-    temp_df.property_type = temp_df.property_type.apply(lambda x: x[::-1])
-    plot = temp_df.property_type.value_counts().sort_index().plot.bar(figsize=(5, 3))
+    property_type_counts = df.property_type.value_counts()
+    property_type_counts = property_type_counts[property_type_counts > 0]
+    # the Hebrew names are reversed so matplotlib shows them right to left, and sorted as reversed
+    property_type_counts.index = property_type_counts.index.astype(str).str[::-1]
+    plot = property_type_counts.sort_index().plot.bar(figsize=(5, 3))
     plot.set_xlabel('Property Type')
     plot.set_ylabel('Amount of Listings')
     plot.set_title('Distribution of Property Types')
     return plot.get_figure()
+
+
+GRAPHS = [graph1, graph2, graph3, graph4, graph5, graph6, graph7, graph8]
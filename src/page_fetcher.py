@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import httpx
+import tenacity
+
+from src.instrumentation import INSTRUMENTATION
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_SECOND = 10
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 8
+ATTEMPTS_PER_PAGE = 3
+SECONDS_BETWEEN_ATTEMPTS = 1
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # the lock keeps waiters in FIFO order so no request is starved
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PageFetcher:
+    """Fetches feed pages with bounded concurrency, a global rate limit and async retries.
+
+    A single fetcher can be shared between several clients (one per host), in which case the
+    concurrency and rate limits are shared between them as well.
+    """
+
+    def __init__(self,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 max_connections_per_host=DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                 transport=None):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.limits = httpx.Limits(max_connections=max_connections_per_host,
+                                   max_keepalive_connections=max_connections_per_host)
+        self.transport = transport
+        self.pages_fetched = 0
+        # including the failed attempts
+        self.requests = 0
+        self.started_at = time.monotonic()
+
+    def client(self, api_url, params):
+        return httpx.AsyncClient(base_url=api_url,
+                                 params=params,
+                                 limits=self.limits,
+                                 transport=self.transport)
+
+    async def get_json(self, yad2_client: httpx.AsyncClient, params):
+        async with self.semaphore:
+            async for attempt in tenacity.AsyncRetrying(
+                    stop=tenacity.stop_after_attempt(ATTEMPTS_PER_PAGE),
+                    wait=tenacity.wait_fixed(SECONDS_BETWEEN_ATTEMPTS),
+                    reraise=True):
+                with attempt:
+                    await self.rate_limiter.acquire()
+                    self.requests += 1
+                    with INSTRUMENTATION.stage('http request'):
+                        raw_response = await yad2_client.get('/', params=params)
+                    raw_response.raise_for_status()
+        self.pages_fetched += 1
+        return raw_response.json()
+
+    @property
+    def pages_per_second(self):
+        return self.pages_fetched / max(time.monotonic() - self.started_at, 1e-9)
@@ -0,0 +1,92 @@
+import collections
+import typing
+
+import numpy as np
+import pandas as pd
+
+GROUND_FLOOR = 'קרקע'
+REQUIRED_FIELDS = [
+    'city', 'date_added', 'price', 'square_meters', 'Rooms_text', 'HomeTypeID_text', 'link_token',
+    'row_4'
+]
+LISTING_COLUMNS = [
+    'date_listed', 'city', 'neighborhood', 'street', 'latitude', 'longitude', 'floor', 'rooms',
+    'area', 'price', 'for_sale', 'distance_from_beach', 'property_type', 'link_token'
+]
+
+
+def parse_feed_items(raw_listings, for_sale,
+                     distance_calculator) -> typing.Tuple[pd.DataFrame, collections.Counter]:
+    """Parses a batch of raw feed items into listing rows, column by column.
+
+    Returns the parsed listings and the amount of rejected items by the reason they were rejected
+    for.
+    """
+    raw_df = pd.DataFrame(list(raw_listings),
+                          columns=REQUIRED_FIELDS + ['street', 'neighborhood', 'coordinates'])
+    rejected = collections.Counter()
+    valid = pd.Series(True, index=raw_df.index)
+
+    def reject(invalid_rows, reason):
+        newly_invalid = invalid_rows & valid
+        if newly_invalid.any():
+            rejected[reason] += int(newly_invalid.sum())
+        valid[newly_invalid] = False
+
+    reject(raw_df[REQUIRED_FIELDS].isna().any(axis=1), 'missing_field')
+    floor = _get_floors(raw_df.row_4)
+    reject(floor.isna(), 'missing_floor')
+    floor = _to_integers(floor.replace(GROUND_FLOOR, 0))
+    reject(floor.isna(), 'invalid_floor')
+    rooms = _to_integers(raw_df.Rooms_text)
+    reject(rooms.isna(), 'invalid_rooms')
+    area = _to_integers(raw_df.square_meters)
+    reject(area.isna(), 'invalid_area')
+    # the price is formatted like '1,250,000 ₪'
+    price = _to_integers(raw_df.price.astype(str).str.replace(r' .*|,', '', regex=True))
+    reject(price.isna(), 'invalid_price')
+    date_listed = pd.to_datetime(raw_df.date_added, format='ISO8601', errors='coerce')
+    reject(date_listed.isna(), 'invalid_date')
+    has_coordinates = raw_df.coordinates.map(bool, na_action='ignore').fillna(False).astype(bool)
+    reject(~has_coordinates, 'missing_coordinates')
+    raw_coordinates = pd.DataFrame(raw_df.coordinates[has_coordinates].tolist(),
+                                   index=raw_df.index[has_coordinates],
+                                   columns=['latitude', 'longitude']).reindex(raw_df.index)
+    # a coordinate may be missing, null or not a number, which the distances can't be computed for
+    raw_coordinates = raw_coordinates.apply(pd.to_numeric, errors='coerce').astype(float)
+    reject(~np.isfinite(raw_coordinates.latitude) | ~np.isfinite(raw_coordinates.longitude),
+           'invalid_coordinates')
+
+    raw_df = raw_df[valid]
+    raw_coordinates = raw_coordinates[valid]
+    distances_from_beach = distance_calculator.calculate_many(raw_coordinates.latitude.to_numpy(),
+                                                              raw_coordinates.longitude.to_numpy())
+    df = pd.DataFrame(dict(date_listed=date_listed[valid],
+                           city=raw_df.city,
+                           neighborhood=raw_df.neighborhood,
+                           street=raw_df.street,
+                           latitude=raw_coordinates.latitude,
+                           longitude=raw_coordinates.longitude,
+                           floor=floor[valid].astype(int),
+                           rooms=rooms[valid].astype(int),
+                           area=area[valid].astype(int),
+                           price=price[valid].astype(int),
+                           for_sale=for_sale,
+                           distance_from_beach=pd.Series(distances_from_beach, index=raw_df.index),
+                           property_type=raw_df.HomeTypeID_text,
+                           link_token=raw_df.link_token.astype(str)),
+                      columns=LISTING_COLUMNS)
+    return df.reset_index(drop=True), rejected
+
+
+def _get_floors(row_4):
+    attributes = row_4.explode().dropna()
+    attributes = pd.DataFrame(attributes.tolist(), index=attributes.index, columns=['key', 'value'])
+    floors = attributes[attributes.key == 'floor'].value
+    return floors[~floors.index.duplicated()].reindex(row_4.index)
+
+
+def _to_integers(values):
+    """Coerces values to integers the way pydantic's lax mode does, anything else becomes NaN."""
+    numbers = pd.to_numeric(values, errors='coerce')
+    return numbers.where(numbers == np.floor(numbers))
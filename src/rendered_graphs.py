@@ -0,0 +1,90 @@
+import argparse
+import hashlib
+import pathlib
+import shutil
+import sys
+import tempfile
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from src.instrumentation import INSTRUMENTATION
+from src.listings_storage import DATA_DIRECTORY, compact_listings, find_listings_path, read_listings
+from src.other_graphs import GRAPHS, get_graph_path
+
+RENDERED_GRAPHS_DIRECTORY = DATA_DIRECTORY / 'rendered_graphs'
+# the options streamlit saves figures with in st.pyplot
+SAVEFIG_OPTIONS = dict(bbox_inches='tight', dpi=200, format='png')
+# the versions before the current one that are kept, as the processes that loaded them before they
+# were replaced still serve them
+PREVIOUS_VERSIONS_TO_KEEP = 1
+
+
+def get_dataset_hash(listings_path: pathlib.Path):
+    file_hash = hashlib.sha256()
+    with listings_path.open('rb') as listings_file:
+        for chunk in iter(lambda: listings_file.read(2**20), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()[:16]
+
+
+def get_rendered_graphs(listings_path: pathlib.Path, directory=RENDERED_GRAPHS_DIRECTORY):
+    """Returns the directory of the graphs rendered from the listings at `listings_path`, rendering
+    them first if the listings changed since they were last rendered."""
+    rendered_graphs_directory = directory / get_dataset_hash(listings_path)
+    if not rendered_graphs_directory.exists():
+        render_graphs(compact_listings(read_listings(listings_path)), rendered_graphs_directory)
+        remove_previous_versions(rendered_graphs_directory)
+    return rendered_graphs_directory
+
+
+def remove_previous_versions(current_directory: pathlib.Path,
+                             versions_to_keep=PREVIOUS_VERSIONS_TO_KEEP):
+    """Removes the directories next to `current_directory`, which were generated from previous
+    versions of the listings, except the latest `versions_to_keep` of them and the temporary ones
+    other processes are still writing."""
+    previous_directories = [
+        other_directory for other_directory in current_directory.parent.iterdir()
+        if other_directory.is_dir() and other_directory != current_directory
+        and not other_directory.name.startswith(tempfile.gettempprefix())
+    ]
+    previous_directories.sort(key=lambda directory: directory.stat().st_mtime, reverse=True)
+    for previous_directory in previous_directories[versions_to_keep:]:
+        shutil.rmtree(previous_directory, ignore_errors=True)
+
+
+@INSTRUMENTATION.timed()
+def render_graphs(df, rendered_graphs_directory: pathlib.Path):
+    """Renders the graphs of all of the listings.
+
+    They are written to a temporary directory that is then renamed, so the app never serves a
+    partly rendered version.
+    """
+    matplotlib.use('Agg')
+    rendered_graphs_directory.parent.mkdir(parents=True, exist_ok=True)
+    temporary_directory = pathlib.Path(tempfile.mkdtemp(dir=rendered_graphs_directory.parent))
+    try:
+        for graph in GRAPHS:
+            figure = graph(df)
+            figure.savefig(get_graph_path(temporary_directory, graph), **SAVEFIG_OPTIONS)
+            # some of the graphs draw on the current figure, like st.pyplot they start empty
+            figure.clf()
+        plt.close('all')
+        temporary_directory.rename(rendered_graphs_directory)
+    except OSError:
+        # another process rendered the same listings first
+        if not rendered_graphs_directory.exists():
+            raise
+    finally:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='render the graphs of the listings, so the app only has to serve them')
+    parser.add_argument('--listings-path',
+                        type=pathlib.Path,
+                        default=find_listings_path('all_listings'),
+                        help='the listings written by get_all_listings_df.py')
+    print(get_rendered_graphs(parser.parse_args().listings_path))
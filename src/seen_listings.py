@@ -0,0 +1,63 @@
+import datetime
+import json
+
+from src.listings_storage import DATA_DIRECTORY
+
+SEEN_LISTINGS_PATH = DATA_DIRECTORY / 'seen_listings.json'
+
+
+class SeenListings:
+    """The link tokens seen in previous crawls, and the newest `date_added` of every region.
+
+    Tokens are kept per feed along with their `date_added`, so tokens of listings too old to
+    matter can be pruned and the store doesn't grow forever.
+    """
+
+    def __init__(self, feeds=None):
+        self.feeds = feeds or dict()
+
+    @classmethod
+    def load(cls, path=SEEN_LISTINGS_PATH):
+        if not path.exists():
+            return cls()
+        return cls(json.loads(path.read_text()))
+
+    def save(self, path=SEEN_LISTINGS_PATH):
+        path.write_text(json.dumps(self.feeds))
+
+    def _feed(self, feed_name):
+        return self.feeds.setdefault(feed_name, dict(link_tokens=dict(), newest_date_added=dict()))
+
+    def newest_date_added(self, feed_name, region_code):
+        return self._feed(feed_name)['newest_date_added'].get(str(region_code))
+
+    def is_page_known(self, feed_name, region_code, raw_listings):
+        """Whether every listing of the page was either seen before, or listed before the newest
+        listing of the region in the previous crawl (the feed is sorted by date)."""
+        link_tokens = self._feed(feed_name)['link_tokens']
+        newest_date_added = self.newest_date_added(feed_name, region_code)
+        if newest_date_added is None:
+            return all(raw_listing.get('link_token') in link_tokens for raw_listing in raw_listings)
+        return all(
+            raw_listing.get('link_token') in link_tokens
+            or raw_listing.get('date_added', '') < newest_date_added
+            for raw_listing in raw_listings)
+
+    def add(self, feed_name, region_code, raw_listings):
+        feed = self._feed(feed_name)
+        for raw_listing in raw_listings:
+            if 'link_token' not in raw_listing or 'date_added' not in raw_listing:
+                continue
+            feed['link_tokens'][raw_listing['link_token']] = raw_listing['date_added']
+            newest_date_added = feed['newest_date_added'].get(str(region_code), '')
+            feed['newest_date_added'][str(region_code)] = max(newest_date_added,
+                                                              raw_listing['date_added'])
+
+    def prune(self, oldest_date: datetime.datetime):
+        oldest_date_added = oldest_date.isoformat(sep=' ')
+        for feed in self.feeds.values():
+            feed['link_tokens'] = {
+                link_token: date_added
+                for link_token, date_added in feed['link_tokens'].items()
+                if date_added >= oldest_date_added
+            }
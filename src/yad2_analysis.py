@@ -1,58 +1,63 @@
+import os
 import pathlib
 import sys
 
 import matplotlib
-import numpy as np
 import pandas as pd
 import streamlit as st
 
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from src.analytics import clean_unknown_cities, get_describe_table
 from src.cities import CITIES, LARGE_CITIES
+from src.city_selection import CitySelection
+from src.instrumentation import ENVIRONMENT_VARIABLE, INSTRUMENTATION
+from src.listings_cube import ListingsCube
+from src.listings_query import ListingsQuery
+from src.listings_report import ALL_CITIES, SKETCHES_ENVIRONMENT_VARIABLE, get_listings_report
+from src.listings_storage import (compact_listings, find_listings_path, get_memory_footprint,
+                                  read_listings)
 from src.other_graphs import other_graphs
+from src.rendered_graphs import get_rendered_graphs
 
 MILLION = 1000000
-MIN_IN_EACH_BIN = 3
-MAX_AMOUNT_OF_BINS = 10
-ALL_LISTINGS_FILE_PATH = pathlib.Path('./all_listings.csv')
-MIN_AMOUNT_OF_LISTINGS_IN_CITY = 9
+ALL_LISTINGS_FILE_PATH = find_listings_path('all_listings')
 
 
-def on_region_checkbox_change(region_key, relevant_cities):
-    all_other_selected_cities = set(st.session_state.city_multiselect) - CITIES[region_key]
-    if not getattr(st.session_state, region_key):
-        st.session_state.city_multiselect = list(all_other_selected_cities) or []
-    else:
-        st.session_state.city_multiselect = list(all_other_selected_cities
-                                                 | (CITIES[region_key]
-                                                    & relevant_cities)) or []
+def on_region_checkbox_change(region_key, city_selection):
+    mask = city_selection.get_mask(st.session_state.city_multiselect)
+    mask = city_selection.set_region(mask, region_key, getattr(st.session_state, region_key))
+    st.session_state.city_multiselect = city_selection.get_cities(mask)
 
 
-def on_city_multiselect_change():
-    for region in CITIES:
-        setattr(st.session_state, region,
-                bool(set(st.session_state.city_multiselect) & CITIES[region]))
+def on_city_multiselect_change(city_selection):
+    mask = city_selection.get_mask(st.session_state.city_multiselect)
+    for region, is_selected in city_selection.get_regions(mask).items():
+        setattr(st.session_state, region, is_selected)
 
 
-def select_cities(relevant_cities):
+def select_cities(city_selection):
     st.write('Select regions you would like to analyze.')
     for region in CITIES:
         st.checkbox(region,
                     key=region,
                     on_change=on_region_checkbox_change,
-                    args=(region, relevant_cities),
-                    value=LARGE_CITIES & CITIES[region])
+                    args=(region, city_selection),
+                    value=city_selection.default_regions[region])
     st.markdown('<br/>', unsafe_allow_html=True)
-    return st.multiselect(
-        'Or, select the cities you would like to analyze.',
-        list(relevant_cities),
-        default=list(set(st.session_state.get('city_multiselect', LARGE_CITIES)) & relevant_cities),
-        key='city_multiselect',
-        on_change=on_city_multiselect_change)
+    default_mask = city_selection.get_mask(st.session_state.get('city_multiselect', LARGE_CITIES))
+    return st.multiselect('Or, select the cities you would like to analyze.',
+                          city_selection.cities,
+                          default=city_selection.get_cities(default_mask),
+                          key='city_multiselect',
+                          on_change=on_city_multiselect_change,
+                          args=(city_selection, ))
 
 
 def main():
-    complete_df = load_listings_csv()
-    df = clean_unknown_cities(complete_df)
+    INSTRUMENTATION.enable_from_environment()
+    complete_df = load_listings()
+    df = load_known_city_listings()
+    query = load_listings_query()
 
     st.title('Yad2 Real Estate Analysis')
     st.markdown('<br/>', unsafe_allow_html=True)
@@ -67,7 +72,7 @@ def main():
 
     st.subheader('Cities Selection')
 
-    selected_cities = select_cities(set(df.english_city.unique()))
+    selected_cities = select_cities(load_city_selection())
 
     st.markdown('<br/>', unsafe_allow_html=True)
     unformatted_price_range = st.slider('Select the range of prices to analyze, in million ₪.',
@@ -77,64 +82,127 @@ def main():
                                         key='price_range',
                                         format='%f')
     price_range = unformatted_price_range[0] * MILLION, unformatted_price_range[1] * MILLION
-    df = df[(df.price > price_range[0]) & (df.price < price_range[1]) | ~df.for_sale]
 
     st.markdown('<br/><br/>', unsafe_allow_html=True)
 
     st.subheader('Results')
     if selected_cities:
-        df = df[df.english_city.isin(selected_cities)]
+        city_metrics, for_sale_describe_table, for_rent_describe_table = get_results(
+            query, selected_cities, price_range)
         tabs = st.tabs(
             ['Rent Yield', 'Amount of Listings', 'Price per m²', 'For Sale Data', 'For Rent Data'])
-        graphs = [graph8, graph9, graph10, graph11, graph12]
-        for i, tab in enumerate(tabs):
+        graphs = [(graph8, city_metrics), (graph9, city_metrics), (graph10, city_metrics),
+                  (graph11, for_sale_describe_table), (graph12, for_rent_describe_table)]
+        for tab, (graph, data) in zip(tabs, graphs):
             with tab:
-                graphs[i](df)
+                graph(data)
     else:
         st.markdown('Please select cities to analyze in order to see the results.')
 
     st.markdown('<br/><br/>', unsafe_allow_html=True)
 
     st.subheader('Recent Houses By the Beach')
-    st.dataframe(houses_by_the_beach(complete_df))
+    st.dataframe(load_listings_report().near_the_beach)
     st.markdown('<br/><br/>', unsafe_allow_html=True)
 
     st.subheader('More Graphs')
     st.markdown('These are based on all of the listings on Yad2.')
-    other_graphs(complete_df)
-
-
-@st.cache_data
-def load_listings_csv():
-    return pd.read_csv(ALL_LISTINGS_FILE_PATH, parse_dates=['date_listed'])
-
-
-@st.cache_data
-def clean_unknown_cities(df):
-    # About 1% of listings are in cities with a population of less than 2000,
-    # for simplicity we'll ignore them
-    df = df[~df.english_city.isna()]
-    listing_count_by_city = df.city.value_counts()
-    cities_to_ignore = set(
-        listing_count_by_city.
-        loc[lambda listing_count: listing_count < MIN_AMOUNT_OF_LISTINGS_IN_CITY].index)
-    df = df[~df.city.isin(cities_to_ignore)]
-    df = df.reset_index(drop=True)
-    return df
-
-
-def graph8(df):
-    dfs = list()
-    for city in df.english_city.unique():
-        x = df[df.english_city == city]
-        number_of_bins = min(MAX_AMOUNT_OF_BINS, int(x.shape[0] / MIN_IN_EACH_BIN))
-        dfs.append(x.assign(area_bin=pd.qcut(x.area, number_of_bins, duplicates='drop')))
-
-    y = pd.concat(dfs).groupby(['english_city', 'area_bin', 'for_sale']) \
-        .agg({'price': ['mean', 'count']}).unstack().dropna().reset_index()
-    res = y.groupby('english_city', observed=True).apply(
-        lambda z: np.average(z['price']['mean'][False] * 12 / z['price']['mean'][True],
-                             weights=z['price']['count'][False] + z['price']['count'][True]))
+    other_graphs(load_rendered_graphs())
+
+    if st.query_params.get('debug'):
+        show_debug_panel(complete_df, query)
+
+
+def get_results(query, selected_cities, price_range):
+    """Returns the metrics of the selected cities and the describe tables of their listings for
+    sale and for rent.
+
+    They're read from the report if it has them: the metrics of any cities in the default range of
+    prices, and the describe tables of a single city, a whole region or all of the cities, or of any
+    cities if it has quantile sketches. Otherwise the metrics are combined from the cube of the
+    selection and its listings are described.
+    """
+    report = load_listings_report()
+    if query.normalize(selected_cities, price_range)[1] != report.price_range:
+        df, cube = query.select(selected_cities, price_range)
+        return cube.get_metrics(), get_describe_table(df, True), get_describe_table(df, False)
+    city_selection = load_city_selection()
+    mask = city_selection.get_mask(selected_cities)
+    region = city_selection.get_region(mask)
+    if mask == city_selection.all_mask:
+        scope = 'all', ALL_CITIES
+    elif region is not None:
+        scope = 'region', region
+    elif len(selected_cities) == 1:
+        scope = 'city', selected_cities[0]
+    elif report.sketches is not None:
+        return (report.get_metrics('city', selected_cities),
+                *(report.describe_selection(selected_cities, for_sale)
+                  for for_sale in (True, False)))
+    else:
+        df, _ = query.select(selected_cities, price_range)
+        return (report.get_metrics('city', selected_cities), get_describe_table(df, True),
+                get_describe_table(df, False))
+    return (report.get_metrics('city', selected_cities), report.get_describe_table(*scope, True),
+            report.get_describe_table(*scope, False))
+
+
+def show_debug_panel(complete_df, query):
+    with st.sidebar.expander('Debug', expanded=True):
+        st.write(f'All listings: {get_memory_footprint(complete_df) / 2**20:.1f} MiB in memory')
+        st.write(
+            f'Listings in known cities: {get_memory_footprint(query.df) / 2**20:.1f} MiB in memory')
+        stats = query.get_stats()
+        st.write(f'Selections cache: {stats["hits"]} hits, {stats["misses"]} misses, '
+                 f'{stats["evictions"]} evictions, {stats["cached_selections"]} selections in '
+                 f'{stats["cached_bytes"] / 2**20:.1f} MiB')
+        if INSTRUMENTATION.enabled:
+            st.write(f'Timings since the app started (set {ENVIRONMENT_VARIABLE}=memory to also '
+                     'track memory):')
+            st.dataframe(INSTRUMENTATION.get_report(), hide_index=True)
+
+
+# cached as resources, so all sessions share a single copy of the listings instead of each
+# cache_data call returning its own. They must not be modified in place.
+@st.cache_resource
+def load_listings():
+    return compact_listings(read_listings(ALL_LISTINGS_FILE_PATH))
+
+
+@st.cache_resource
+def load_known_city_listings():
+    return clean_unknown_cities(load_listings())
+
+
+@st.cache_resource
+def load_city_selection():
+    return CitySelection.from_listings(load_known_city_listings())
+
+
+@st.cache_resource
+def load_listings_cube():
+    return ListingsCube.from_listings(load_known_city_listings())
+
+
+@st.cache_resource
+def load_listings_query():
+    return ListingsQuery(load_known_city_listings(), load_listings_cube())
+
+
+@st.cache_resource
+def load_rendered_graphs():
+    return get_rendered_graphs(ALL_LISTINGS_FILE_PATH)
+
+
+@st.cache_resource
+def load_listings_report():
+    return get_listings_report(ALL_LISTINGS_FILE_PATH,
+                               use_sketches=os.environ.get(SKETCHES_ENVIRONMENT_VARIABLE) == '1')
+
+
+@INSTRUMENTATION.timed()
+def graph8(city_metrics):
+    res = city_metrics.rent_yield.dropna()
     plot = res.plot.bar()
     plot.axhline(y=res.median(), linestyle='--')
     plot.yaxis.set_major_formatter(matplotlib.ticker.PercentFormatter(1))
@@ -146,19 +214,12 @@ def graph8(df):
                 ' price of apartments in the same city that also have a similar area.')
 
 
-def graph9(df):
+@INSTRUMENTATION.timed()
+def graph9(city_metrics):
     # create df
-    df = df[df.for_sale]
-    cities_df = df.english_city.value_counts()
-    cities_df.name = 'amount_of_listings'
-    city_names_and_populations = df.drop_duplicates(subset='english_city')\
-        [['english_city', 'city', 'city_population']].reset_index(drop=True)
-    cities_df = cities_df.to_frame().merge(city_names_and_populations,
-                                           left_index=True,
-                                           right_on='english_city')
-    cities_df = cities_df.set_index('english_city')
-    cities_df['amount_of_listings_per_100k_residents'] = (
-        (cities_df.amount_of_listings / cities_df.city_population) * 100000).astype(int)
+    cities_df = city_metrics[city_metrics.amount_of_listings > 0]
+    cities_df = cities_df.assign(amount_of_listings_per_100k_residents=cities_df.
+                                 amount_of_listings_per_100k_residents.astype(int))
     median_amount_of_listings_per_100k_residents = \
         cities_df.amount_of_listings_per_100k_residents.median()
 
@@ -173,13 +234,9 @@ def graph9(df):
     st.pyplot(plot.get_figure(), True)
 
 
-def graph10(df):
-    df = df[df.for_sale]
-    amount_of_listings = df.english_city.value_counts()
-    amount_of_listings.name = 'amount_of_listings'
-    df = df.copy()
-    df['price_per_sqm'] = df.price / df.area
-    prices_per_sqm = df.groupby('english_city').mean(numeric_only=True)['price_per_sqm'].astype(int)
+@INSTRUMENTATION.timed()
+def graph10(city_metrics):
+    prices_per_sqm = city_metrics.price_per_sqm.dropna().astype(int)
     plot = prices_per_sqm.plot.bar()
     plot.axhline(y=prices_per_sqm.median(), linestyle='--')
     plot.set_xlabel(None)
@@ -188,8 +245,8 @@ def graph10(df):
     st.pyplot(plot.get_figure(), True)
 
 
+@INSTRUMENTATION.timed()
 def graph11(df):
-    df = df[df.for_sale].describe()
     df = df.round({
         'area': 0,
         'price': 0,
@@ -203,8 +260,8 @@ def graph11(df):
     st.dataframe(df)
 
 
+@INSTRUMENTATION.timed()
 def graph12(df):
-    df = df[~df.for_sale].describe()
     df = df.round({
         'area': 0,
         'price': 0,
@@ -218,17 +275,5 @@ def graph12(df):
     st.dataframe(df)
 
 
-@st.cache_data
-def houses_by_the_beach(df):
-    df.distance_from_beach = df.distance_from_beach.apply(lambda x: round(x / 50) * 50)
-    return df[df.property_type.isin(('בית פרטי/קוטג\'', 'דופלקס', 'דו משפחתי'))
-              & (df.distance_from_beach < 700)
-              & (df.area < 240)
-              & (df.date_listed
-                 > (pd.Timestamp.today() - pd.Timedelta(4, unit='W')).to_pydatetime())][[
-                     'price', 'city', 'area', 'distance_from_beach', 'link'
-                 ]].reset_index(drop=True)
-
-
 if __name__ == '__main__':
     main()
@@ -0,0 +1,52 @@
+import pathlib
+import sys
+import warnings
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.rent_yield_benchmark import get_rent_yield_by_city_per_city
+from benchmarks.synthetic_listings import make_listings_df
+from src.analytics import get_rent_yield_by_city, get_weighted_rent_yield_by_city
+
+
+def make_edge_case_listings_df():
+    """Cities too small to bin, with a single area, or with only a few distinct areas."""
+    df = make_listings_df(2000, seed=1, amount_of_cities=40)
+    cities = df.english_city.cat.categories
+    df.loc[df.english_city == cities[0], 'area'] = 100
+    df.loc[df.english_city == cities[1], 'area'] = df.area.where(df.area > 150, 80).clip(upper=120)
+    small_cities = df.english_city.isin(cities[2:6])
+    small_city_listings = df[small_cities].groupby('english_city', observed=True).head(3)
+    return pd.concat([df[~small_cities], small_city_listings]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('df', [
+    make_edge_case_listings_df(),
+    make_listings_df(10000, amount_of_cities=50),
+    make_listings_df(10000)
+])
+def test_rent_yield_by_city_is_the_per_city_loop(df):
+    with warnings.catch_warnings():
+        # the previous loop drops columns of an unsorted multi-index, which pandas warns about
+        warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+        expected = get_rent_yield_by_city_per_city(df)
+    pd.testing.assert_series_equal(get_rent_yield_by_city(df),
+                                   expected,
+                                   check_index_type=False,
+                                   check_names=False,
+                                   rtol=1e-12)
+
+
+def test_weighted_rent_yield_by_city_is_that_of_the_listings():
+    df = make_edge_case_listings_df()
+    groups = df.groupby(['english_city', 'area', 'for_sale'],
+                        observed=True).price.agg(['size', 'sum'])
+    groups = groups.reset_index()
+    pd.testing.assert_series_equal(get_weighted_rent_yield_by_city(groups.english_city, groups.area,
+                                                                   groups.for_sale,
+                                                                   groups['size'].to_numpy(),
+                                                                   groups['sum']),
+                                   get_rent_yield_by_city(df),
+                                   rtol=1e-12)
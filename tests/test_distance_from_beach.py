@@ -0,0 +1,53 @@
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.distance_benchmark import calculate_brute_force, make_points
+from src.distance_from_beach import DistanceFromBeach
+
+AMOUNT_OF_POINTS = 1000
+
+
+@pytest.fixture(scope='module')
+def distance_calculator(tmp_path_factory):
+    return DistanceFromBeach(tmp_path_factory.mktemp('beach_index') / 'beach_index.npy')
+
+
+@pytest.fixture(scope='module')
+def points_and_exact_distances(distance_calculator):
+    latitudes, longitudes = make_points(AMOUNT_OF_POINTS)
+    return latitudes, longitudes, calculate_brute_force(distance_calculator.beach_coordinates,
+                                                        latitudes, longitudes)
+
+
+def test_calculate_many_is_exact(distance_calculator, points_and_exact_distances):
+    latitudes, longitudes, exact = points_and_exact_distances
+    errors = np.abs(distance_calculator.calculate_many(latitudes, longitudes) - exact)
+    # distances are truncated to whole meters, so they may differ by one meter
+    assert errors.max() <= 1
+
+
+@pytest.mark.parametrize('max_relative_error', [0.02, 0.05, 0.1])
+def test_calculate_many_is_within_the_relative_error(distance_calculator,
+                                                     points_and_exact_distances,
+                                                     max_relative_error):
+    latitudes, longitudes, exact = points_and_exact_distances
+    distances = distance_calculator.calculate_many(latitudes, longitudes, max_relative_error)
+    assert (distances >= exact - 1).all()
+    assert (distances <= exact * (1 + max_relative_error) + 1).all()
+
+
+def test_calculate_is_calculate_many_of_a_single_point(distance_calculator):
+    latitudes, longitudes = make_points(10)
+    distances = distance_calculator.calculate_many(latitudes, longitudes)
+    assert [
+        distance_calculator.calculate((latitude, longitude))
+        for latitude, longitude in zip(latitudes, longitudes)
+    ] == distances.tolist()
+
+
+def test_calculate_many_of_no_points(distance_calculator):
+    assert distance_calculator.calculate_many([], []).shape == (0, )
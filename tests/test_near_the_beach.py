@@ -0,0 +1,33 @@
+import pathlib
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.near_the_beach_benchmark import THRESHOLDS, scan
+from benchmarks.synthetic_listings import make_listings_df
+from src.listings_storage import compact_listings
+from src.near_the_beach import NearTheBeachIndex
+
+AMOUNT_OF_LISTINGS = 10000
+
+
+@pytest.fixture(scope='module')
+def df():
+    return compact_listings(make_listings_df(AMOUNT_OF_LISTINGS))
+
+
+@pytest.mark.parametrize('thresholds', THRESHOLDS)
+def test_query_finds_the_houses_of_the_scan(df, thresholds):
+    pd.testing.assert_frame_equal(NearTheBeachIndex(df).query(**thresholds), scan(df, **thresholds))
+
+
+def test_query_leaves_the_listings_unmodified(df):
+    original_df = df.copy(deep=True)
+    index = NearTheBeachIndex(df)
+    for thresholds in THRESHOLDS:
+        houses = index.query(**thresholds)
+        houses['distance_from_beach'] = 0
+        houses['price'] = 0
+    pd.testing.assert_frame_equal(df, original_df)
@@ -0,0 +1,109 @@
+import pathlib
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from benchmarks.quantile_sketches_benchmark import (describe_exactly, describe_with_sketches,
+                                                    make_sketches)
+from benchmarks.synthetic_listings import make_listings_df
+from src.analytics import _get_qcut_quantiles, clean_unknown_cities, get_area_bin_edges
+from src.listings_report import ListingsReport, _get_described_columns
+from src.listings_storage import compact_listings
+from src.quantile_sketches import DATE_BUCKET_SIZE, RELATIVE_ACCURACY, QuantileSketches
+
+AMOUNT_OF_LISTINGS = 20000
+AMOUNT_OF_CHUNKS = 4
+QUANTILES = [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]
+EXACT_STATISTICS = ['count', 'mean', 'std', 'min', 'max']
+
+
+@pytest.fixture(scope='module')
+def df():
+    return clean_unknown_cities(compact_listings(make_listings_df(AMOUNT_OF_LISTINGS)))
+
+
+@pytest.fixture(scope='module')
+def columns(df):
+    return _get_described_columns(df)
+
+
+def test_quantiles_are_within_the_error_bound(df, columns):
+    """Checks every quantile is within the error bound of the values around it, which are the
+    quantiles interpolated to the lower and the higher value."""
+    sketches = make_sketches(df, columns)
+    names = df.english_city.astype(str).rename('name')
+    for column in columns:
+        is_date = pd.api.types.is_datetime64_any_dtype(df[column])
+        values = df[column].astype('int64') if is_date else df[column]
+        grouped = values.groupby([names, df.for_sale], observed=True)
+        lower, higher = (grouped.quantile(QUANTILES,
+                                          interpolation=interpolation).unstack().to_numpy(float)
+                         for interpolation in ('lower', 'higher'))
+        positions = np.flatnonzero(sketches.summaries.column == column)
+        estimates = sketches.get_quantiles(QUANTILES, positions)
+        if is_date:
+            bound = DATE_BUCKET_SIZE / 2
+        else:
+            bound = RELATIVE_ACCURACY * np.maximum(np.abs(lower), np.abs(higher))
+        # up to the rounding of the dates in nanoseconds to floats
+        assert (estimates >= lower - bound - 1e3).all(), column
+        assert (estimates <= higher + bound + 1e3).all(), column
+        # the lowest and highest values are exact
+        assert (estimates[:, 0] == lower[:, 0]).all() and (estimates[:, -1] == higher[:, -1]).all()
+
+
+def test_describe_tables_are_exact_but_the_quartiles(df, columns):
+    for actual, expected in zip(describe_with_sketches(df, columns), describe_exactly(df)):
+        actual = actual.set_index(['name', 'for_sale', 'statistic']).sort_index()
+        expected = expected.set_index(['name', 'for_sale',
+                                       'statistic']).sort_index()[actual.columns]
+        is_exact = actual.index.get_level_values('statistic').isin(EXACT_STATISTICS)
+        pd.testing.assert_frame_equal(actual[is_exact], expected[is_exact], rtol=1e-9)
+
+
+def test_sketches_of_chunks_merge_into_those_of_all_of_the_listings(df, columns):
+    sketches = make_sketches(df, columns)
+    chunk_size = -(-len(df) // AMOUNT_OF_CHUNKS)
+    merged = QuantileSketches.concat(
+        make_sketches(df.iloc[start:start + chunk_size], columns)
+        for start in range(0, len(df), chunk_size))
+    pd.testing.assert_frame_equal(merged.buckets, sketches.buckets)
+    pd.testing.assert_frame_equal(merged.summaries, sketches.summaries, rtol=1e-9)
+
+
+def test_report_metrics_are_exact_but_the_rent_yields(df):
+    exact_report = ListingsReport.from_listings(df)
+    sketches_report = ListingsReport.from_listings(df, use_sketches=True)
+    pd.testing.assert_frame_equal(sketches_report.metrics.drop(columns='rent_yield'),
+                                  exact_report.metrics.drop(columns='rent_yield'))
+
+
+def test_area_bin_edges_are_within_the_error_bound_of_qcut():
+    df = make_listings_df(AMOUNT_OF_LISTINGS)
+    city_codes, cities = pd.factorize(df.english_city, sort=True)
+    area = df.area.to_numpy(float)
+    sketches = QuantileSketches.from_listings(df.assign(name=df.english_city.astype(str)), ['name'],
+                                              ['area'])
+    edges = get_area_bin_edges(city_codes, cities, area, np.ones(len(df), dtype=int), sketches)
+    for city_code, city_edges in enumerate(edges):
+        city_area = area[city_codes == city_code]
+        number_of_bins = min(10, len(city_area) // 3)
+        if number_of_bins < 1:
+            continue
+        _, expected_edges = pd.qcut(city_area, number_of_bins, retbins=True, duplicates='drop')
+        quantiles = _get_qcut_quantiles()[number_of_bins, :number_of_bins + 1]
+        if len(expected_edges) != number_of_bins + 1:
+            # the bins pd.qcut drops depend on the exact areas
+            continue
+        city_edges = city_edges[~np.isnan(city_edges)]
+        assert len(city_edges) == len(expected_edges), cities[city_code]
+        # the exact edge is between these areas
+        lower, higher = (np.quantile(city_area, quantiles, method=method)
+                         for method in ('lower', 'higher'))
+        assert (lower <= expected_edges).all() and (expected_edges <= higher).all()
+        assert (city_edges >= lower - RELATIVE_ACCURACY * higher).all(), cities[city_code]
+        assert (city_edges <= higher + RELATIVE_ACCURACY * higher).all(), cities[city_code]
+        assert city_edges[0] == expected_edges[0] and city_edges[-1] == expected_edges[-1]